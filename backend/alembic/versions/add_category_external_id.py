@@ -0,0 +1,30 @@
+"""Add external_id to categories
+
+Revision ID: add_category_external_id
+Revises: add_sync_lease
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_category_external_id"
+down_revision: Union[str, None] = "add_sync_lease"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "categories",
+        sa.Column("external_id", sa.String(255), nullable=True),
+    )
+    op.create_index("ix_categories_external_id", "categories", ["external_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_categories_external_id", table_name="categories")
+    op.drop_column("categories", "external_id")
@@ -0,0 +1,65 @@
+"""Add mailing_jobs and mailing_deliveries
+
+Revision ID: add_mailing_jobs
+Revises: add_order_export
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_mailing_jobs"
+down_revision: Union[str, None] = "add_order_export"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mailing_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=True),
+        sa.Column("audience", sa.String(50), nullable=False, server_default="all"),
+        sa.Column("text", sa.Text(), nullable=False, server_default=""),
+        sa.Column("image_url", sa.String(500), nullable=True),
+        sa.Column("button_text", sa.String(255), nullable=True),
+        sa.Column("button_url", sa.String(500), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sent", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("blocked", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("active_seconds", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_mailing_jobs_status", "mailing_jobs", ["status"])
+    op.create_table(
+        "mailing_deliveries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("mailing_jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_mailing_deliveries_job_telegram", "mailing_deliveries", ["job_id", "telegram_id"], unique=True
+    )
+    op.create_index(
+        "ix_mailing_deliveries_job_status", "mailing_deliveries", ["job_id", "status", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mailing_deliveries_job_status", table_name="mailing_deliveries")
+    op.drop_index("ix_mailing_deliveries_job_telegram", table_name="mailing_deliveries")
+    op.drop_table("mailing_deliveries")
+    op.drop_index("ix_mailing_jobs_status", table_name="mailing_jobs")
+    op.drop_table("mailing_jobs")
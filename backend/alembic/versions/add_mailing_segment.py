@@ -0,0 +1,25 @@
+"""Add mailing_jobs.segment (audience filter of a broadcast)
+
+Revision ID: add_mailing_segment
+Revises: add_telegram_files
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_mailing_segment"
+down_revision: Union[str, None] = "add_telegram_files"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("mailing_jobs", sa.Column("segment", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("mailing_jobs", "segment")
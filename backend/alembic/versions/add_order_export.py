@@ -0,0 +1,35 @@
+"""Add MoySklad export columns to orders
+
+Revision ID: add_order_export
+Revises: add_stock_levels
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_order_export"
+down_revision: Union[str, None] = "add_stock_levels"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("orders", sa.Column("export_status", sa.String(20), nullable=True))
+    op.add_column("orders", sa.Column("export_attempts", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("orders", sa.Column("export_error", sa.Text(), nullable=True))
+    op.add_column("orders", sa.Column("exported_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("orders", sa.Column("external_id", sa.String(255), nullable=True))
+    op.create_index("ix_orders_export_status", "orders", ["export_status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_export_status", table_name="orders")
+    op.drop_column("orders", "external_id")
+    op.drop_column("orders", "exported_at")
+    op.drop_column("orders", "export_error")
+    op.drop_column("orders", "export_attempts")
+    op.drop_column("orders", "export_status")
@@ -0,0 +1,28 @@
+"""Add export_next_at to orders
+
+Revision ID: add_order_export_next_at
+Revises: add_sync_job_status
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_order_export_next_at"
+down_revision: Union[str, None] = "add_sync_job_status"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "orders",
+        sa.Column("export_next_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("orders", "export_next_at")
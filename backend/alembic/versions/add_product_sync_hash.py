@@ -0,0 +1,30 @@
+"""Add products.sync_hash and index on products.external_id
+
+Revision ID: add_product_sync_hash
+Revises: add_admin_ids
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_product_sync_hash"
+down_revision: Union[str, None] = "add_admin_ids"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "products",
+        sa.Column("sync_hash", sa.String(64), nullable=True),
+    )
+    op.create_index(op.f("ix_products_external_id"), "products", ["external_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_products_external_id"), table_name="products")
+    op.drop_column("products", "sync_hash")
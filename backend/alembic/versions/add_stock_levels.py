@@ -0,0 +1,53 @@
+"""Add stores and per-store stock_levels
+
+Revision ID: add_stock_levels
+Revises: add_variant_external_id
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_stock_levels"
+down_revision: Union[str, None] = "add_variant_external_id"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stores",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("external_id", sa.String(255), nullable=True, unique=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("address", sa.Text(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true()),
+    )
+    op.create_table(
+        "stock_levels",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("variant_id", sa.Integer(), sa.ForeignKey("product_variants.id", ondelete="CASCADE"), nullable=True),
+        sa.Column("store_id", sa.Integer(), sa.ForeignKey("stores.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index(
+        "ix_stock_levels_product_variant_store",
+        "stock_levels",
+        ["product_id", "variant_id", "store_id"],
+        unique=True,
+    )
+    op.create_index("ix_stock_levels_store_quantity", "stock_levels", ["store_id", "quantity"])
+    op.create_index("ix_stock_levels_variant_id", "stock_levels", ["variant_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stock_levels_variant_id", table_name="stock_levels")
+    op.drop_index("ix_stock_levels_store_quantity", table_name="stock_levels")
+    op.drop_index("ix_stock_levels_product_variant_store", table_name="stock_levels")
+    op.drop_table("stock_levels")
+    op.drop_table("stores")
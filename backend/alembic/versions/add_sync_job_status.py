@@ -0,0 +1,33 @@
+"""Add sync job status columns to sync_state
+
+Revision ID: add_sync_job_status
+Revises: add_user_bot_blocked
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_sync_job_status"
+down_revision: Union[str, None] = "add_user_bot_blocked"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "sync_state",
+        sa.Column("job_id", sa.String(32), nullable=True),
+    )
+    op.add_column(
+        "sync_state",
+        sa.Column("job", sa.JSON(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sync_state", "job")
+    op.drop_column("sync_state", "job_id")
@@ -0,0 +1,33 @@
+"""Add sync lease columns to sync_state
+
+Revision ID: add_sync_lease
+Revises: add_sync_state
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_sync_lease"
+down_revision: Union[str, None] = "add_sync_state"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "sync_state",
+        sa.Column("lease_owner", sa.String(255), nullable=True),
+    )
+    op.add_column(
+        "sync_state",
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sync_state", "lease_expires_at")
+    op.drop_column("sync_state", "lease_owner")
@@ -0,0 +1,40 @@
+"""Add sync_state table and products.archived_at for delta sync
+
+Revision ID: add_sync_state
+Revises: add_product_sync_hash
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_sync_state"
+down_revision: Union[str, None] = "add_product_sync_hash"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_state",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("source", sa.String(50), nullable=False),
+        sa.Column("cursor", sa.String(50), nullable=True),
+        sa.Column("last_full_sync_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_sync_state_source"), "sync_state", ["source"], unique=True)
+    op.add_column(
+        "products",
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("products", "archived_at")
+    op.drop_index(op.f("ix_sync_state_source"), table_name="sync_state")
+    op.drop_table("sync_state")
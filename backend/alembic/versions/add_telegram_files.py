@@ -0,0 +1,34 @@
+"""Add telegram_files (cached Telegram file_id per image)
+
+Revision ID: add_telegram_files
+Revises: add_mailing_jobs
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_telegram_files"
+down_revision: Union[str, None] = "add_mailing_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "telegram_files",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(80), nullable=False),
+        sa.Column("source", sa.Text(), nullable=False, server_default=""),
+        sa.Column("file_id", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_telegram_files_key", "telegram_files", ["key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_telegram_files_key", table_name="telegram_files")
+    op.drop_table("telegram_files")
@@ -0,0 +1,29 @@
+"""Add users.bot_blocked_at and users.delivery_failures
+
+Revision ID: add_user_bot_blocked
+Revises: add_mailing_segment
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_user_bot_blocked"
+down_revision: Union[str, None] = "add_mailing_segment"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("bot_blocked_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column(
+        "users", sa.Column("delivery_failures", sa.Integer(), nullable=False, server_default="0")
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "delivery_failures")
+    op.drop_column("users", "bot_blocked_at")
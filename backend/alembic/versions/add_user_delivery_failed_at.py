@@ -0,0 +1,25 @@
+"""Add users.delivery_failed_at
+
+Revision ID: add_user_delivery_failed_at
+Revises: add_order_export_next_at
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_user_delivery_failed_at"
+down_revision: Union[str, None] = "add_order_export_next_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("delivery_failed_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "delivery_failed_at")
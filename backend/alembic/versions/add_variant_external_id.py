@@ -0,0 +1,30 @@
+"""Add external_id to product_variants
+
+Revision ID: add_variant_external_id
+Revises: add_category_external_id
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "add_variant_external_id"
+down_revision: Union[str, None] = "add_category_external_id"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "product_variants",
+        sa.Column("external_id", sa.String(255), nullable=True),
+    )
+    op.create_index("ix_product_variants_external_id", "product_variants", ["external_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_variants_external_id", table_name="product_variants")
+    op.drop_column("product_variants", "external_id")
@@ -5,7 +5,7 @@ import os
 import uuid
 import shutil
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import List, Optional, Set, Tuple
 
@@ -16,7 +16,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
 from app.config import settings, ProductSource
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.db.models.user import User
 from app.db.models.order import Order, OrderItem
 from app.db.models.product import Product, product_category
@@ -29,6 +29,7 @@ from app.db.models.promo import PromoCode
 from app.db.models.banner import Banner
 from app.db.models.app_config import AppConfig
 from app.db.models.bonus_transaction import BonusTransaction
+from app.db.models.mailing import MailingJob
 from app.api.deps import get_admin_user
 from app.schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse, ProductListResponse,
@@ -39,13 +40,28 @@ from app.schemas.product import (
     ProductVariantCreate, ProductVariantUpdate, ProductVariantResponse,
     ModificationTypeShort, ProductVariantShort,
 )
-from app.schemas.order import OrderResponse, OrderListResponse, OrderStatusUpdate
+from app.schemas.order import (
+    OrderResponse, OrderListResponse, OrderStatusUpdate,
+    OrderExportRetryRequest, OrderExportRetryResponse,
+)
 from app.schemas.promo import PromoCodeCreate, PromoCodeResponse
 from app.schemas.banner import BannerResponse, BannerCreate, BannerUpdate
-from app.schemas.mailing import MailingRequest, MailingResponse
+from app.schemas.mailing import (
+    MailingRequest,
+    MailingJobResponse,
+    SegmentPreviewRequest,
+    SegmentPreviewResponse,
+)
 from app.bot.bot import get_bot, is_bot_configured
-from app.services.product_loader import get_product_loader
-from app.services.mailing_service import send_broadcast
+from app.services.sync_coordinator import sync_coordinator
+from app.services.mailing_jobs import (
+    create_job as create_mailing_job,
+    mailing_runner,
+    throughput as mailing_throughput,
+)
+from app.services.product_cards import product_cards
+from app.services.search import product_search
+from app.services.segments import count_recipients, resolve_segment
 
 logger = logging.getLogger(__name__)
 
@@ -62,11 +78,11 @@ router = APIRouter()
 
 @router.get("/stats")
 async def get_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     admin: User = Depends(get_admin_user),
 ):
     """Get dashboard statistics."""
-    now = datetime.utcnow()
+    now = datetime.now(timezone.utc)
     month_ago = now - timedelta(days=30)
     week_ago = now - timedelta(days=7)
 
@@ -222,6 +238,24 @@ async def admin_update_order(
     return _order_to_response(order)
 
 
+@router.post("/orders/export/retry", response_model=OrderExportRetryResponse)
+async def admin_retry_order_export(
+    data: OrderExportRetryRequest,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Put failed MoySklad order exports back in the queue (all or the given orders)."""
+    from app.services.order_export import order_exporter, requeue_failed
+
+    if not order_exporter.enabled:
+        raise HTTPException(status_code=400, detail="Order export is disabled")
+    requeued = await requeue_failed(db, data.order_ids)
+    await db.commit()
+    if requeued:
+        order_exporter.wake()
+    return OrderExportRetryResponse(requeued=requeued)
+
+
 # ---- Product management ----
 
 def _admin_search_filter(search: str):
@@ -363,6 +397,8 @@ async def admin_bulk_price(
         product.price = Decimal(f"{p:.2f}")
         updated_ids.append(product.id)
     await db.commit()
+    product_cards.invalidate()
+    product_search.invalidate()
     return BulkPriceResponse(updated_count=len(updated_ids), product_ids=updated_ids)
 
 
@@ -454,6 +490,7 @@ async def admin_create_product(
         if cid:
             await db.execute(product_category.insert().values(product_id=product.id, category_id=cid))
     await db.commit()
+    product_search.invalidate()
 
     result = await db.execute(
         select(Product)
@@ -491,6 +528,9 @@ async def admin_update_product(
         update_data["old_price"] = Decimal(format(round(p, 2), ".2f"))
     for key, value in update_data.items():
         setattr(product, key, value)
+    if product.external_id:
+        # Local edit — let the next sync reconcile this row with upstream
+        product.sync_hash = None
 
     if category_ids is not None:
         await db.execute(product_category.delete().where(product_category.c.product_id == product_id))
@@ -499,6 +539,8 @@ async def admin_update_product(
                 await db.execute(product_category.insert().values(product_id=product_id, category_id=cid))
 
     await db.commit()
+    product_cards.invalidate(product_id)
+    product_search.invalidate()
 
     result = await db.execute(
         select(Product)
@@ -527,6 +569,8 @@ async def admin_delete_product(
 
     await db.delete(product)
     await db.commit()
+    product_cards.invalidate(product_id)
+    product_search.invalidate()
     return {"ok": True}
 
 
@@ -594,6 +638,8 @@ async def admin_upload_media(
     )
     db.add(media)
     await db.commit()
+    product_cards.invalidate(product_id)
+    product_search.invalidate()
     await db.refresh(media)
 
     return ProductMediaResponse(
@@ -629,6 +675,8 @@ async def admin_delete_media(
 
     await db.delete(media)
     await db.commit()
+    product_cards.invalidate(product_id)
+    product_search.invalidate()
     return {"ok": True}
 
 
@@ -653,6 +701,8 @@ async def admin_reorder_media(
 
     media.sort_order = sort_order
     await db.commit()
+    product_cards.invalidate(product_id)
+    product_search.invalidate()
     await db.refresh(media)
 
     return ProductMediaResponse(
@@ -802,6 +852,7 @@ async def admin_update_category(
         setattr(category, key, value)
 
     await db.commit()
+    product_cards.invalidate()
     await db.refresh(category)
     return CategoryResponse.model_validate({
         "id": category.id,
@@ -829,6 +880,7 @@ async def admin_delete_category(
         raise HTTPException(status_code=400, detail="Нельзя удалить категорию «Все»")
     await db.delete(category)
     await db.commit()
+    product_cards.invalidate()
     return {"ok": True}
 
 
@@ -1275,13 +1327,57 @@ async def admin_upload_mailing_image(
     return {"url": url}
 
 
-@router.post("/mailing", response_model=MailingResponse)
+def _mailing_job_response(job: MailingJob) -> MailingJobResponse:
+    return MailingJobResponse(
+        id=job.id,
+        name=job.name,
+        audience=job.audience,
+        segment=job.segment,
+        status=job.status,
+        sent=job.sent,
+        failed=job.failed,
+        blocked=job.blocked,
+        total=job.total,
+        remaining=max(job.total - job.sent - job.failed, 0),
+        throughput=mailing_throughput(job),
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+async def _get_mailing_job(db: AsyncSession, job_id: int) -> MailingJob:
+    job = await db.get(MailingJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Mailing not found")
+    return job
+
+
+@router.post("/mailing/preview", response_model=SegmentPreviewResponse)
+async def admin_preview_mailing(
+    data: SegmentPreviewRequest,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Number of recipients the audience / segment would reach."""
+    segment = resolve_segment(data.audience, data.segment)
+    count = await count_recipients(db, segment, include_blocked=data.include_blocked)
+    return SegmentPreviewResponse(count=count)
+
+
+@router.post("/mailing", response_model=MailingJobResponse)
 async def admin_send_mailing(
     data: MailingRequest,
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_admin_user),
 ):
-    """Send a broadcast to the selected audience (all / has_orders / has_cart / has_favorites / no_orders)."""
+    """Queue a broadcast to the selected audience (all / has_orders / has_cart / has_favorites / no_orders)
+    or to ``segment`` when given.
+
+    Recipients are stored with the job and sent in the background; poll
+    ``GET /mailing/{id}`` for progress.
+    """
     if not is_bot_configured():
         raise HTTPException(status_code=400, detail="Bot not configured — mailing unavailable")
     if not get_bot():
@@ -1289,24 +1385,107 @@ async def admin_send_mailing(
     if not (data.text or "").strip():
         raise HTTPException(status_code=400, detail="Text is required")
 
-    result = await send_broadcast(
-        db=db,
+    job = await create_mailing_job(
+        db,
         audience=data.audience,
         text=data.text.strip(),
-        photo_url=data.image_url or None,
+        name=(data.name or "").strip() or None,
+        image_url=data.image_url or None,
         button_text=data.button_text or None,
         button_url=data.button_url or None,
+        created_by=admin.id,
+        segment=data.segment,
+        include_blocked=data.include_blocked,
     )
-    return MailingResponse(**result)
+    await db.commit()
+    await db.refresh(job)
+    mailing_runner.wake()
+    return _mailing_job_response(job)
+
+
+@router.get("/mailing", response_model=List[MailingJobResponse])
+async def admin_list_mailings(
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Recent broadcasts, newest first."""
+    result = await db.execute(select(MailingJob).order_by(MailingJob.id.desc()).limit(20))
+    return [_mailing_job_response(job) for job in result.scalars().all()]
+
+
+@router.get("/mailing/{job_id}", response_model=MailingJobResponse)
+async def admin_get_mailing(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Broadcast progress: sent / failed / remaining and throughput."""
+    return _mailing_job_response(await _get_mailing_job(db, job_id))
+
+
+@router.post("/mailing/{job_id}/pause", response_model=MailingJobResponse)
+async def admin_pause_mailing(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    job = await _get_mailing_job(db, job_id)
+    if job.status not in ("pending", "running"):
+        raise HTTPException(status_code=400, detail=f"Mailing is {job.status}")
+    job.status = "paused"
+    await db.commit()
+    await db.refresh(job)
+    mailing_runner.interrupt(job.id)
+    return _mailing_job_response(job)
+
+
+@router.post("/mailing/{job_id}/resume", response_model=MailingJobResponse)
+async def admin_resume_mailing(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Continue a paused (or failed) broadcast from its last checkpoint."""
+    job = await _get_mailing_job(db, job_id)
+    if job.status not in ("paused", "failed"):
+        raise HTTPException(status_code=400, detail=f"Mailing is {job.status}")
+    job.status = "pending"
+    job.error = None
+    job.finished_at = None
+    await db.commit()
+    await db.refresh(job)
+    mailing_runner.wake()
+    return _mailing_job_response(job)
+
+
+@router.post("/mailing/{job_id}/cancel", response_model=MailingJobResponse)
+async def admin_cancel_mailing(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    job = await _get_mailing_job(db, job_id)
+    if job.status not in ("pending", "running", "paused"):
+        raise HTTPException(status_code=400, detail=f"Mailing is {job.status}")
+    job.status = "cancelled"
+    job.finished_at = datetime.now(timezone.utc)
+    await db.commit()
+    await db.refresh(job)
+    mailing_runner.interrupt(job.id)
+    return _mailing_job_response(job)
 
 
 # ---- Product Sync (MoySklad / 1C) ----
 
-@router.post("/sync")
+@router.post("/sync", status_code=202)
 async def admin_sync_products(
     admin: User = Depends(get_admin_user),
 ):
-    """Sync products from external source (MoySklad / 1C)."""
+    """Start a background sync from the external source (MoySklad / 1C).
+
+    Returns the job id right away; if a sync is already running its job is
+    returned instead of starting another one.  Poll ``GET /sync/{job_id}``.
+    """
     if settings.product_source == ProductSource.DATABASE:
         raise HTTPException(
             status_code=400,
@@ -1314,17 +1493,24 @@ async def admin_sync_products(
                    "Set PRODUCT_SOURCE=moysklad or PRODUCT_SOURCE=one_c in .env",
         )
 
-    loader = get_product_loader()
-    try:
-        synced = await loader.sync_products()
-        return {
-            "ok": True,
-            "source": settings.product_source.value,
-            "synced": synced,
-        }
-    except Exception as e:
-        logger.error(f"Sync failed: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
+    # Another worker holds the lease: follow its job instead of starting one that gets skipped
+    running = await sync_coordinator.running_elsewhere()
+    if running is not None:
+        return {"ok": True, **running}
+    job = sync_coordinator.start("admin")
+    return {"ok": True, **job.as_dict()}
+
+
+@router.get("/sync/{job_id}")
+async def admin_sync_progress(
+    job_id: str,
+    admin: User = Depends(get_admin_user),
+):
+    """Progress of a sync job (run by any worker): phase, rows processed, throughput and ETA."""
+    job = await sync_coordinator.load(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return job
 
 
 # ---- Settings ----
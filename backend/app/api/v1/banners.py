@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_read_db
 from app.db.models.banner import Banner
 from app.schemas.banner import BannerResponse
 
@@ -12,7 +12,7 @@ router = APIRouter()
 
 
 @router.get("/banners", response_model=List[BannerResponse])
-async def get_banners(db: AsyncSession = Depends(get_db)):
+async def get_banners(db: AsyncSession = Depends(get_read_db)):
     """List active banners for catalog, ordered by sort_order."""
     result = await db.execute(
         select(Banner)
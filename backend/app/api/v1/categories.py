@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import async_session, get_read_db
 from app.db.models.category import Category
 from app.db.models.product import Product, product_category
 from app.db.models.product_variant import ProductVariant
@@ -75,14 +75,22 @@ def _build_category_tree(
     return sorted(out, key=lambda x: (x.sort_order, x.name))
 
 
+async def _ensure_all_category() -> None:
+    """Create the «Все» category on the primary (the request itself reads from a replica)."""
+    async with async_session() as db:
+        result = await db.execute(select(Category).where(Category.slug == "all"))
+        if result.scalar_one_or_none() is None:
+            db.add(Category(name="Все", slug="all", sort_order=0, is_active=True, parent_id=None))
+            await db.commit()
+
+
 @router.get("/categories", response_model=List[CategoryResponse])
-async def get_categories(db: AsyncSession = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_read_db)):
     """Get active categories as tree (roots with children). Only categories with in-stock products or with such descendants."""
     # Категория «Все» (slug all) создаётся при первом запросе, если её нет
-    result = await db.execute(select(Category).where(Category.slug == "all"))
+    result = await db.execute(select(Category.id).where(Category.slug == "all"))
     if result.scalar_one_or_none() is None:
-        db.add(Category(name="Все", slug="all", sort_order=0, is_active=True, parent_id=None))
-        await db.commit()
+        await _ensure_all_category()
     has_in_stock = _category_has_stock()
     # Categories that have at least one in-stock product
     result = await db.execute(
@@ -119,7 +127,7 @@ async def get_categories(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
-async def get_category(category_id: int, db: AsyncSession = Depends(get_db)):
+async def get_category(category_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get a single category by id."""
     result = await db.execute(select(Category).where(Category.id == category_id))
     category = result.scalar_one_or_none()
@@ -7,7 +7,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.db.models.favorite import Favorite
 from app.db.models.product import Product
 from app.db.models.product_variant import ProductVariant
@@ -21,7 +21,7 @@ router = APIRouter()
 
 @router.get("/favorites", response_model=List[ProductResponse])
 async def get_favorites(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """Get user's favorites."""
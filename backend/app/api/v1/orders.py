@@ -20,6 +20,7 @@ from app.db.models.bonus_transaction import BonusTransaction
 from app.api.deps import get_current_user
 from app.schemas.order import OrderCreate, OrderResponse, OrderListResponse, OrderItemResponse
 from app.bot.handlers.admin_notify import notify_new_order
+from app.services.order_export import order_exporter
 
 router = APIRouter()
 
@@ -251,6 +252,7 @@ async def create_order(
         address_coords=data.address_coords,
         delivery_service=data.delivery_service,
         promo_code_id=promo_code_id,
+        export_status="pending" if order_exporter.enabled else None,
     )
     db.add(order)
     await db.flush()
@@ -304,6 +306,8 @@ async def create_order(
     await db.execute(delete(CartItem).where(CartItem.user_id == user.id))
     await db.commit()
     await db.refresh(order)
+    if order.export_status == "pending":
+        order_exporter.wake()
 
     # Notify admin
     try:
@@ -52,7 +52,7 @@ async def _get_or_create_config(db: AsyncSession) -> AppConfig:
             payment_provider_token=settings.payment_provider_token,
             yandex_maps_key=settings.yandex_maps_key,
             support_link=settings.support_link or None,
-            sync_interval_minutes=settings.sync_interval_minutes,
+            sync_interval_minutes=settings.full_sync_interval_minutes,
         )
         db.add(config)
         await db.commit()
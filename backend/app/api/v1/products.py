@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import re
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -8,14 +7,17 @@ from sqlalchemy import func, select, or_, and_, exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.db.session import get_db
+from app.db.session import get_read_db
 from app.db.models.product import Product, product_category
 from app.db.models.product_media import ProductMedia
 from app.db.models.product_variant import ProductVariant
+from app.db.models.stock_level import StockLevel
 from app.db.models.category import Category
 from app.db.models.favorite import Favorite
 from app.db.models.user import User
 from app.api.deps import get_current_user
+from app.services.search import normalize_search
+from app.services.stock_levels import store_availability
 from app.schemas.product import (
     ProductResponse, ProductListResponse, ProductMediaResponse,
     ModificationTypeShort, ProductVariantShort,
@@ -23,6 +25,10 @@ from app.schemas.product import (
 
 router = APIRouter()
 
+# Above this many in-stock products the store filter is an indexed EXISTS
+# instead of an IN list (bound-parameter limits)
+_STORE_FILTER_IN_LIMIT = 5000
+
 
 def _build_media_list(product: Product) -> list[ProductMediaResponse]:
     """Build sorted media list: videos first, then images. Falls back to image_url."""
@@ -79,15 +85,6 @@ def _build_variant_data(product: Product) -> tuple[ModificationTypeShort | None,
     return mod_type, short_variants
 
 
-def _normalize_search(text: str) -> str:
-    """Normalize search text: lowercase, ё→е, strip extra spaces."""
-    text = text.lower().strip()
-    text = text.replace("ё", "е")
-    # Collapse multiple spaces
-    text = re.sub(r"\s+", " ", text)
-    return text
-
-
 def _escape_like(value: str) -> str:
     """Escape % and _ for use in LIKE patterns."""
     return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -99,7 +96,7 @@ def _build_search_filters(search: str):
     either name or description (case-insensitive).
     Uses COALESCE(description, '') so NULL description does not break the OR.
     """
-    normalized = _normalize_search(search)
+    normalized = normalize_search(search)
     if not normalized:
         return True  # no filter
     # Allow words of length 1+ so single letter/number search works
@@ -139,9 +136,10 @@ async def get_products(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     in_stock: Optional[bool] = None,
+    store_id: Optional[int] = None,
     sort_by: str = Query("created_at", pattern="^(price|name|created_at)$"),
     sort_order: str = Query("desc", pattern="^(asc|desc)$"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """Get paginated products with filters."""
@@ -178,6 +176,22 @@ async def get_products(
         query = query.where(Product.price >= min_price)
     if max_price is not None:
         query = query.where(Product.price <= max_price)
+    if store_id is not None:
+        # Available at this pickup point (per-store stock, see services/stock_levels)
+        store_product_ids = await store_availability.product_ids(store_id)
+        if len(store_product_ids) <= _STORE_FILTER_IN_LIMIT:
+            query = query.where(Product.id.in_(store_product_ids))
+        else:
+            query = query.where(
+                select(StockLevel.id)
+                .where(
+                    StockLevel.product_id == Product.id,
+                    StockLevel.store_id == store_id,
+                    StockLevel.quantity > 0,
+                )
+                .correlate(Product)
+                .exists()
+            )
 
     # Count
     count_query = select(func.count()).select_from(query.subquery())
@@ -253,7 +267,7 @@ async def get_products(
 @router.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """Get a single product by id."""
@@ -0,0 +1,46 @@
+from typing import List
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_db
+from app.db.models.product_variant import ProductVariant
+from app.db.models.stock_level import StockLevel
+from app.db.models.store import Store
+from app.schemas.store import ProductStoreStock, StoreResponse, StoreVariantStock
+from app.services.stock_levels import store_availability
+
+router = APIRouter()
+
+
+@router.get("/stores", response_model=List[StoreResponse])
+async def get_stores(db: AsyncSession = Depends(get_db)):
+    """Active stores / pickup points with the number of products in stock there."""
+    result = await db.execute(select(Store).where(Store.is_active == True).order_by(Store.name))
+    counts = await store_availability.counts()
+    return [
+        StoreResponse(id=s.id, name=s.name, address=s.address, available_products=counts.get(s.id, 0))
+        for s in result.scalars().all()
+    ]
+
+
+@router.get("/products/{product_id}/stores", response_model=List[ProductStoreStock])
+async def get_product_stores(product_id: int, db: AsyncSession = Depends(get_db)):
+    """Per-store quantities of one product (and its variants) for the pickup flow."""
+    result = await db.execute(
+        select(StockLevel.store_id, StockLevel.quantity, ProductVariant.value, Store.name, Store.address)
+        .join(Store, Store.id == StockLevel.store_id)
+        .outerjoin(ProductVariant, ProductVariant.id == StockLevel.variant_id)
+        .where(StockLevel.product_id == product_id, Store.is_active == True)
+        .order_by(Store.name, ProductVariant.value)
+    )
+    by_store: dict[int, ProductStoreStock] = {}
+    for store_id, quantity, variant_value, name, address in result.all():
+        entry = by_store.setdefault(
+            store_id, ProductStoreStock(store_id=store_id, name=name, address=address, quantity=0)
+        )
+        entry.quantity += quantity
+        if variant_value is not None:
+            entry.variants.append(StoreVariantStock(value=variant_value, quantity=quantity))
+    return list(by_store.values())
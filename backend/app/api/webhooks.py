@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.bot.bot import feed_webhook_update, get_bot, use_webhook, webhook_secret
+from app.config import settings, ProductSource
+from app.services.moysklad_webhook import moysklad_webhooks
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/moysklad")
+async def moysklad_webhook(request: Request, token: str = ""):
+    """Receive MoySklad entity notifications (register the URL with ``?token=``).
+
+    Only records the ids; the changes are applied in the background after
+    the burst settles, so MoySklad gets its answer immediately.
+    """
+    expected = settings.moysklad_webhook_token
+    if settings.product_source != ProductSource.MOYSKLAD or not expected:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secrets.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    events = body.get("events") if isinstance(body, dict) else None
+    if not isinstance(events, list):
+        raise HTTPException(status_code=400, detail="No events")
+
+    accepted = moysklad_webhooks.add(events)
+    return {"accepted": accepted}
+
+
+@router.post("/telegram")
+async def telegram_webhook(request: Request):
+    """Receive bot updates from Telegram (``BOT_MODE=webhook``).
+
+    Requests without the secret token set in ``setWebhook`` are rejected;
+    the update is handled in the background.
+    """
+    if not use_webhook() or get_bot() is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not secrets.compare_digest(token, webhook_secret()):
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    try:
+        feed_webhook_update(payload)
+    except ValueError as e:
+        logger.warning(f"Malformed Telegram update: {e}")
+        raise HTTPException(status_code=400, detail="Invalid update")
+    return {"ok": True}
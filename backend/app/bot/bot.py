@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+from typing import Any
+from urllib.parse import urlparse
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -18,6 +22,11 @@ _bot_photo_bytes: bytes | None = None
 _bot_photo_content_type: str = "image/jpeg"
 _bot_username: str | None = None
 
+WEBHOOK_PATH = "/webhook/telegram"
+
+# Updates being handled in webhook mode (kept referenced until done)
+_webhook_tasks: set[asyncio.Task] = set()
+
 
 def is_bot_configured() -> bool:
     """Check if a real bot token is set."""
@@ -75,10 +84,98 @@ async def fetch_and_cache_bot_photo():
 
 
 async def setup_bot():
-    """Register all handlers and setup bot commands."""
-    from app.bot.handlers import start, orders as order_handlers
+    """Register all handlers and setup bot commands.
+
+    Network calls (profile photo, username) are not made here — run
+    :func:`fetch_and_cache_bot_photo` in the background after startup.
+    """
+    from app.bot.handlers import start, orders as order_handlers, chat_member, inline
     dp.include_router(start.router)
     dp.include_router(order_handlers.router)
+    dp.include_router(chat_member.router)
+    dp.include_router(inline.router)
+
+    if settings.bot_throttle_rate > 0:
+        from app.bot.middlewares.throttle import ThrottleMiddleware
+
+        throttle = ThrottleMiddleware(
+            rate_limit=settings.bot_throttle_rate,
+            burst=settings.bot_throttle_burst,
+            redis_url=settings.redis_url or None,
+        )
+        dp.message.middleware(throttle)
+        dp.callback_query.middleware(throttle)
+
+
+def use_webhook() -> bool:
+    return settings.bot_mode.strip().lower() == "webhook"
+
+
+def webhook_url() -> str:
+    if settings.bot_webhook_url.strip():
+        return settings.bot_webhook_url.strip()
+    base = settings.public_base_url.strip()
+    if not base:
+        parsed = urlparse(settings.webapp_url)
+        base = f"{parsed.scheme}://{parsed.netloc}"
+    return base.rstrip("/") + WEBHOOK_PATH
+
+
+def webhook_secret() -> str:
+    """Secret token Telegram sends with every webhook request.
+
+    Derived from the bot token unless configured, so every worker agrees
+    on it without extra settings.
+    """
+    if settings.bot_webhook_secret.strip():
+        return settings.bot_webhook_secret.strip()
+    return hashlib.sha256(f"webhook:{settings.bot_token}".encode("utf-8")).hexdigest()
+
+
+async def setup_webhook() -> bool:
+    """Point Telegram at :func:`webhook_url`; False if it was refused."""
+    b = get_bot()
+    if not b:
+        return False
+    url = webhook_url()
+    if not url.startswith("https://"):
+        logger.warning(f"Webhook URL must be https, got {url}")
+        return False
+    try:
+        await b.set_webhook(
+            url,
+            secret_token=webhook_secret(),
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    except Exception as e:
+        logger.warning(f"Failed to set bot webhook: {e}")
+        return False
+    logger.info(f"Bot webhook set: {url}")
+    return True
+
+
+async def _process_update(update: Any) -> None:
+    try:
+        await dp.feed_update(get_bot(), update)
+    except Exception as e:
+        logger.error(f"Failed to process update {update.update_id}: {e}", exc_info=True)
+
+
+def feed_webhook_update(payload: dict) -> None:
+    """Handle an update from the webhook in the background.
+
+    Telegram gets its 200 at once and does not wait for (or retry on)
+    slow handlers; updates are processed concurrently.
+    """
+    from aiogram.types import Update
+
+    update = Update.model_validate(payload, context={"bot": get_bot()})
+    task = asyncio.create_task(_process_update(update))
+    _webhook_tasks.add(task)
+    task.add_done_callback(_webhook_tasks.discard)
+
 
-    # Cache bot photo
-    await fetch_and_cache_bot_photo()
+async def wait_webhook_updates(timeout: float = 10.0) -> None:
+    """Let updates in flight finish on shutdown."""
+    if _webhook_tasks:
+        await asyncio.wait(set(_webhook_tasks), timeout=timeout)
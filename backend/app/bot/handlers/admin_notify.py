@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import logging
 
-from app.bot.bot import get_bot, is_bot_configured
+from app.bot.bot import is_bot_configured
 from app.config import settings
+from app.services.admin_notifier import OrderNotice, admin_notifier
 
 logger = logging.getLogger(__name__)
 
@@ -18,13 +19,11 @@ async def notify_new_order(
     items_text: str,
     bonus_used: float = 0,
 ):
-    """Send new order notification to admin chat."""
+    """Queue new order notification to admin chats (sent in the background)."""
     if not is_bot_configured():
         logger.info(f"[DEV] Order #{order_id} created — bot not configured, skipping notification")
         return
-
-    bot = get_bot()
-    if not bot:
+    if not settings.admin_chat_id_list:
         return
 
     text = (
@@ -46,7 +45,10 @@ async def notify_new_order(
     text += f"\n🛒 <b>Товары:</b>\n{items_text}\n"
     text += f"\n💰 <b>Итого:</b> {total:.2f} ₽"
 
-    await bot.send_message(
-        chat_id=settings.admin_chat_id,
+    admin_notifier.add(OrderNotice(
+        order_id=order_id,
+        customer_name=customer_name,
+        total=total,
+        delivery_type=delivery_type,
         text=text,
-    )
+    ))
@@ -0,0 +1,29 @@
+import logging
+
+from aiogram import F, Router, types
+from aiogram.enums import ChatMemberStatus, ChatType
+
+from app.db.session import async_session
+from app.services.mailing_service import set_bot_blocked
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+
+@router.my_chat_member(F.chat.type == ChatType.PRIVATE)
+async def on_bot_status_change(update: types.ChatMemberUpdated):
+    """Track users blocking / unblocking the bot so broadcasts skip them."""
+    status = update.new_chat_member.status
+    if status == ChatMemberStatus.KICKED:
+        blocked = True
+    elif status == ChatMemberStatus.MEMBER:
+        blocked = False
+    else:
+        return
+    try:
+        async with async_session() as db:
+            await set_bot_blocked(db, update.chat.id, blocked)
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Failed to update bot status for {update.chat.id}: {e}")
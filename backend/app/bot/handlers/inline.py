@@ -0,0 +1,96 @@
+import logging
+
+from aiogram import Router, types
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InlineQueryResultPhoto,
+    InputTextMessageContent,
+)
+
+from app.bot.bot import get_bot_username
+from app.services.search import SearchHit, product_search
+from app.services.telegram_files import absolute_url
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Telegram allows up to 50 results per answer
+PAGE_SIZE = 20
+# Seconds Telegram may reuse an answer for the same query (shared by all users)
+CACHE_TIME = 300
+
+
+def _caption(hit: SearchHit) -> str:
+    parts = [f"<b>{hit.name}</b>", f"💰 <b>{hit.price:,.0f} ₽</b>"]
+    if hit.old_price:
+        parts.append(f"<s>{hit.old_price:,.0f} ₽</s>")
+    if hit.description:
+        desc = hit.description[:200]
+        if len(hit.description) > 200:
+            desc += "..."
+        parts.append(f"\n{desc}")
+    return "\n".join(parts)
+
+
+def _keyboard(hit: SearchHit) -> InlineKeyboardMarkup | None:
+    # Web App buttons are not allowed in inline messages: link to the bot's product card
+    username = get_bot_username()
+    if not username:
+        return None
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🔍 Посмотреть товар",
+                    url=f"https://t.me/{username}?start=product_{hit.id}",
+                )
+            ]
+        ]
+    )
+
+
+def _result(hit: SearchHit):
+    caption = _caption(hit)
+    keyboard = _keyboard(hit)
+    image = absolute_url(hit.image_url) if hit.image_url else ""
+    if image.startswith("https://"):
+        return InlineQueryResultPhoto(
+            id=str(hit.id),
+            photo_url=image,
+            thumbnail_url=image,
+            title=hit.name,
+            description=f"{hit.price:,.0f} ₽",
+            caption=caption,
+            reply_markup=keyboard,
+        )
+    return InlineQueryResultArticle(
+        id=str(hit.id),
+        title=hit.name,
+        description=f"{hit.price:,.0f} ₽",
+        input_message_content=InputTextMessageContent(message_text=caption),
+        reply_markup=keyboard,
+    )
+
+
+@router.inline_query()
+async def inline_search(query: types.InlineQuery):
+    """Search the catalog as the user types ``@bot query``."""
+    try:
+        offset = max(int(query.offset or 0), 0)
+    except ValueError:
+        offset = 0
+    try:
+        hits, total = await product_search.search(query.query, offset, PAGE_SIZE)
+    except Exception as e:
+        logger.error(f"Inline search failed: {e}", exc_info=True)
+        hits, total = [], 0
+    next_offset = str(offset + len(hits)) if offset + len(hits) < total else ""
+    await query.answer(
+        [_result(hit) for hit in hits],
+        cache_time=CACHE_TIME,
+        is_personal=False,
+        next_offset=next_offset,
+    )
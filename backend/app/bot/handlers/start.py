@@ -48,90 +48,49 @@ async def cmd_start(message: types.Message, command: CommandObject):
 async def _send_product_message(message: types.Message, product_id: int, webapp_url: str):
     """Send product info with image and a button to open it in the Mini App."""
     try:
-        from sqlalchemy import select
-        from sqlalchemy.orm import selectinload
-        from app.db.session import async_session
-        from app.db.models.product import Product
-
-        async with async_session() as db:
-            result = await db.execute(
-                select(Product)
-                .where(Product.id == product_id)
-                .options(
-                    selectinload(Product.categories),
-                    selectinload(Product.media),
-                )
-            )
-            product = result.scalar_one_or_none()
+        from app.services.product_cards import product_cards
 
-        if not product:
+        # Rendered once, then served from memory until the product changes
+        card = await product_cards.get(product_id, webapp_url)
+        if card is None:
             await message.answer("Товар не найден 😔")
             return
 
-        # Build text
-        text_parts = [f"<b>{product.name}</b>"]
-        if product.categories:
-            cat_names = ", ".join(c.name for c in product.categories)
-            text_parts.append(f"📂 {cat_names}")
-        text_parts.append(f"💰 <b>{product.price:,.0f} ₽</b>")
-        if product.old_price:
-            text_parts.append(f"<s>{product.old_price:,.0f} ₽</s>")
-        if product.description:
-            desc = product.description[:200]
-            if len(product.description) > 200:
-                desc += "..."
-            text_parts.append(f"\n{desc}")
-
-        if product.stock_quantity <= 0:
-            text_parts.append("\n⚠️ Нет в наличии")
-
-        text = "\n".join(text_parts)
-
-        # Button to open product in Mini App
-        product_url = f"{webapp_url}/product/{product_id}"
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="🔍 Посмотреть товар",
-                        web_app=WebAppInfo(url=product_url),
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text="🛍 Открыть магазин",
-                        web_app=WebAppInfo(url=webapp_url),
-                    )
-                ],
-            ]
-        )
-
-        # Try to send with photo
-        image_url = None
-        if product.media:
-            # Get first image
-            for m in sorted(product.media, key=lambda x: x.sort_order):
-                if m.media_type == "image":
-                    image_url = m.file_path
-                    break
-        if not image_url and product.image_url:
-            image_url = product.image_url
-
-        if image_url and image_url.startswith("http"):
+        if card.image_url:
             try:
-                await message.answer_photo(
-                    photo=image_url,
-                    caption=text,
-                    reply_markup=keyboard,
+                if card.photo_file_id:
+                    try:
+                        await message.answer_photo(
+                            photo=card.photo_file_id,
+                            caption=card.caption,
+                            reply_markup=card.keyboard,
+                        )
+                        return
+                    except Exception as e:
+                        logger.info(f"Cached card photo rejected for product {product_id}: {e}")
+                        card.photo_file_id = None
+
+                from app.services.telegram_files import telegram_files
+
+                # Uploaded once, then sent by the cached file_id
+                sent = await telegram_files.send_photo(
+                    lambda photo: message.answer_photo(
+                        photo=photo,
+                        caption=card.caption,
+                        reply_markup=card.keyboard,
+                    ),
+                    card.image_url,
                 )
+                if getattr(sent, "photo", None):
+                    card.photo_file_id = sent.photo[-1].file_id
                 return
             except Exception as e:
                 logger.warning(f"Failed to send photo for product {product_id}: {e}")
 
         # Fallback: text only
         await message.answer(
-            text,
-            reply_markup=keyboard,
+            card.caption,
+            reply_markup=card.keyboard,
         )
 
     except Exception as e:
@@ -1,15 +1,89 @@
-from typing import Any, Awaitable, Callable, Dict
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject
+from aiogram.types import CallbackQuery, TelegramObject, User
+
+logger = logging.getLogger(__name__)
+
+_REDIS_RETRY_SECONDS = 30.0
+
+# KEYS[1] = bucket; ARGV = rate, burst, now. Returns 1 if a token was taken.
+_REDIS_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return allowed
+"""
 
 
 class ThrottleMiddleware(BaseMiddleware):
-    """Simple throttle middleware to prevent spam."""
+    """Per-user token bucket: ``rate`` events per second, bursts up to ``burst``.
+
+    Buckets live in a bounded LRU (``max_users``), or in Redis when
+    ``redis_url`` is given so that all workers share them; if Redis is
+    unreachable the local buckets are used.  Throttled messages are
+    dropped, throttled callback queries get a short answer.
+    """
+
+    def __init__(
+        self,
+        rate_limit: float = 1.0,
+        burst: int = 5,
+        max_users: int = 10_000,
+        redis_url: Optional[str] = None,
+    ):
+        self.rate_limit = max(rate_limit, 0.001)
+        self.burst = max(burst, 1)
+        self.max_users = max_users
+        self._buckets: OrderedDict[int, Tuple[float, float]] = OrderedDict()
+        self._redis_script = None
+        # After a Redis error, use local buckets until this moment
+        self._redis_retry_at = 0.0
+        if redis_url:
+            try:
+                from redis.asyncio import Redis
+
+                self._redis_script = Redis.from_url(redis_url).register_script(_REDIS_BUCKET)
+            except ImportError:
+                logger.warning("redis is not installed — throttling per worker")
 
-    def __init__(self, rate_limit: float = 0.5):
-        self.rate_limit = rate_limit
-        self._last_call: Dict[int, float] = {}
+    def _take_local(self, user_id: int) -> bool:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(user_id, (float(self.burst), now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate_limit)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[user_id] = (tokens, now)
+        while len(self._buckets) > self.max_users:
+            self._buckets.popitem(last=False)
+        return allowed
+
+    async def allow(self, user_id: int) -> bool:
+        if self._redis_script is not None and time.monotonic() >= self._redis_retry_at:
+            try:
+                result = await self._redis_script(
+                    keys=[f"throttle:{user_id}"], args=[self.rate_limit, self.burst, time.time()]
+                )
+                return bool(int(result))
+            except Exception as e:
+                self._redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+                logger.warning(f"Redis throttle failed, using local buckets: {e}")
+        return self._take_local(user_id)
 
     async def __call__(
         self,
@@ -17,9 +91,12 @@ class ThrottleMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        return await handler(event, data)
-
-
-
-
-
+        user: Optional[User] = data.get("event_from_user")
+        if user is None or await self.allow(user.id):
+            return await handler(event, data)
+        if isinstance(event, CallbackQuery):
+            try:
+                await event.answer("Слишком много запросов, подождите немного")
+            except Exception:
+                pass
+        return None
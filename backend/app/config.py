@@ -22,6 +22,7 @@ class ProductSource(str, Enum):
     DATABASE = "database"
     MOYSKLAD = "moysklad"
     ONE_C = "one_c"
+    COMMERCEML = "commerceml"
 
 
 class Settings(BaseSettings):
@@ -41,8 +42,19 @@ class Settings(BaseSettings):
     bot_token: str = "YOUR_BOT_TOKEN_HERE"
     webapp_url: str = "http://localhost:3000"
     admin_chat_id: int = 0
+    # More chats for new-order notifications, comma-separated
+    admin_chat_ids: str = ""
+    # New orders are collected this long; more than admin_notify_digest_threshold go out as one digest
+    admin_notify_window_seconds: float = 3.0
+    admin_notify_digest_threshold: int = 3
     # Base URL for absolute links (e.g. photo in mailing). If empty, derived from webapp_url.
     public_base_url: str = ""
+    # "polling" (dev) or "webhook": Telegram posts updates to {public base}/webhook/telegram
+    bot_mode: str = "polling"
+    # Full webhook URL override
+    bot_webhook_url: str = ""
+    # X-Telegram-Bot-Api-Secret-Token; derived from bot_token when empty
+    bot_webhook_secret: str = ""
 
     # Modules
     checkout_type: CheckoutType = CheckoutType.BASIC
@@ -51,9 +63,35 @@ class Settings(BaseSettings):
     pickup_enabled: bool = True
     promo_enabled: bool = True
     mailing_enabled: bool = True
+    # Broadcast limits: Telegram allows ~30 messages/s per bot for bulk sends
+    mailing_rate_per_second: float = 25.0
+    mailing_concurrency: int = 16
+    # Skip recipients after this many failed deliveries in a row (0 = never); blocked users are always skipped
+    mailing_max_failures: int = 5
+    # Failures older than this many days no longer count (0 = they never expire)
+    mailing_failures_reset_days: int = 30
+    # Bot commands / button presses per user: tokens per second and burst (0 = no throttling)
+    bot_throttle_rate: float = 1.0
+    bot_throttle_burst: int = 5
+    # How long a worker serves a rendered product deep-link card without re-reading it
+    bot_card_cache_seconds: int = 300
+    # Inline-mode search index is rebuilt at least this often
+    search_index_seconds: int = 600
 
     # Sync
-    sync_interval_minutes: int = 15
+    # Full catalog sync; unset = 60 for MoySklad (the stock lane keeps stock fresh), 15 otherwise
+    sync_interval_minutes: Optional[int] = None
+    # Stock-only refresh (MoySklad), independent of the full catalog sync; 0 disables
+    stock_sync_interval_seconds: int = 60
+    # Per-store stock (MoySklad /report/stock/bystore) for several pickup points
+    stock_by_store: bool = False
+    # Fetched pages allowed to wait for the database before fetching pauses
+    sync_max_inflight_pages: int = 2
+    # Cross-worker sync lease; renewed while a sync runs, expires if the worker dies
+    sync_lease_seconds: int = 300
+    # Delta syncs fetch only entities changed since the last run; a full
+    # reconciliation (catches hard deletes) runs at most this often.
+    sync_full_interval_hours: int = 24
 
     # Support
     support_link: str = ""
@@ -62,13 +100,49 @@ class Settings(BaseSettings):
     yandex_maps_key: Optional[str] = None
     payment_provider_token: Optional[str] = None
     moysklad_token: Optional[str] = None
+    # Push new orders to MoySklad as customerorder with reserve
+    moysklad_order_export: bool = False
+    moysklad_organization_id: Optional[str] = None
+    # Counterparty for Mini App orders (e.g. "Розничный покупатель")
+    moysklad_agent_id: Optional[str] = None
+    # Warehouse the reserve is placed on
+    moysklad_store_id: Optional[str] = None
+    # POST /webhook/moysklad?token=... — disabled when empty
+    moysklad_webhook_token: Optional[str] = None
+    moysklad_webhook_debounce_seconds: float = 2.0
     one_c_endpoint: Optional[str] = None
     one_c_login: Optional[str] = None
     one_c_password: Optional[str] = None
+    # OData paging for 1C ($top/$skip); 0 reads /products as one streamed document
+    one_c_page_size: int = 1000
+    # 1C pages requested concurrently ahead of the one being processed
+    one_c_prefetch_pages: int = 4
+    # Directory 1C exchange drops CommerceML import*.xml / offers*.xml into
+    commerceml_dir: Optional[str] = None
+    # Price type (ТипЦены name) used for products; empty — the first price of an offer
+    commerceml_price_type: str = ""
 
     # Database (SQLite for local dev, PostgreSQL for production)
     database_url: str = "sqlite+aiosqlite:///./shop.db"
+    # Optional read replica for catalog, categories, banners, favorites and stats
+    database_read_url: str = ""
+    # Pool sizes; on SQLite the pool size is sqlite_write_connections, the overflow still applies
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_read_pool_size: int = 5
+    database_read_max_overflow: int = 10
+    # Replica lag above which reads go to the primary, and how often it is checked
+    database_read_max_lag_seconds: float = 5.0
+    database_read_check_seconds: float = 5.0
     redis_url: str = ""
+    # SQLite profile: WAL, synchronous=NORMAL, busy_timeout, mmap, page cache, temp_store=memory
+    sqlite_tuning: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size_mb: int = 256
+    sqlite_cache_size_mb: int = 64
+    # Request/write pool (plus database_max_overflow; 1 + 0 overflow = one writer) and read-only pool
+    sqlite_write_connections: int = 5
+    sqlite_read_connections: int = 4
 
     # Security
     admin_ids: str = ""
@@ -90,6 +164,28 @@ class Settings(BaseSettings):
                 continue
         return result
 
+    @property
+    def full_sync_interval_minutes(self) -> int:
+        if self.sync_interval_minutes is not None:
+            return self.sync_interval_minutes
+        return 60 if self.product_source == ProductSource.MOYSKLAD else 15
+
+    @property
+    def admin_chat_id_list(self) -> list[int]:
+        """Chats that get new-order notifications: admin_chat_id plus admin_chat_ids."""
+        result = [self.admin_chat_id] if self.admin_chat_id else []
+        for x in str(self.admin_chat_ids or "").split(","):
+            raw = x.strip()
+            if not raw:
+                continue
+            try:
+                chat_id = int(raw)
+            except ValueError:
+                continue
+            if chat_id not in result:
+                result.append(chat_id)
+        return result
+
 
 settings = Settings()
 
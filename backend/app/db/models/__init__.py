@@ -12,6 +12,11 @@ from app.db.models.promo import PromoCode
 from app.db.models.app_config import AppConfig
 from app.db.models.banner import Banner
 from app.db.models.bonus_transaction import BonusTransaction
+from app.db.models.sync_state import SyncState
+from app.db.models.store import Store
+from app.db.models.stock_level import StockLevel
+from app.db.models.mailing import MailingJob, MailingDelivery
+from app.db.models.telegram_file import TelegramFile
 
 __all__ = [
     "User",
@@ -29,5 +34,11 @@ __all__ = [
     "AppConfig",
     "Banner",
     "BonusTransaction",
+    "SyncState",
+    "Store",
+    "StockLevel",
+    "MailingJob",
+    "MailingDelivery",
+    "TelegramFile",
 ]
 
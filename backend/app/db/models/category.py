@@ -20,6 +20,8 @@ class Category(Base):
         ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True
     )
     image_url: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    # Group id in the upstream catalog (CommerceML); NULL for local categories
+    external_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, index=True)
 
     parent: Mapped["Category"] = relationship(
         remote_side="Category.id", back_populates="children"
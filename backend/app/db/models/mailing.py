@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Index, Integer, JSON, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from app.db.base import Base
+
+
+class MailingJob(Base):
+    """A broadcast and its progress; recipients are listed in ``mailing_deliveries``."""
+    __tablename__ = "mailing_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    audience: Mapped[str] = mapped_column(String(50), default="all")
+    # Segment filter (``app.schemas.mailing.Segment``); overrides ``audience``
+    segment: Mapped[Optional[Dict]] = mapped_column(JSON, nullable=True)
+    text: Mapped[str] = mapped_column(Text, default="")
+    image_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    button_text: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    button_url: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    # pending | running | paused | cancelled | done | failed
+    status: Mapped[str] = mapped_column(String(20), default="pending", index=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    sent: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    # Part of ``failed``: recipients who blocked the bot
+    blocked: Mapped[int] = mapped_column(Integer, default=0)
+    # Time spent sending, excluding pauses — for throughput
+    active_seconds: Mapped[float] = mapped_column(Float, default=0)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_by: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    deliveries: Mapped[List["MailingDelivery"]] = relationship(
+        back_populates="job", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class MailingDelivery(Base):
+    """One recipient of a :class:`MailingJob`."""
+    __tablename__ = "mailing_deliveries"
+    __table_args__ = (
+        Index("ix_mailing_deliveries_job_telegram", "job_id", "telegram_id", unique=True),
+        # The runner walks pending rows of a job in id order
+        Index("ix_mailing_deliveries_job_status", "job_id", "status", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[int] = mapped_column(
+        ForeignKey("mailing_jobs.id", ondelete="CASCADE"), nullable=False
+    )
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # pending | sent | failed | blocked
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    job: Mapped["MailingJob"] = relationship(back_populates="deliveries")
@@ -30,6 +30,14 @@ class Order(Base):
     payment_status: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
     delivery_service: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     tracking_number: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # Export to MoySklad as customerorder: pending | exported | failed | skipped; NULL — not exported
+    export_status: Mapped[Optional[str]] = mapped_column(String(20), nullable=True, index=True)
+    export_attempts: Mapped[int] = mapped_column(Integer, default=0)
+    export_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Earliest time of the next attempt after a failed one (per-order backoff)
+    export_next_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    exported_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    external_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -28,7 +28,13 @@ class Product(Base):
     image_url: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
     is_available: Mapped[bool] = mapped_column(Boolean, default=True)
     stock_quantity: Mapped[int] = mapped_column(Integer, default=0)
-    external_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    external_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, index=True)
+    # sha256 of the normalized upstream payload (MoySklad / 1C); NULL for local products
+    sync_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # Set when the product was archived / removed upstream; hidden until it comes back
+    archived_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
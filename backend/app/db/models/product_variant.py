@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from sqlalchemy import ForeignKey, Integer, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -24,6 +26,8 @@ class ProductVariant(Base):
     )
     value: Mapped[str] = mapped_column(String(255))
     quantity: Mapped[int] = mapped_column(Integer, default=0)
+    # Modification id upstream (MoySklad variant / CommerceML offer); NULL for local variants
+    external_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, index=True)
 
     product: Mapped["Product"] = relationship(back_populates="variants")
     modification_type: Mapped["ModificationType"] = relationship(back_populates="product_variants")
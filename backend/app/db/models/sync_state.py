@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import JSON, DateTime, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class SyncState(Base):
+    """Per-source sync bookkeeping (one row per product source)."""
+    __tablename__ = "sync_state"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    source: Mapped[str] = mapped_column(String(50), unique=True, index=True)
+    # Upstream ``updated`` timestamp of the newest entity seen by the last successful run
+    cursor: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    last_full_sync_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # Cross-worker sync lease: whoever holds an unexpired lease runs the sync
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # Latest sync job of the lease holder and its progress, for the admin endpoint on any worker
+    job_id: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    job: Mapped[Optional[dict[str, Any]]] = mapped_column(JSON, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class TelegramFile(Base):
+    """A ``file_id`` Telegram assigned to an image we uploaded once.
+
+    ``key`` is ``sha256:<content hash>`` for files in ``uploads/`` and
+    ``url:<hash of the URL>`` for remote images.
+    """
+    __tablename__ = "telegram_files"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(String(80), unique=True, index=True)
+    source: Mapped[str] = mapped_column(Text, default="")
+    file_id: Mapped[str] = mapped_column(String(255))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
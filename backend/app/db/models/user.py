@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import BigInteger, DateTime, Numeric, String, func
+from sqlalchemy import BigInteger, DateTime, Integer, Numeric, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -23,6 +23,12 @@ class User(Base):
         DateTime(timezone=True), server_default=func.now()
     )
     bonus_balance: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
+    # Set when the user blocked the bot; cleared on unblock or a successful delivery
+    bot_blocked_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Failed deliveries in a row (other than blocks) caused by the recipient's chat
+    delivery_failures: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Last counted failure; the count starts over after MAILING_FAILURES_RESET_DAYS
+    delivery_failed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     cart_items: Mapped[List["CartItem"]] = relationship(back_populates="user", cascade="all, delete-orphan")
     favorites: Mapped[List["Favorite"]] = relationship(back_populates="user", cascade="all, delete-orphan")
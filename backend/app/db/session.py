@@ -1,18 +1,111 @@
+"""Database engines and sessions.
+
+``engine`` / :data:`async_session` / :func:`get_db` are for anything that
+writes.  Read-only endpoints (catalog, categories, banners, favorites,
+stats) use :func:`get_read_db`, backed by ``read_engine``:
+
+* with ``DATABASE_READ_URL`` — a replica.  :data:`read_router` checks its
+  lag in the background and sends reads to the primary while the replica
+  is behind by more than ``DATABASE_READ_MAX_LAG_SECONDS`` or unreachable;
+* on SQLite — a second pool of ``PRAGMA query_only`` connections to the
+  same file: with WAL they never wait for the writer, and they cannot take
+  the write lock by accident;
+* otherwise — the primary itself.
+
+Every SQLite connection gets the tuning profile from
+:func:`_apply_sqlite_pragmas` (WAL, ``synchronous=NORMAL``, busy timeout,
+mmap, page cache, in-memory temp tables).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import settings
 
-# SQLite requires check_same_thread=False for async
-connect_args = {}
-if settings.database_url.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+logger = logging.getLogger(__name__)
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,
-    pool_pre_ping=True,
-    connect_args=connect_args,
-)
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return ":memory:" in url or "mode=memory" in url or url.rstrip("/").endswith("sqlite+aiosqlite:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record, read_only: bool = False) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        # WAL is persistent in the file; readers never block the writer and vice versa
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints, not on every commit — safe with WAL
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_mb) * 1024 * 1024}")
+        # Negative cache_size is in KiB
+        cursor.execute(f"PRAGMA cache_size={-int(settings.sqlite_cache_size_mb) * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _create_engine(url: str, pool_size: int, max_overflow: int = 0, read_only: bool = False):
+    kwargs = {}
+    if _is_sqlite(url):
+        # SQLite requires check_same_thread=False for async
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if not (_is_sqlite(url) and _is_memory_sqlite(url)):
+        kwargs["pool_size"] = max(pool_size, 1)
+        kwargs["max_overflow"] = max(max_overflow, 0)
+    new_engine = create_async_engine(url, echo=False, pool_pre_ping=True, **kwargs)
+    if _is_sqlite(url) and settings.sqlite_tuning:
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, connection_record, read_only=read_only)
+    return new_engine
+
+
+_sqlite = _is_sqlite(settings.database_url)
+
+if _sqlite:
+    # Every get_db request (get_current_user included) and the background writers share this
+    # pool: keep the overflow, WAL and busy_timeout queue the actual writes
+    engine = _create_engine(
+        settings.database_url,
+        pool_size=settings.sqlite_write_connections,
+        max_overflow=settings.database_max_overflow,
+    )
+else:
+    engine = _create_engine(
+        settings.database_url,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+    )
+
+# True when read_engine is a separate server that may lag behind the primary
+read_is_replica = bool(settings.database_read_url)
+
+if read_is_replica:
+    read_engine = _create_engine(
+        settings.database_read_url,
+        pool_size=settings.database_read_pool_size,
+        max_overflow=settings.database_read_max_overflow,
+        read_only=_is_sqlite(settings.database_read_url),
+    )
+elif _sqlite and not _is_memory_sqlite(settings.database_url) and settings.sqlite_read_connections > 0:
+    read_engine = _create_engine(
+        settings.database_url, pool_size=settings.sqlite_read_connections, read_only=True
+    )
+else:
+    read_engine = engine
 
 async_session = async_sessionmaker(
     engine,
@@ -20,6 +113,83 @@ async_session = async_sessionmaker(
     expire_on_commit=False,
 )
 
+read_session = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+# Read-only sessions that always see the latest commit: the SQLite read pool, never a replica.
+# For caches rebuilt right after an invalidating write.
+fresh_read_session = async_session if read_is_replica else read_session
+
+# PostgreSQL replica lag; 0 on a primary and on a replica that has replayed everything it received
+_PG_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+_LAG_CHECK_TIMEOUT = 3.0
+
+
+class ReadRouter:
+    """Chooses between the replica and the primary for :func:`get_read_db`.
+
+    The replica is checked at most every ``DATABASE_READ_CHECK_SECONDS``, in
+    a background task, so requests never wait for the check; until the
+    first check passes reads go to the primary.
+    """
+
+    def __init__(self):
+        self.use_replica = False
+        self.lag: Optional[float] = None
+        self._checked_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def sessionmaker(self) -> async_sessionmaker:
+        if not read_is_replica:
+            return read_session
+        if time.monotonic() - self._checked_at >= settings.database_read_check_seconds:
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._check())
+        return read_session if self.use_replica else async_session
+
+    def mark_failed(self) -> None:
+        """Replica query failed: use the primary until the next check succeeds."""
+        if self.use_replica:
+            logger.warning("Read replica query failed, routing reads to primary")
+        self.use_replica = False
+        self._checked_at = 0.0
+
+    async def _check(self) -> None:
+        try:
+            self.lag = await asyncio.wait_for(self._measure_lag(), timeout=_LAG_CHECK_TIMEOUT)
+            healthy = self.lag <= settings.database_read_max_lag_seconds
+            reason = f"lag {self.lag:.1f}s"
+        except Exception as e:
+            self.lag = None
+            healthy = False
+            reason = f"unreachable: {e}"
+        if healthy != self.use_replica:
+            if healthy:
+                logger.info(f"Read replica in use ({reason})")
+            else:
+                logger.warning(f"Read replica not used, routing reads to primary ({reason})")
+        self.use_replica = healthy
+        self._checked_at = time.monotonic()
+
+    async def _measure_lag(self) -> float:
+        async with read_engine.connect() as conn:
+            if read_engine.dialect.name == "postgresql":
+                return float((await conn.execute(text(_PG_LAG_QUERY))).scalar() or 0)
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+
+
+read_router = ReadRouter()
+
 
 async def get_db() -> AsyncSession:
     async with async_session() as session:
@@ -27,3 +197,19 @@ async def get_db() -> AsyncSession:
             yield session
         finally:
             await session.close()
+
+
+async def get_read_db() -> AsyncSession:
+    """Session for read-only endpoints (no writes: it may be a replica or ``query_only``)."""
+    maker = read_router.sessionmaker()
+    async with maker() as session:
+        try:
+            yield session
+        except DBAPIError as e:
+            if maker is read_session and read_is_replica and (
+                isinstance(e, OperationalError) or e.connection_invalidated
+            ):
+                read_router.mark_failed()
+            raise
+        finally:
+            await session.close()
@@ -10,7 +10,21 @@ from fastapi.staticfiles import StaticFiles
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from app.config import settings, ProductSource
-from app.bot.bot import get_bot, dp, setup_bot, is_bot_configured
+from app.bot.bot import (
+    get_bot,
+    dp,
+    setup_bot,
+    setup_webhook,
+    is_bot_configured,
+    fetch_and_cache_bot_photo,
+    use_webhook,
+    wait_webhook_updates,
+)
+from app.services.admin_notifier import admin_notifier
+from app.services.mailing_jobs import mailing_runner
+from app.services.order_export import order_exporter
+from app.services.search import product_search
+from app.services.warmup import warmup
 
 try:
     from aiogram.exceptions import TelegramNetworkError
@@ -21,7 +35,8 @@ try:
 except ImportError:
     ServerDisconnectedError = ConnectionError
     ClientError = ConnectionError
-from app.api.v1 import products, categories, cart, favorites, orders, payments, promo, config, admin, owner, banners, user as user_router
+from app.api import webhooks
+from app.api.v1 import products, categories, cart, favorites, orders, payments, promo, config, admin, owner, banners, stores, user as user_router
 
 UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
 UPLOADS_DIR.mkdir(exist_ok=True)
@@ -34,13 +49,32 @@ scheduler = AsyncIOScheduler()
 
 async def _periodic_sync():
     """Background job: sync products from external source."""
+    from app.services.sync_coordinator import sync_coordinator
+    await sync_coordinator.run("scheduler")
+
+
+async def _periodic_stock_sync():
+    """Background job: refresh stock quantities only (MoySklad)."""
+    from app.services.sync_coordinator import sync_coordinator
+    if sync_coordinator.is_running:
+        return  # the catalog sync applies stock itself
+    # Same lease as the full sync: skip while any worker runs one (or another stock sync)
+    source = settings.product_source.value
     try:
-        from app.services.product_loader import get_product_loader
-        loader = get_product_loader()
-        synced = await loader.sync_products()
-        logger.info(f"Periodic sync complete: {synced} products synced from {settings.product_source.value}")
+        if not await sync_coordinator.acquire_lease(source):
+            return
     except Exception as e:
-        logger.error(f"Periodic product sync failed: {e}", exc_info=True)
+        logger.error(f"Periodic stock sync: failed to acquire sync lease: {e}", exc_info=True)
+        return
+    try:
+        from app.services.product_loader.moysklad import MoySkladLoader
+        await MoySkladLoader().sync_stock()
+    except Exception as e:
+        logger.error(f"Periodic stock sync failed: {e}", exc_info=True)
+    finally:
+        # A full sync started here meanwhile took the lease over (same owner) and releases it itself
+        if not sync_coordinator.is_running:
+            await sync_coordinator.release_lease(source)
 
 
 async def _ensure_tables():
@@ -74,6 +108,7 @@ def _asyncio_exception_handler(loop, context):
 @asynccontextmanager
 async def lifespan(application: FastAPI):
     asyncio.get_running_loop().set_exception_handler(_asyncio_exception_handler)
+    warmup.begin()
 
     # Startup — ensure DB tables exist
     await _ensure_tables()
@@ -82,11 +117,16 @@ async def lifespan(application: FastAPI):
     if is_bot_configured():
         await setup_bot()
         bot = get_bot()
+        warmup.spawn("bot_photo", fetch_and_cache_bot_photo())
+        # Inline-mode search answers from memory
+        warmup.spawn("search_index", product_search.refresh())
 
         async def _polling_with_recovery():
             """Run bot polling; on network errors log and retry so the API process stays up."""
             while True:
                 try:
+                    # A webhook left from BOT_MODE=webhook blocks getUpdates
+                    await bot.delete_webhook()
                     await dp.start_polling(bot)
                     break
                 except asyncio.CancelledError:
@@ -107,33 +147,62 @@ async def lifespan(application: FastAPI):
                     logger.exception("Bot polling error. Retry in 30s: %s", e)
                     await asyncio.sleep(30)
 
-        polling_task = asyncio.create_task(_polling_with_recovery())
-        logger.info("Bot polling started!")
+        async def _webhook_with_retry():
+            """Set the webhook, retrying until Telegram accepts it."""
+            delay = 5
+            while not await setup_webhook():
+                logger.warning(f"Bot webhook not set, retry in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 300)
+
+        if use_webhook():
+            # Never poll in webhook mode: polling deletes the webhook, which
+            # would cut every other worker off from updates
+            warmup.spawn("bot_webhook", _webhook_with_retry())
+            logger.info("Bot webhook mode")
+        else:
+            polling_task = asyncio.create_task(_polling_with_recovery())
+            logger.info("Bot polling started!")
+        # Broadcasts queued before a restart continue from their checkpoint
+        mailing_runner.start()
+        admin_notifier.start()
     else:
         logger.warning(
             "Bot token not configured — running API only (no Telegram bot). "
             "Set BOT_TOKEN in .env to enable the bot."
         )
-    # Auto-sync products from external source on startup
+    # Auto-sync products from external source on startup (in the background)
     if settings.product_source != ProductSource.DATABASE:
         logger.info(f"Product source: {settings.product_source.value} — starting initial sync...")
-        try:
-            from app.services.product_loader import get_product_loader
-            loader = get_product_loader()
-            synced = await loader.sync_products()
-            logger.info(f"Initial sync complete: {synced} products synced from {settings.product_source.value}")
-        except Exception as e:
-            logger.error(f"Initial product sync failed: {e}", exc_info=True)
+        from app.services.sync_coordinator import sync_coordinator
+        warmup.spawn("initial_sync", sync_coordinator.run("startup"))
 
         # Start periodic sync scheduler
-        interval = settings.sync_interval_minutes
+        interval = settings.full_sync_interval_minutes
         if interval > 0:
             scheduler.add_job(_periodic_sync, "interval", minutes=interval, id="product_sync")
+            logger.info(f"Periodic sync scheduled: every {interval} minutes")
+        stock_interval = settings.stock_sync_interval_seconds
+        if settings.product_source == ProductSource.MOYSKLAD and stock_interval > 0:
+            scheduler.add_job(
+                _periodic_stock_sync, "interval", seconds=stock_interval, id="stock_sync"
+            )
+            logger.info(f"Stock sync scheduled: every {stock_interval} seconds")
+        if scheduler.get_jobs():
             scheduler.start()
-            logger.info(f"Periodic sync scheduler started: every {interval} minutes")
 
+    if order_exporter.enabled:
+        order_exporter.start()
+        logger.info("MoySklad order export started")
+
+    warmup.mark_started()
     yield
     # Shutdown
+    await warmup.cancel_all()
+    await order_exporter.stop()
+    await mailing_runner.stop()
+    await wait_webhook_updates()
+    await admin_notifier.stop()
     if scheduler.running:
         scheduler.shutdown(wait=False)
     if polling_task:
@@ -142,6 +211,7 @@ async def lifespan(application: FastAPI):
             await polling_task
         except (asyncio.CancelledError, Exception) as e:
             logger.debug(f"Polling task stopped: {e}")
+    if is_bot_configured():
         try:
             bot = get_bot()
             if bot:
@@ -178,10 +248,18 @@ app.include_router(orders.router, prefix="/api/v1", tags=["orders"])
 app.include_router(payments.router, prefix="/api/v1", tags=["payments"])
 app.include_router(promo.router, prefix="/api/v1", tags=["promo"])
 app.include_router(banners.router, prefix="/api/v1", tags=["banners"])
+app.include_router(stores.router, prefix="/api/v1", tags=["stores"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 app.include_router(owner.router, prefix="/api/v1/owner", tags=["owner"])
+app.include_router(webhooks.router, prefix="/webhook", tags=["webhooks"])
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Serving requests; reports background warm-up (initial sync, bot photo)."""
+    return warmup.status()
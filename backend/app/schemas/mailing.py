@@ -1,16 +1,70 @@
 from __future__ import annotations
 
-from typing import Literal, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 
 AudienceType = Literal["all", "has_orders", "has_cart", "has_favorites", "no_orders"]
 
 
+class Range(BaseModel):
+    """Inclusive bounds; either may be omitted."""
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class Segment(BaseModel):
+    """Audience filter compiled into one SQL query over users.
+
+    Conditions set on one node are AND-ed; ``all`` / ``any`` / ``not``
+    combine nested nodes, e.g.::
+
+        {"any": [{"orders_total": {"min": 10000}},
+                 {"has_orders": false, "has_cart": true}],
+         "not": {"bonus_balance": {"max": 0}}}
+
+    Orders count without cancelled ones; ``last_order_days`` is the age
+    of the latest order in days.
+    """
+    model_config = ConfigDict(populate_by_name=True)
+
+    all: Optional[List["Segment"]] = None
+    any: Optional[List["Segment"]] = None
+    not_: Optional["Segment"] = Field(default=None, alias="not")
+
+    has_orders: Optional[bool] = None
+    orders_count: Optional[Range] = None
+    orders_total: Optional[Range] = None
+    last_order_days: Optional[Range] = None
+    has_cart: Optional[bool] = None
+    has_favorites: Optional[bool] = None
+    # Has a favorite product in this category
+    favorite_category_id: Optional[int] = None
+    bonus_balance: Optional[Range] = None
+
+
+Segment.model_rebuild()
+
+
+class SegmentPreviewRequest(BaseModel):
+    audience: AudienceType = "all"
+    segment: Optional[Segment] = None
+    include_blocked: bool = False
+
+
+class SegmentPreviewResponse(BaseModel):
+    count: int
+
+
 class MailingRequest(BaseModel):
     name: Optional[str] = None
     audience: AudienceType = "all"
+    # Overrides ``audience`` when set
+    segment: Optional[Segment] = None
+    # Also send to users who blocked the bot or keep failing
+    include_blocked: bool = False
     text: str
     image_url: Optional[str] = None
     button_text: Optional[str] = None
@@ -21,3 +75,20 @@ class MailingResponse(BaseModel):
     sent: int
     failed: int
     total: int
+    # Part of ``failed``: recipients who blocked the bot
+    blocked: int = 0
+
+
+class MailingJobResponse(MailingResponse):
+    id: int
+    name: Optional[str] = None
+    audience: str
+    segment: Optional[dict] = None
+    status: str
+    remaining: int
+    # Recipients per second while sending
+    throughput: float
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -60,6 +60,14 @@ class OrderStatusUpdate(BaseModel):
     tracking_number: Optional[str] = None
 
 
+class OrderExportRetryRequest(BaseModel):
+    order_ids: Optional[List[int]] = None  # None — all failed exports
+
+
+class OrderExportRetryResponse(BaseModel):
+    requeued: int
+
+
 
 
 
@@ -0,0 +1,23 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class StoreResponse(BaseModel):
+    id: int
+    name: str
+    address: Optional[str] = None
+    available_products: int = 0
+
+
+class StoreVariantStock(BaseModel):
+    value: str
+    quantity: int
+
+
+class ProductStoreStock(BaseModel):
+    store_id: int
+    name: str
+    address: Optional[str] = None
+    quantity: int
+    variants: List[StoreVariantStock] = []
@@ -0,0 +1,153 @@
+"""Queue for new-order notifications to admin chats.
+
+``create_order`` only appends to :data:`admin_notifier`; a background
+task sends them.  Orders arriving within ``ADMIN_NOTIFY_WINDOW_SECONDS``
+are collected together: up to ``ADMIN_NOTIFY_DIGEST_THRESHOLD`` go out
+as the usual one-message-per-order, more as a single digest, so a flash
+sale does not run into Telegram's per-chat limits.  Every message goes to
+each chat in ``settings.admin_chat_id_list``; ``RetryAfter`` and network
+errors are retried, and what is still queued at shutdown is flushed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Telegram message limit is 4096 characters
+_MESSAGE_LIMIT = 4000
+_MAX_ATTEMPTS = 5
+_SHUTDOWN_FLUSH_SECONDS = 10.0
+
+
+@dataclass
+class OrderNotice:
+    order_id: int
+    customer_name: str
+    total: float
+    delivery_type: Optional[str]
+    # Full single-order message
+    text: str
+
+
+def _digest_messages(notices: list[OrderNotice]) -> list[str]:
+    """One digest for many orders, split to fit Telegram's limit."""
+    total = sum(n.total for n in notices)
+    header = f"📦 <b>Новых заказов: {len(notices)}</b> на {total:.2f} ₽\n"
+    messages: list[str] = []
+    current = header
+    for notice in notices:
+        delivery = ""
+        if notice.delivery_type:
+            delivery = " · самовывоз" if notice.delivery_type == "pickup" else " · доставка"
+        line = f"\n#{notice.order_id} — {notice.customer_name} — {notice.total:.2f} ₽{delivery}"
+        if len(current) + len(line) > _MESSAGE_LIMIT:
+            messages.append(current)
+            current = header
+        current += line
+    messages.append(current)
+    return messages
+
+
+class AdminNotifier:
+    def __init__(self):
+        self._pending: list[OrderNotice] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.digests = 0
+        self.failed = 0
+
+    def add(self, notice: OrderNotice) -> None:
+        """Queue a notification; returns at once."""
+        self._pending.append(notice)
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Send what is queued (for up to 10 s), then stop."""
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=_SHUTDOWN_FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Admin notifier: notifications still unsent at shutdown")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while not self._stopping.is_set():
+            await self._wakeup.wait()
+            # Let a burst of orders gather before sending (unless shutting down)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.admin_notify_window_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Admin notifier failed: {e}", exc_info=True)
+
+    async def flush(self) -> None:
+        """Send everything queued so far."""
+        notices, self._pending = self._pending, []
+        if not notices:
+            return
+        if len(notices) > settings.admin_notify_digest_threshold:
+            messages = _digest_messages(notices)
+            self.digests += 1
+        else:
+            messages = [notice.text for notice in notices]
+        # Chats are rate-limited separately: a "retry after" in one does not hold up the others
+        await asyncio.gather(*(
+            self._send_all(chat_id, messages) for chat_id in settings.admin_chat_id_list
+        ))
+
+    async def _send_all(self, chat_id: int, messages: list[str]) -> None:
+        for text in messages:
+            await self._send(chat_id, text)
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+
+        from app.bot.bot import get_bot
+
+        bot = get_bot()
+        if bot is None:
+            return False
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            try:
+                await bot.send_message(chat_id=chat_id, text=text)
+                self.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                logger.info(f"Admin notification to {chat_id}: retry after {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except TelegramNetworkError as e:
+                logger.warning(f"Admin notification to {chat_id} failed (attempt {attempt}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except Exception as e:
+                logger.error(f"Admin notification to {chat_id} failed: {e}")
+                break
+        self.failed += 1
+        return False
+
+
+admin_notifier = AdminNotifier()
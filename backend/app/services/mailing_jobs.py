@@ -0,0 +1,293 @@
+"""Persistent broadcasts: ``mailing_jobs`` and ``mailing_deliveries``.
+
+``POST /admin/mailing`` stores the message as a :class:`MailingJob` and
+materializes its audience into ``mailing_deliveries`` (chunked bulk
+inserts), then wakes :data:`mailing_runner`.  The runner sends the
+pending deliveries ``_SEND_CHUNK`` at a time through
+:class:`BroadcastSender` and checkpoints after every chunk: delivery
+statuses, the job counters and the recipients' blocked / failure marks
+(:func:`record_delivery_outcomes`) are committed together, so a restarted
+worker resumes where the last checkpoint left off and re-sends at most
+one chunk.
+
+Pause and cancel only change the job status; the runner checks it
+between chunks and stops feeding the current chunk at once when the
+request hit its own worker.  Across workers only the holder of the
+``mailing`` lease sends.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.mailing import MailingDelivery, MailingJob
+from app.schemas.mailing import Segment
+from app.services.mailing_service import (
+    AudienceType,
+    BroadcastSender,
+    DeliveryStatus,
+    build_message,
+    record_delivery_outcomes,
+)
+from app.services.segments import iter_recipients, resolve_segment
+
+logger = logging.getLogger(__name__)
+
+LEASE_SOURCE = "mailing"
+
+_MATERIALIZE_CHUNK = 1000
+_SEND_CHUNK = 100
+_POLL_SECONDS = 30.0
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+async def create_job(
+    db: AsyncSession,
+    audience: AudienceType,
+    text: str,
+    name: Optional[str] = None,
+    image_url: Optional[str] = None,
+    button_text: Optional[str] = None,
+    button_url: Optional[str] = None,
+    created_by: Optional[int] = None,
+    segment: Optional[Segment] = None,
+    include_blocked: bool = False,
+) -> MailingJob:
+    """Store a broadcast and one pending delivery per recipient (no commit).
+
+    Recipients are streamed from the segment query straight into
+    ``mailing_deliveries``, one chunk at a time.
+    """
+    job = MailingJob(
+        name=name,
+        audience=audience,
+        segment=segment.model_dump(by_alias=True, exclude_none=True) if segment is not None else None,
+        text=text,
+        image_url=image_url,
+        button_text=button_text,
+        button_url=button_url,
+        status="pending",
+        created_by=created_by,
+    )
+    db.add(job)
+    await db.flush()
+
+    total = 0
+    recipients = iter_recipients(
+        db, resolve_segment(audience, segment), _MATERIALIZE_CHUNK, include_blocked=include_blocked
+    )
+    async for telegram_ids in recipients:
+        await db.execute(
+            insert(MailingDelivery),
+            [{"job_id": job.id, "telegram_id": telegram_id, "status": "pending"} for telegram_id in telegram_ids],
+        )
+        total += len(telegram_ids)
+    job.total = total
+    return job
+
+
+def throughput(job: MailingJob) -> float:
+    """Recipients processed per second of sending."""
+    processed = (job.sent or 0) + (job.failed or 0)
+    return round(processed / job.active_seconds, 2) if job.active_seconds else 0.0
+
+
+class MailingRunner:
+    """Background worker that sends pending mailing jobs one at a time."""
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Jobs paused or cancelled through this worker: stop feeding at once
+        self._interrupted: set[int] = set()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def interrupt(self, job_id: int) -> None:
+        self._interrupted.add(job_id)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Mailing runner failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_pending(self) -> None:
+        """Send every pending or interrupted-by-restart job, oldest first."""
+        from app.db.session import async_session
+        from app.services.sync_coordinator import sync_coordinator
+
+        async with async_session() as db:
+            result = await db.execute(
+                select(MailingJob.id)
+                .where(MailingJob.status.in_(ACTIVE_STATUSES))
+                .order_by(MailingJob.id)
+                .limit(1)
+            )
+            if result.scalar_one_or_none() is None:
+                return
+        if not await sync_coordinator.acquire_lease(LEASE_SOURCE):
+            return
+        try:
+            while True:
+                async with async_session() as db:
+                    result = await db.execute(
+                        select(MailingJob.id)
+                        .where(MailingJob.status.in_(ACTIVE_STATUSES))
+                        .order_by(MailingJob.id)
+                        .limit(1)
+                    )
+                    job_id = result.scalar_one_or_none()
+                if job_id is None:
+                    return
+                if not await self._run_job(job_id):
+                    return
+        finally:
+            await sync_coordinator.release_lease(LEASE_SOURCE)
+
+    async def _set_status(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        from app.db.session import async_session
+
+        async with async_session() as db:
+            await db.execute(
+                update(MailingJob)
+                .where(MailingJob.id == job_id, MailingJob.status.in_(ACTIVE_STATUSES))
+                .values(status=status, error=error, finished_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+
+    async def _run_job(self, job_id: int) -> bool:
+        """Send a job until it is finished or stopped; False when the lease was lost."""
+        from app.bot.bot import get_bot
+        from app.db.session import async_session
+        from app.services.sync_coordinator import sync_coordinator
+
+        self._interrupted.discard(job_id)
+        bot = get_bot()
+        if bot is None:
+            await self._set_status(job_id, "failed", "Bot not configured")
+            return True
+
+        async with async_session() as db:
+            job = await db.get(MailingJob, job_id)
+            job.status = "running"
+            job.started_at = job.started_at or datetime.now(timezone.utc)
+            message = build_message(job.text, job.image_url, job.button_text, job.button_url)
+            await db.commit()
+        logger.info(f"Mailing #{job_id}: sending")
+        sender = BroadcastSender(bot, message)
+
+        while True:
+            async with async_session() as db:
+                status = (
+                    await db.execute(select(MailingJob.status).where(MailingJob.id == job_id))
+                ).scalar_one_or_none()
+                if status != "running" or job_id in self._interrupted:
+                    logger.info(f"Mailing #{job_id}: stopped ({status})")
+                    return True
+                result = await db.execute(
+                    select(MailingDelivery.id, MailingDelivery.telegram_id)
+                    .where(MailingDelivery.job_id == job_id, MailingDelivery.status == "pending")
+                    .order_by(MailingDelivery.id)
+                    .limit(_SEND_CHUNK)
+                )
+                rows = result.all()
+            if not rows:
+                await self._set_status(job_id, "done")
+                logger.info(f"Mailing #{job_id}: done")
+                return True
+            # Renew the lease; a long broadcast outlives its TTL.  If another worker
+            # took it over, stop here: the job stays "running" and that worker resumes it
+            if not await sync_coordinator.acquire_lease(LEASE_SOURCE):
+                logger.warning(f"Mailing #{job_id}: lease lost, leaving the job to another worker")
+                return False
+
+            try:
+                await self._send_chunk(job_id, sender, rows)
+            except Exception as e:
+                logger.error(f"Mailing #{job_id} failed: {e}", exc_info=True)
+                await self._set_status(job_id, "failed", str(e)[:1000])
+                return True
+
+    async def _send_chunk(self, job_id: int, sender: BroadcastSender, rows: list) -> None:
+        from app.db.session import async_session
+
+        delivery_ids = {telegram_id: delivery_id for delivery_id, telegram_id in rows}
+        results: dict[int, tuple[str, Optional[str]]] = {}
+
+        async def recipients() -> AsyncIterator[int]:
+            for telegram_id in delivery_ids:
+                if job_id in self._interrupted:
+                    return
+                yield telegram_id
+
+        async def on_result(telegram_id: int, status: str, error: Optional[str]) -> None:
+            results[telegram_id] = (status, error)
+
+        started = time.monotonic()
+        await sender.run(recipients(), on_result)
+        elapsed = time.monotonic() - started
+        if not results:
+            return
+
+        now = datetime.now(timezone.utc)
+        sent = sum(1 for status, _ in results.values() if status == DeliveryStatus.SENT)
+        blocked = sum(1 for status, _ in results.values() if status == DeliveryStatus.BLOCKED)
+        table = MailingDelivery.__table__
+        async with async_session() as db:
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values(status=bindparam("new_status"), error=bindparam("new_error"), sent_at=bindparam("ts")),
+                [
+                    {
+                        "row_id": delivery_ids[telegram_id],
+                        "new_status": status,
+                        "new_error": error[:500] if error else None,
+                        "ts": now if status == DeliveryStatus.SENT else None,
+                    }
+                    for telegram_id, (status, error) in results.items()
+                ],
+            )
+            await db.execute(
+                update(MailingJob)
+                .where(MailingJob.id == job_id)
+                .values(
+                    sent=MailingJob.sent + sent,
+                    failed=MailingJob.failed + len(results) - sent,
+                    blocked=MailingJob.blocked + blocked,
+                    active_seconds=MailingJob.active_seconds + elapsed,
+                )
+            )
+            await record_delivery_outcomes(db, results)
+            await db.commit()
+
+
+mailing_runner = MailingRunner()
@@ -1,88 +1,282 @@
 from __future__ import annotations
 
 import asyncio
-from typing import List, Optional
-from urllib.parse import urlparse
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import case, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.bot.bot import get_bot
 from app.config import settings
 from app.db.models.user import User
-from app.db.models.order import Order
-from app.db.models.cart import CartItem
-from app.db.models.favorite import Favorite
+from app.schemas.mailing import Segment
+from app.services.rate_limit import TokenBucket
+from app.services.segments import failures_cutoff, iter_recipients, resolve_segment
+from app.services.telegram_files import telegram_files
+
+logger = logging.getLogger(__name__)
 
 
 AudienceType = str  # "all" | "has_orders" | "has_cart" | "has_favorites" | "no_orders"
 
 
-async def get_recipients(db: AsyncSession, audience: AudienceType) -> List[int]:
-    """Return list of telegram_id for the given audience."""
-    if audience == "all":
-        result = await db.execute(select(User.telegram_id))
-        return [row[0] for row in result.all()]
+async def get_recipients(
+    db: AsyncSession,
+    audience: AudienceType,
+    segment: Optional[Segment] = None,
+    include_blocked: bool = False,
+) -> List[int]:
+    """Return list of telegram_id for the given audience (or segment).
+
+    Users who blocked the bot are skipped unless ``include_blocked``.
+    Loads everything at once; use :func:`~app.services.segments.iter_recipients`
+    for large audiences.
+    """
+    telegram_ids: List[int] = []
+    segment = resolve_segment(audience, segment)
+    async for chunk in iter_recipients(db, segment, include_blocked=include_blocked):
+        telegram_ids.extend(chunk)
+    return telegram_ids
+
+
+async def set_bot_blocked(db: AsyncSession, telegram_id: int, blocked: bool) -> None:
+    """Mark a user as having blocked (or unblocked) the bot (no commit)."""
+    if blocked:
+        values = {"bot_blocked_at": datetime.now(timezone.utc)}
+    else:
+        values = {"bot_blocked_at": None, "delivery_failures": 0, "delivery_failed_at": None}
+    await db.execute(update(User).where(User.telegram_id == telegram_id).values(**values))
+
+
+# Bad Request descriptions that concern the recipient's chat, not the message or the bot
+_RECIPIENT_ERRORS = (
+    "peer_id_invalid",
+    "user not found",
+    "user_is_bot",
+    "bot can't initiate conversation",
+    "chat_restricted",
+    "chat_write_forbidden",
+    "not enough rights",
+    "have no rights to send",
+)
 
-    if audience == "has_orders":
-        subq = select(Order.user_id).distinct()
-        result = await db.execute(
-            select(User.telegram_id).where(User.id.in_(subq))
-        )
-        return [row[0] for row in result.all()]
 
-    if audience == "has_cart":
-        subq = select(CartItem.user_id).distinct()
-        result = await db.execute(
-            select(User.telegram_id).where(User.id.in_(subq))
+def is_recipient_error(error: Optional[str]) -> bool:
+    """Whether a failed delivery is the recipient's fault (it would fail again for them only)."""
+    text = (error or "").lower()
+    return any(marker in text for marker in _RECIPIENT_ERRORS)
+
+
+async def record_delivery_outcomes(
+    db: AsyncSession, outcomes: Dict[int, tuple[str, Optional[str]]]
+) -> None:
+    """Store broadcast results on ``users`` (no commit).
+
+    ``outcomes`` maps ``telegram_id`` to ``(status, error)`` with a
+    :class:`DeliveryStatus`.  A delivered message clears both marks, a
+    block sets ``bot_blocked_at``.  Only recipient-specific failures
+    (:func:`is_recipient_error`) count towards ``MAILING_MAX_FAILURES``,
+    and none when nothing in the chunk got through — then the message,
+    the network or Telegram is at fault, not the recipients.
+    """
+    by_status: Dict[str, List[int]] = {}
+    for telegram_id, (status, error) in outcomes.items():
+        if status == DeliveryStatus.FAILED and not is_recipient_error(error):
+            continue
+        by_status.setdefault(status, []).append(telegram_id)
+    now = datetime.now(timezone.utc)
+    if by_status.get(DeliveryStatus.SENT):
+        await db.execute(
+            update(User)
+            .where(
+                User.telegram_id.in_(by_status[DeliveryStatus.SENT]),
+                or_(User.bot_blocked_at.isnot(None), User.delivery_failures != 0),
+            )
+            .values(bot_blocked_at=None, delivery_failures=0, delivery_failed_at=None)
+        )
+    if by_status.get(DeliveryStatus.BLOCKED):
+        await db.execute(
+            update(User)
+            .where(User.telegram_id.in_(by_status[DeliveryStatus.BLOCKED]), User.bot_blocked_at.is_(None))
+            .values(bot_blocked_at=now)
+        )
+    delivered = any(status != DeliveryStatus.FAILED for status, _ in outcomes.values())
+    if by_status.get(DeliveryStatus.FAILED) and delivered:
+        cutoff = failures_cutoff()
+        failures = User.delivery_failures + 1
+        if cutoff is not None:
+            # An expired count starts over
+            failures = case(
+                (or_(User.delivery_failed_at.is_(None), User.delivery_failed_at < cutoff), 1),
+                else_=failures,
+            )
+        await db.execute(
+            update(User)
+            .where(User.telegram_id.in_(by_status[DeliveryStatus.FAILED]))
+            .values(delivery_failures=failures, delivery_failed_at=now)
         )
-        return [row[0] for row in result.all()]
 
-    if audience == "has_favorites":
-        subq = select(Favorite.user_id).distinct()
-        result = await db.execute(
-            select(User.telegram_id).where(User.id.in_(subq))
+
+class DeliveryStatus:
+    SENT = "sent"
+    # The user blocked the bot, deleted the account or the chat is gone
+    BLOCKED = "blocked"
+    FAILED = "failed"
+
+
+@dataclass
+class BroadcastMessage:
+    text: str
+    # ``/uploads/...`` path or URL; uploaded once, then sent by file_id
+    photo: Optional[str] = None
+    reply_markup: Any = None
+
+
+# Called with (telegram_id, status, error) after every recipient
+ResultCallback = Callable[[int, str, Optional[str]], Awaitable[None]]
+
+
+class BroadcastSender:
+    """Send one message to many chats within Telegram's bot limits.
+
+    A global token bucket keeps the bot at ``mailing_rate_per_second``
+    (Telegram allows about 30 messages per second for bulk sends) while
+    ``mailing_concurrency`` workers overlap the API round trips.  A
+    ``RetryAfter`` answer pauses the whole bucket — the limit is per bot,
+    not per chat — and the message is retried.  ``Forbidden`` and "chat
+    not found" are final and reported as :attr:`DeliveryStatus.BLOCKED`.
+
+    A photo is uploaded by the first successful send only (the other
+    workers wait for it); everyone else gets its ``file_id``.
+    """
+
+    MAX_RETRIES = 3
+
+    def __init__(
+        self,
+        bot,
+        message: BroadcastMessage,
+        rate: Optional[float] = None,
+        concurrency: Optional[int] = None,
+    ):
+        self.bot = bot
+        self.message = message
+        self.rate = rate or settings.mailing_rate_per_second
+        self.concurrency = max(concurrency or settings.mailing_concurrency, 1)
+        # No burst allowance: Telegram counts messages per second, not on average
+        self.bucket = TokenBucket(self.rate, capacity=1)
+        self.counts: Counter[str] = Counter()
+        self.retries = 0
+        self.photo_file_id: Optional[str] = None
+        self._photo_lock = asyncio.Lock()
+
+    async def _send_photo(self, chat_id: int, photo: Any) -> Any:
+        return await self.bot.send_photo(
+            chat_id=chat_id,
+            photo=photo,
+            caption=self.message.text,
+            reply_markup=self.message.reply_markup,
         )
-        return [row[0] for row in result.all()]
 
-    if audience == "no_orders":
-        subq = select(Order.user_id).distinct()
-        result = await db.execute(
-            select(User.telegram_id).where(User.id.not_in(subq))
+    async def _send(self, chat_id: int) -> None:
+        if self.message.photo:
+            if self.photo_file_id is None:
+                async with self._photo_lock:
+                    if self.photo_file_id is None:
+                        sent = await telegram_files.send_photo(
+                            lambda photo: self._send_photo(chat_id, photo), self.message.photo
+                        )
+                        self.photo_file_id = sent.photo[-1].file_id
+                        return
+                # Waited out another worker's upload: the token taken before is stale
+                await self.bucket.acquire()
+            await self._send_photo(chat_id, self.photo_file_id)
+        else:
+            await self.bot.send_message(
+                chat_id=chat_id,
+                text=self.message.text,
+                reply_markup=self.message.reply_markup,
+            )
+
+    async def send_one(self, chat_id: int) -> tuple[str, Optional[str]]:
+        """Deliver to one chat; returns ``(status, error)``."""
+        from aiogram.exceptions import (
+            TelegramBadRequest,
+            TelegramForbiddenError,
+            TelegramNetworkError,
+            TelegramRetryAfter,
+            TelegramServerError,
         )
-        return [row[0] for row in result.all()]
 
-    # fallback: all
-    result = await db.execute(select(User.telegram_id))
-    return [row[0] for row in result.all()]
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            try:
+                await self._send(chat_id)
+                return DeliveryStatus.SENT, None
+            except TelegramRetryAfter as e:
+                self.bucket.pause(e.retry_after)
+                error = str(e)
+            except TelegramForbiddenError as e:
+                return DeliveryStatus.BLOCKED, str(e)
+            except TelegramBadRequest as e:
+                if "chat not found" in str(e).lower():
+                    return DeliveryStatus.BLOCKED, str(e)
+                return DeliveryStatus.FAILED, str(e)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                await asyncio.sleep(min(2 ** attempt, 10))
+                error = str(e)
+            except Exception as e:
+                return DeliveryStatus.FAILED, str(e)
+            self.retries += 1
+        return DeliveryStatus.FAILED, error
 
+    async def run(
+        self,
+        telegram_ids: Iterable[int] | AsyncIterable[int],
+        on_result: Optional[ResultCallback] = None,
+    ) -> Counter[str]:
+        """Send to every id; returns counts by :class:`DeliveryStatus`."""
+        queue: asyncio.Queue[Optional[int]] = asyncio.Queue(maxsize=self.concurrency * 2)
 
-def _absolute_photo_url(image_url: str) -> str:
-    """Build absolute URL for Telegram (send_photo needs http(s) URL)."""
-    if not image_url:
-        return ""
-    if image_url.startswith("http://") or image_url.startswith("https://"):
-        return image_url
-    base = settings.public_base_url.strip()
-    if not base:
-        parsed = urlparse(settings.webapp_url)
-        base = f"{parsed.scheme}://{parsed.netloc}"
-    return base.rstrip("/") + ("/" + image_url.lstrip("/"))
+        async def worker() -> None:
+            while True:
+                chat_id = await queue.get()
+                if chat_id is None:
+                    return
+                status, error = await self.send_one(chat_id)
+                self.counts[status] += 1
+                if on_result is not None:
+                    await on_result(chat_id, status, error)
 
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            if isinstance(telegram_ids, AsyncIterable):
+                async for chat_id in telegram_ids:
+                    await queue.put(chat_id)
+            else:
+                for chat_id in telegram_ids:
+                    await queue.put(chat_id)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return self.counts
 
-async def send_broadcast(
-    db: AsyncSession,
-    audience: AudienceType,
+
+def build_message(
     text: str,
     photo_url: Optional[str] = None,
     button_text: Optional[str] = None,
     button_url: Optional[str] = None,
-) -> dict:
-    """Send a broadcast to the selected audience. Optional photo and inline button."""
+) -> BroadcastMessage:
+    """Broadcast text with an optional photo and inline URL button."""
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-    telegram_ids = await get_recipients(db, audience)
-    bot = get_bot()
     button_url = (button_url or "").strip() or settings.webapp_url
     reply_markup = None
     if button_text and button_text.strip():
@@ -91,29 +285,9 @@ async def send_broadcast(
                 [InlineKeyboardButton(text=button_text.strip(), url=button_url)]
             ]
         )
+    return BroadcastMessage(
+        text=text,
+        photo=photo_url or None,
+        reply_markup=reply_markup,
+    )
 
-    sent = 0
-    failed = 0
-    abs_photo = _absolute_photo_url(photo_url) if photo_url else None
-
-    for uid in telegram_ids:
-        try:
-            if abs_photo:
-                await bot.send_photo(
-                    chat_id=uid,
-                    photo=abs_photo,
-                    caption=text,
-                    reply_markup=reply_markup,
-                )
-            else:
-                await bot.send_message(
-                    chat_id=uid,
-                    text=text,
-                    reply_markup=reply_markup,
-                )
-            sent += 1
-            await asyncio.sleep(0.05)
-        except Exception:
-            failed += 1
-
-    return {"sent": sent, "failed": failed, "total": len(telegram_ids)}
@@ -0,0 +1,130 @@
+"""Coalesce MoySklad webhook notifications into batched entity syncs.
+
+MoySklad posts one request per change (often several per second while
+someone edits the catalog).  :data:`moysklad_webhooks` only records the
+referenced ids and answers at once; after ``moysklad_webhook_debounce_seconds``
+without new events (but no later than ``_MAX_DELAY_FACTOR`` debounce
+windows after the first one) the collected ids are applied with a single
+:meth:`MoySkladLoader.sync_entities` call.
+
+A flush holds the MoySklad source lease (the one the catalog and stock
+syncs take), so it never writes rows another worker is syncing; while the
+lease is held elsewhere the ids stay queued and the flush is retried every
+``_LEASE_RETRY_SECONDS``.  A failed flush is only logged: the periodic sync
+reconciles the catalog anyway.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A steady stream of events is flushed at least this many debounce windows after it started
+_MAX_DELAY_FACTOR = 5
+# How often a flush retries while another worker holds the source lease
+_LEASE_RETRY_SECONDS = 5.0
+
+
+class WebhookCoalescer:
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        # Injected by benchmarks / tests to talk to a stub instead of the API
+        self.transport = transport
+        self.products: set[str] = set()
+        self.variants: set[str] = set()
+        self.deleted: set[str] = set()
+        self.flushes = 0
+        self._first: Optional[float] = None
+        self._last: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self.products) + len(self.variants) + len(self.deleted)
+
+    def add(self, events: list[dict[str, Any]]) -> int:
+        """Record ``events`` of a webhook body; returns how many were accepted."""
+        from app.services.product_loader.moysklad import _href_id
+
+        accepted = 0
+        for event in events:
+            meta = event.get("meta") or {}
+            entity, href = meta.get("type"), meta.get("href", "")
+            if entity not in ("product", "variant") or f"/entity/{entity}/" not in href:
+                continue
+            entity_id = _href_id(href, entity)
+            action = (event.get("action") or "").upper()
+            if entity == "variant":
+                self.variants.add(entity_id)
+            elif action == "DELETE":
+                self.products.discard(entity_id)
+                self.deleted.add(entity_id)
+            else:
+                self.deleted.discard(entity_id)
+                self.products.add(entity_id)
+            accepted += 1
+
+        if accepted:
+            now = time.monotonic()
+            self._last = now
+            if self._first is None:
+                self._first = now
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._flush_later())
+        return accepted
+
+    async def _flush_later(self) -> None:
+        debounce = max(settings.moysklad_webhook_debounce_seconds, 0.0)
+        # Events that arrive while a flush is syncing get their own window:
+        # ``add`` sees this task still running and does not start another one
+        while self.pending:
+            while True:
+                deadline = min(self._last + debounce, self._first + debounce * _MAX_DELAY_FACTOR)
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            await self.flush()
+
+    async def flush(self) -> None:
+        from app.services.product_loader.moysklad import MoySkladLoader
+        from app.services.sync_coordinator import sync_coordinator
+
+        source = settings.product_source.value
+        async with self._lock:
+            while True:
+                # A running catalog sync writes the same rows; let it finish
+                while sync_coordinator.is_running:
+                    await asyncio.sleep(1)
+                if not self.pending:
+                    return
+                try:
+                    if await sync_coordinator.acquire_lease(source):
+                        break
+                except Exception as e:
+                    logger.error(f"MoySklad webhook sync: failed to acquire sync lease: {e}", exc_info=True)
+                # Another worker syncs the catalog or stock; keep the ids and try again
+                await asyncio.sleep(_LEASE_RETRY_SECONDS)
+            products, variants, deleted = self.products, self.variants, self.deleted
+            self.products, self.variants, self.deleted = set(), set(), set()
+            self._first = self._last = None
+            self.flushes += 1
+            try:
+                await MoySkladLoader(transport=self.transport).sync_entities(products, variants, deleted)
+            except Exception as e:
+                logger.error(f"MoySklad webhook sync failed: {e}", exc_info=True)
+            finally:
+                # A full sync started here meanwhile took the lease over (same owner) and releases it itself
+                if not sync_coordinator.is_running:
+                    await sync_coordinator.release_lease(source)
+
+
+moysklad_webhooks = WebhookCoalescer()
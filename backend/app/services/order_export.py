@@ -0,0 +1,440 @@
+"""Push Mini App orders to MoySklad as ``customerorder`` with reserve.
+
+``create_order`` decrements local stock and marks the order
+``export_status="pending"``; :data:`order_exporter` then creates the
+upstream order in batches (one ``POST /entity/customerorder`` for up to
+``_BATCH`` orders), reserving every position.  Until MoySklad reflects
+the reserve in ``/report/stock/all``, the stock sync subtracts
+:func:`pending_reservations` from what it fetched, so the periodic sync
+no longer hands sold items back to the catalog.
+
+Orders are matched upstream by ``externalCode`` (``tg-<order id>``): a
+retry first looks the codes up, so a batch whose response got lost is
+not created twice.  Orders cancelled before export are skipped.  A failed
+attempt puts the order off for an exponentially growing delay
+(``export_next_at``); after ``_MAX_ATTEMPTS`` it is ``failed`` until
+:func:`requeue_failed` (``POST /admin/orders/export/retry``).  Across
+workers only the holder of the ``moysklad_orders`` lease exports; it is
+renewed after every batch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+import httpx
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import ProductSource, settings
+from app.db.models.order import Order, OrderItem
+from app.db.models.product_variant import ProductVariant
+from app.services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
+LEASE_SOURCE = "moysklad_orders"
+
+_BATCH = 100
+_MAX_ATTEMPTS = 8
+_MAX_RETRIES = 4
+_POLL_SECONDS = 60.0
+# Per-order delay after a failed attempt: 1, 2, 4 … minutes, capped
+_RETRY_BASE_SECONDS = 60.0
+_RETRY_MAX_SECONDS = 6 * 3600.0
+# MoySklad allows 45 requests per 3 seconds per account; stay well below
+_RATE_PER_SECOND = 5.0
+
+
+class OrderExportError(Exception):
+    """MoySklad rejected the whole request or kept failing after retries."""
+
+
+def external_code(order_id: int) -> str:
+    return f"tg-{order_id}"
+
+
+def _meta(entity: str, entity_id: str) -> dict[str, Any]:
+    return {
+        "meta": {
+            "href": f"{BASE_URL}/entity/{entity}/{entity_id}",
+            "type": entity,
+            "mediaType": "application/json",
+        }
+    }
+
+
+def _export_backoff(attempts: int) -> timedelta:
+    """Delay before the next export attempt of an order that failed ``attempts`` times."""
+    seconds = min(_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), _RETRY_MAX_SECONDS)
+    return timedelta(seconds=seconds * (1 + random.random() / 4))
+
+
+async def requeue_failed(db: AsyncSession, order_ids: Optional[list[int]] = None) -> int:
+    """Put ``failed`` exports (all, or only ``order_ids``) back in the queue; no commit."""
+    query = (
+        update(Order)
+        .where(Order.export_status == "failed", Order.status != "cancelled")
+        .values(export_status="pending", export_attempts=0, export_next_at=None, export_error=None)
+        .execution_options(synchronize_session=False)
+    )
+    if order_ids is not None:
+        query = query.where(Order.id.in_(order_ids))
+    result = await db.execute(query)
+    return result.rowcount or 0
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """Seconds to wait before the next attempt; honors the server's hint."""
+    if response is not None:
+        lognex = response.headers.get("X-Lognex-Retry-After")  # milliseconds
+        if lognex and lognex.isdigit():
+            return int(lognex) / 1000
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return min(2 ** attempt, 30) + random.random()
+
+
+async def _variant_ids(db: AsyncSession, items: list[OrderItem]) -> dict[tuple[int, int, str], str]:
+    """``(product_id, modification_type_id, value) -> variant external id``."""
+    product_ids = {
+        item.product_id for item in items if item.modification_type_id and item.modification_value
+    }
+    if not product_ids:
+        return {}
+    result = await db.execute(
+        select(
+            ProductVariant.product_id,
+            ProductVariant.modification_type_id,
+            ProductVariant.value,
+            ProductVariant.external_id,
+        ).where(
+            ProductVariant.product_id.in_(product_ids),
+            ProductVariant.external_id.isnot(None),
+        )
+    )
+    return {(pid, type_id, value): ext_id for pid, type_id, value, ext_id in result.all()}
+
+
+def _positions(order: Order, variant_ids: dict[tuple[int, int, str], str]) -> list[dict[str, Any]]:
+    positions = []
+    for item in order.items:
+        if item.modification_type_id and item.modification_value:
+            ext_id = variant_ids.get((item.product_id, item.modification_type_id, item.modification_value))
+            assortment = _meta("variant", ext_id) if ext_id else None
+        else:
+            ext_id = item.product.external_id if item.product else None
+            assortment = _meta("product", ext_id) if ext_id else None
+        if assortment is None:
+            continue
+        positions.append({
+            "quantity": item.quantity,
+            "reserve": item.quantity,
+            # MoySklad prices are in kopecks
+            "price": round(float(item.price_at_order) * 100),
+            "assortment": assortment,
+        })
+    return positions
+
+
+def _order_payload(order: Order, positions: list[dict[str, Any]]) -> dict[str, Any]:
+    lines = [f"Заказ #{order.id} из Telegram Mini App", f"{order.customer_name} {order.customer_phone}".strip()]
+    if order.address:
+        lines.append(order.address)
+    payload: dict[str, Any] = {
+        "externalCode": external_code(order.id),
+        "organization": _meta("organization", settings.moysklad_organization_id),
+        "agent": _meta("counterparty", settings.moysklad_agent_id),
+        "description": "\n".join(lines),
+        "positions": positions,
+    }
+    if settings.moysklad_store_id:
+        payload["store"] = _meta("store", settings.moysklad_store_id)
+    return payload
+
+
+async def pending_reservations(
+    db: AsyncSession, fetched_at: datetime
+) -> tuple[dict[str, int], dict[str, int]]:
+    """Quantities sold locally that a stock listing fetched at ``fetched_at`` may miss.
+
+    Counts orders still waiting for export and orders exported after
+    the listing was fetched.  Returns ``(product external id -> qty,
+    variant external id -> qty)``.
+    """
+    result = await db.execute(
+        select(Order)
+        .where(
+            Order.status != "cancelled",
+            or_(
+                Order.export_status == "pending",
+                (Order.export_status == "exported") & (Order.exported_at >= fetched_at),
+            ),
+        )
+        .options(selectinload(Order.items).selectinload(OrderItem.product))
+    )
+    orders = list(result.scalars().all())
+    items = [item for order in orders for item in order.items]
+    variant_ids = await _variant_ids(db, items)
+
+    products: dict[str, int] = {}
+    variants: dict[str, int] = {}
+    for item in items:
+        if item.modification_type_id and item.modification_value:
+            ext_id = variant_ids.get((item.product_id, item.modification_type_id, item.modification_value))
+            if ext_id:
+                variants[ext_id] = variants.get(ext_id, 0) + item.quantity
+        elif item.product and item.product.external_id:
+            ext_id = item.product.external_id
+            products[ext_id] = products.get(ext_id, 0) + item.quantity
+    return products, variants
+
+
+def subtract_reservations(stock: dict[str, float], reserved: dict[str, int]) -> None:
+    """Apply :func:`pending_reservations` to a fetched stock map in place (floored at 0)."""
+    for ext_id, qty in reserved.items():
+        if ext_id in stock:
+            stock[ext_id] = max(stock[ext_id] - qty, 0)
+
+
+class OrderExporter:
+    """Background worker that creates pending orders in MoySklad.
+
+    :meth:`wake` is called after an order is committed; the worker also
+    polls every ``_POLL_SECONDS`` for retries and orders committed by
+    other workers.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        # Injected by benchmarks / tests to talk to a stub instead of the API
+        self.transport = transport
+        self.bucket = TokenBucket(_RATE_PER_SECOND, capacity=_RATE_PER_SECOND)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        # Exported orders reserve MoySklad stock; only meaningful when the catalog comes from there
+        return bool(
+            settings.product_source == ProductSource.MOYSKLAD
+            and settings.moysklad_order_export
+            and settings.moysklad_token
+            and settings.moysklad_organization_id
+            and settings.moysklad_agent_id
+        )
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=60.0,
+            transport=self.transport,
+            headers={"Authorization": f"Bearer {settings.moysklad_token}"},
+        )
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.export_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Order export failed: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _request(self, client: httpx.AsyncClient, method: str, path: str, **kwargs) -> httpx.Response:
+        """Rate-limited request; retries 429, 5xx and network errors."""
+        for attempt in range(_MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            response = None
+            try:
+                response = await client.request(method, f"{BASE_URL}{path}", **kwargs)
+            except httpx.TransportError as e:
+                if attempt == _MAX_RETRIES:
+                    raise OrderExportError(f"MoySklad unreachable: {e}") from e
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                if attempt == _MAX_RETRIES:
+                    raise OrderExportError(f"MoySklad API error {response.status_code}")
+            delay = _retry_delay(response, attempt)
+            if response is not None and response.status_code == 429:
+                self.bucket.pause(delay)
+            logger.warning(f"MoySklad order export: retry in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def _find_existing(self, client: httpx.AsyncClient, codes: list[str]) -> dict[str, str]:
+        """``externalCode -> MoySklad id`` for orders that already exist upstream."""
+        response = await self._request(
+            client,
+            "GET",
+            "/entity/customerorder",
+            params={"filter": ";".join(f"externalCode={code}" for code in codes), "limit": len(codes)},
+        )
+        if response.status_code != 200:
+            raise OrderExportError(f"MoySklad API error {response.status_code}")
+        return {row["externalCode"]: row["id"] for row in response.json().get("rows", [])}
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    async def export_pending(self) -> int:
+        """Export pending orders batch by batch; returns the number exported."""
+        from app.db.session import async_session
+        from app.services.sync_coordinator import sync_coordinator
+
+        if not self.enabled:
+            return 0
+        if not await sync_coordinator.acquire_lease(LEASE_SOURCE):
+            return 0
+        exported = 0
+        try:
+            async with self._client() as client:
+                while True:
+                    async with async_session() as db:
+                        done, batch_size = await self._export_batch(db, client)
+                        await db.commit()
+                    exported += done
+                    # A short batch ends the queue; one with nothing exported means MoySklad
+                    # is failing — the orders are put off, the poll comes back to them
+                    if batch_size < _BATCH or not done:
+                        break
+                    # Renew the lease; a long backlog outlives its TTL
+                    if not await sync_coordinator.acquire_lease(LEASE_SOURCE):
+                        logger.warning("MoySklad order export: lease lost, stopping")
+                        break
+        finally:
+            await sync_coordinator.release_lease(LEASE_SOURCE)
+        if exported:
+            logger.info(f"MoySklad: exported {exported} orders")
+        return exported
+
+    async def _export_batch(self, db: AsyncSession, client: httpx.AsyncClient) -> tuple[int, int]:
+        # Cancelled before they were exported: nothing to reserve upstream
+        await db.execute(
+            update(Order)
+            .where(Order.export_status == "pending", Order.status == "cancelled")
+            .values(export_status="skipped", export_error="Order cancelled before export")
+            .execution_options(synchronize_session=False)
+        )
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            select(Order)
+            .where(
+                Order.export_status == "pending",
+                Order.status != "cancelled",
+                or_(Order.export_next_at.is_(None), Order.export_next_at <= now),
+            )
+            .order_by(Order.id)
+            .limit(_BATCH)
+            .options(selectinload(Order.items).selectinload(OrderItem.product))
+        )
+        orders = list(result.scalars().all())
+        if not orders:
+            return 0, 0
+
+        retried = [external_code(order.id) for order in orders if order.export_attempts]
+        existing = await self._find_existing(client, retried) if retried else {}
+
+        variant_ids = await _variant_ids(db, [item for order in orders for item in order.items])
+        to_send: list[tuple[Order, dict[str, Any]]] = []
+        done = 0
+        for order in orders:
+            code = external_code(order.id)
+            if code in existing:
+                self._mark_exported(order, existing[code], now)
+                done += 1
+                continue
+            positions = _positions(order, variant_ids)
+            if not positions:
+                order.export_status = "skipped"
+                order.export_error = "No positions linked to MoySklad"
+                continue
+            to_send.append((order, _order_payload(order, positions)))
+
+        if not to_send:
+            return done, len(orders)
+
+        try:
+            response = await self._request(
+                client, "POST", "/entity/customerorder", json=[payload for _, payload in to_send]
+            )
+        except OrderExportError as e:
+            for order, _ in to_send:
+                self._mark_failed(order, str(e), now)
+            return done, len(orders)
+
+        body = response.json() if response.content else None
+        if response.status_code != 200 or not isinstance(body, list):
+            error = _error_text(body) or f"HTTP {response.status_code}"
+            logger.warning(f"MoySklad rejected order batch: {error}")
+            for order, _ in to_send:
+                self._mark_failed(order, error, now)
+            return done, len(orders)
+
+        # The response holds one element per payload, in order
+        for (order, _), row in zip(to_send, body):
+            if isinstance(row, dict) and row.get("id") and not row.get("errors"):
+                self._mark_exported(order, row["id"], now)
+                done += 1
+            else:
+                self._mark_failed(order, _error_text(row) or "Unknown error", now)
+        return done, len(orders)
+
+    @staticmethod
+    def _mark_exported(order: Order, external_id: str, now: datetime) -> None:
+        order.export_status = "exported"
+        order.external_id = external_id
+        order.exported_at = now
+        order.export_error = None
+        order.export_next_at = None
+
+    @staticmethod
+    def _mark_failed(order: Order, error: str, now: datetime) -> None:
+        order.export_attempts = (order.export_attempts or 0) + 1
+        order.export_error = error[:1000]
+        order.export_next_at = now + _export_backoff(order.export_attempts)
+        if order.export_attempts >= _MAX_ATTEMPTS:
+            order.export_status = "failed"
+            logger.error(f"Order #{order.id} export to MoySklad failed: {error}")
+
+
+def _error_text(body: Any) -> Optional[str]:
+    if isinstance(body, dict):
+        errors = body.get("errors") or []
+        return "; ".join(str(e.get("error", e)) for e in errors) or None
+    if isinstance(body, list):
+        texts = [_error_text(row) for row in body]
+        return "; ".join(t for t in texts if t) or None
+    return None
+
+
+order_exporter = OrderExporter()
@@ -0,0 +1,184 @@
+"""Rendered product cards for bot deep links (``/start product_<id>``).
+
+A link shared in a big channel is opened by thousands of users within
+seconds; :data:`product_cards` keeps the rendered card (caption,
+keyboard, image and its Telegram ``file_id``) per product in a bounded
+in-memory LRU so repeated opens do not touch the database.
+
+Admin edits and catalog / stock syncs invalidate cards in the worker
+that made the change; other workers re-render after
+``BOT_CARD_CACHE_SECONDS``.  A re-rendered card whose content hash is
+unchanged keeps its ``file_id``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.db.models.product import Product
+
+_MAX_CARDS = 2048
+# Keep "not found" briefly too, so links to deleted products stay cheap
+_MISSING_SECONDS = 30.0
+
+
+@dataclass
+class ProductCard:
+    product_id: int
+    caption: str
+    keyboard: InlineKeyboardMarkup
+    image_url: Optional[str]
+    # sha256 of what the card shows
+    digest: str
+    photo_file_id: Optional[str] = None
+
+
+def _image_url(product: Product) -> Optional[str]:
+    image_url = None
+    if product.media:
+        for m in sorted(product.media, key=lambda x: x.sort_order):
+            if m.media_type == "image":
+                image_url = m.file_path
+                break
+    if not image_url and product.image_url:
+        image_url = product.image_url
+    if image_url and (image_url.startswith("http") or image_url.startswith("/uploads/")):
+        return image_url
+    return None
+
+
+def render_card(product: Product, webapp_url: str) -> ProductCard:
+    """Caption and Mini App buttons for a product."""
+    text_parts = [f"<b>{product.name}</b>"]
+    if product.categories:
+        cat_names = ", ".join(c.name for c in product.categories)
+        text_parts.append(f"📂 {cat_names}")
+    text_parts.append(f"💰 <b>{product.price:,.0f} ₽</b>")
+    if product.old_price:
+        text_parts.append(f"<s>{product.old_price:,.0f} ₽</s>")
+    if product.description:
+        desc = product.description[:200]
+        if len(product.description) > 200:
+            desc += "..."
+        text_parts.append(f"\n{desc}")
+
+    if product.stock_quantity <= 0:
+        text_parts.append("\n⚠️ Нет в наличии")
+
+    caption = "\n".join(text_parts)
+    product_url = f"{webapp_url}/product/{product.id}"
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🔍 Посмотреть товар",
+                    web_app=WebAppInfo(url=product_url),
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text="🛍 Открыть магазин",
+                    web_app=WebAppInfo(url=webapp_url),
+                )
+            ],
+        ]
+    )
+    image_url = _image_url(product)
+    digest = hashlib.sha256(f"{caption}\0{image_url or ''}\0{webapp_url}".encode("utf-8")).hexdigest()
+    return ProductCard(
+        product_id=product.id, caption=caption, keyboard=keyboard, image_url=image_url, digest=digest
+    )
+
+
+class ProductCardCache:
+    def __init__(self, max_cards: int = _MAX_CARDS):
+        self.max_cards = max_cards
+        # product id -> (card or None for "not found", cached at)
+        self._cards: OrderedDict[int, tuple[Optional[ProductCard], float]] = OrderedDict()
+        # Digests of invalidated cards, to carry their file_id over
+        self._file_ids: dict[int, tuple[str, str]] = {}
+        self._loading: dict[int, asyncio.Future] = {}
+        # Bumped on invalidation: a card read before it is not stored
+        self._generation = 0
+
+    def _fresh(self, cached: tuple[Optional[ProductCard], float]) -> bool:
+        card, cached_at = cached
+        ttl = settings.bot_card_cache_seconds if card is not None else _MISSING_SECONDS
+        return time.monotonic() - cached_at < ttl
+
+    def _store(self, product_id: int, card: Optional[ProductCard]) -> None:
+        self._cards[product_id] = (card, time.monotonic())
+        self._cards.move_to_end(product_id)
+        while len(self._cards) > self.max_cards:
+            self._cards.popitem(last=False)
+
+    def _forget(self, product_id: int) -> None:
+        cached = self._cards.pop(product_id, None)
+        if cached and cached[0] is not None and cached[0].photo_file_id:
+            self._file_ids[product_id] = (cached[0].digest, cached[0].photo_file_id)
+
+    def invalidate(self, product_id: Optional[int] = None) -> None:
+        """Drop one product's card, or every card."""
+        self._generation += 1
+        if product_id is not None:
+            self._forget(product_id)
+            return
+        for cached_id in list(self._cards):
+            self._forget(cached_id)
+
+    async def get(self, product_id: int, webapp_url: str) -> Optional[ProductCard]:
+        """The card for ``product_id``, rendered from the database on a miss.
+
+        Concurrent misses for one product share a single query.
+        """
+        cached = self._cards.get(product_id)
+        if cached is not None and self._fresh(cached):
+            self._cards.move_to_end(product_id)
+            return cached[0]
+        if cached is not None:
+            self._forget(product_id)
+
+        loading = self._loading.get(product_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(product_id, webapp_url))
+            self._loading[product_id] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(product_id, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, product_id: int, webapp_url: str) -> Optional[ProductCard]:
+        from app.db.session import fresh_read_session
+
+        generation = self._generation
+        async with fresh_read_session() as db:
+            result = await db.execute(
+                select(Product)
+                .where(Product.id == product_id)
+                .options(
+                    selectinload(Product.categories),
+                    selectinload(Product.media),
+                )
+            )
+            product = result.scalar_one_or_none()
+        card = render_card(product, webapp_url) if product is not None else None
+
+        previous = self._file_ids.pop(product_id, None)
+        if card is not None and previous and previous[0] == card.digest:
+            card.photo_file_id = previous[1]
+        while len(self._file_ids) > self.max_cards:
+            self._file_ids.pop(next(iter(self._file_ids)))
+        if generation == self._generation:
+            self._store(product_id, card)
+        return card
+
+
+product_cards = ProductCardCache()
@@ -1,5 +1,6 @@
 from app.config import settings, ProductSource
 from app.services.product_loader.base import BaseProductLoader
+from app.services.product_loader.commerceml import CommerceMLLoader
 from app.services.product_loader.db_loader import DatabaseLoader
 from app.services.product_loader.moysklad import MoySkladLoader
 from app.services.product_loader.one_c import OneCLoader
@@ -12,6 +13,8 @@ def get_product_loader(**kwargs) -> BaseProductLoader:
         return MoySkladLoader()
     elif source == ProductSource.ONE_C:
         return OneCLoader()
+    elif source == ProductSource.COMMERCEML:
+        return CommerceMLLoader()
     else:
         return DatabaseLoader(kwargs.get("db"))
 
@@ -1,7 +1,81 @@
 from __future__ import annotations
 
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class SyncStats:
+    """Outcome of a single ``sync_products`` run."""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    # Time spent waiting for upstream responses vs decoding them (summed
+    # across concurrent requests); filled by loaders that measure it
+    network_seconds: float = 0.0
+    parse_seconds: float = 0.0
+
+    @property
+    def synced(self) -> int:
+        """Products present upstream (inserted + updated + unchanged)."""
+        return self.inserted + self.updated + self.unchanged
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["network_seconds"] = round(self.network_seconds, 3)
+        data["parse_seconds"] = round(self.parse_seconds, 3)
+        return {**data, "synced": self.synced}
+
+    def __str__(self) -> str:
+        text = (
+            f"inserted={self.inserted} updated={self.updated} "
+            f"unchanged={self.unchanged} deleted={self.deleted}"
+        )
+        if self.network_seconds or self.parse_seconds:
+            text += f" network={self.network_seconds:.2f}s parse={self.parse_seconds:.2f}s"
+        return text
+
+
+class SyncProgress:
+    """Live progress of a sync run, updated by the loader while it works."""
+
+    def __init__(self):
+        self.phase = "pending"
+        self.processed = 0
+        self.total: Optional[int] = None
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def set_phase(self, phase: str, total: Optional[int] = None) -> None:
+        self.phase = phase
+        if total is not None:
+            self.total = total
+
+    def advance(self, count: int) -> None:
+        self.processed += count
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Phase, rows processed, throughput (rows/s) and ETA (s) if the total is known."""
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        throughput = self.processed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and throughput > 0:
+            eta = round(max(self.total - self.processed, 0) / throughput, 1)
+        return {
+            "phase": self.phase,
+            "processed": self.processed,
+            "total": self.total,
+            "elapsed_seconds": round(elapsed, 1),
+            "throughput": round(throughput, 1),
+            "eta_seconds": eta,
+        }
 
 
 class BaseProductLoader(ABC):
@@ -13,11 +87,6 @@ class BaseProductLoader(ABC):
         ...
 
     @abstractmethod
-    async def sync_products(self) -> int:
-        """Sync products from external source to database. Returns count of synced products."""
+    async def sync_products(self, progress: Optional[SyncProgress] = None) -> SyncStats:
+        """Sync products from external source to database, reporting into ``progress``."""
         ...
-
-
-
-
-
@@ -0,0 +1,398 @@
+"""CommerceML 2 loader — the 1C "обмен с сайтом" file format.
+
+1C drops ``import*.xml`` (classifier groups and the catalog) and
+``offers*.xml`` (prices, stock, characteristics) into ``commerceml_dir``.
+Exports of big catalogs run into hundreds of megabytes, so both are read
+with ``iterparse`` and every ``Товар`` / ``Предложение`` element is
+dropped as soon as it has been handled.
+
+Offers are read first into a compact per-product map (price, stock,
+variants); products then stream from the import in batches through
+:func:`run_pipeline` into :class:`ProductUpserter`.  Parsing runs in a
+worker thread so the event loop keeps serving requests.  Pictures
+(``Картинка``) are not imported.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from sqlalchemy import bindparam, select, update
+
+from app.config import settings
+from app.db.models.category import Category
+from app.db.models.product import Product
+from app.services.product_loader.base import BaseProductLoader, SyncProgress, SyncStats
+from app.services.product_loader.pipeline import run_pipeline
+from app.services.product_loader.upsert import ProductUpserter, variant_item
+
+logger = logging.getLogger(__name__)
+
+_BATCH = 500
+
+
+@dataclass
+class _Offers:
+    """Everything the sync needs from ``offers*.xml``, keyed by product ``Ид``."""
+
+    prices: dict[str, float] = field(default_factory=dict)
+    stock: dict[str, int] = field(default_factory=dict)
+    variants: dict[str, list[dict[str, Any]]] = field(default_factory=dict)
+    only_changes: bool = False
+    files: int = 0
+
+    @property
+    def complete(self) -> bool:
+        """Offers cover the whole catalog: a product without an offer has no price and no stock."""
+        return self.files > 0 and not self.only_changes
+
+
+@dataclass
+class _ImportBatch:
+    groups: list[tuple[str, str, Optional[str]]] = field(default_factory=list)
+    products: list[dict[str, Any]] = field(default_factory=list)
+    only_changes: bool = False
+
+
+# ----------------------------------------------------------------------
+# XML helpers
+# ----------------------------------------------------------------------
+
+
+def _local(tag: str) -> str:
+    """Tag name without the ``urn:1C.ru:commerceml_2`` namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(elem: ET.Element, name: str) -> Optional[ET.Element]:
+    for child in elem:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _children(elem: ET.Element, name: str) -> Iterator[ET.Element]:
+    for child in elem:
+        if _local(child.tag) == name:
+            yield child
+
+
+def _text(elem: Optional[ET.Element], name: str) -> str:
+    child = _child(elem, name) if elem is not None else None
+    return (child.text or "").strip() if child is not None else ""
+
+
+def _number(value: str) -> float:
+    try:
+        return float(value.replace("\xa0", "").replace(" ", "").replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+def _is_true(value: str) -> bool:
+    return value.strip().lower() in ("true", "истина", "1")
+
+
+def _only_changes(elem: ET.Element) -> bool:
+    return _is_true(elem.get("СодержитТолькоИзменения", "false"))
+
+
+def _characteristics(elem: ET.Element) -> list[tuple[str, str]]:
+    block = _child(elem, "ХарактеристикиТовара")
+    if block is None:
+        return []
+    return [
+        (_text(item, "Наименование"), _text(item, "Значение"))
+        for item in _children(block, "ХарактеристикаТовара")
+        if _text(item, "Наименование") and _text(item, "Значение")
+    ]
+
+
+def _offer_quantity(offer: ET.Element) -> Optional[int]:
+    """``Количество``, or the sum over warehouses in ``Остатки`` / ``Склад``."""
+    direct = _child(offer, "Количество")
+    if direct is not None:
+        return int(_number(direct.text or "0"))
+    total = None
+    rests = _child(offer, "Остатки")
+    if rests is not None:
+        for rest in _children(rests, "Остаток"):
+            stores = list(_children(rest, "Склад")) or [rest]
+            for store in stores:
+                total = (total or 0) + int(_number(_text(store, "Количество") or "0"))
+    for store in _children(offer, "Склад"):
+        total = (total or 0) + int(_number(store.get("КоличествоНаСкладе", "0")))
+    return total
+
+
+def _iterparse(path: Path) -> Iterator[tuple[str, ET.Element, list[str], list[ET.Element]]]:
+    """Yield ``(event, element, path names, open elements)`` with namespaces stripped."""
+    names: list[str] = []
+    stack: list[ET.Element] = []
+    for event, elem in ET.iterparse(str(path), events=("start", "end")):
+        if event == "start":
+            names.append(_local(elem.tag))
+            stack.append(elem)
+            yield event, elem, names, stack
+        else:
+            yield event, elem, names, stack
+            names.pop()
+            stack.pop()
+
+
+def _drop(elem: ET.Element, stack: list[ET.Element]) -> None:
+    """Free a handled element: clear it and detach it from its parent."""
+    elem.clear()
+    if len(stack) >= 2:
+        stack[-2].remove(elem)
+
+
+# ----------------------------------------------------------------------
+# Readers (run in a worker thread)
+# ----------------------------------------------------------------------
+
+
+def _read_offers(paths: list[Path], price_type: str) -> _Offers:
+    offers = _Offers()
+    price_type_ids: set[str] = set()
+    variant_prices: dict[str, float] = {}
+
+    for path in paths:
+        offers.files += 1
+        for event, elem, names, stack in _iterparse(path):
+            tag = names[-1]
+            if event == "start":
+                if tag == "ПакетПредложений":
+                    offers.only_changes = offers.only_changes or _only_changes(elem)
+                continue
+
+            if tag == "ТипЦены" and len(names) >= 2 and names[-2] == "ТипыЦен":
+                if price_type and _text(elem, "Наименование") == price_type:
+                    price_type_ids.add(_text(elem, "Ид"))
+            elif tag == "Предложение" and len(names) >= 2 and names[-2] == "Предложения":
+                offer_id = _text(elem, "Ид")
+                product_id, _, characteristic_id = offer_id.partition("#")
+                price = _offer_price(elem, price_type_ids if price_type else None)
+                quantity = _offer_quantity(elem)
+                characteristics = _characteristics(elem)
+
+                if characteristic_id or characteristics:
+                    if not characteristics:
+                        characteristics = [("Вариант", _text(elem, "Наименование") or characteristic_id)]
+                    offers.variants.setdefault(product_id, []).append(
+                        variant_item(characteristics, max(quantity or 0, 0), offer_id)
+                    )
+                    if price is not None:
+                        variant_prices.setdefault(product_id, price)
+                else:
+                    if price is not None:
+                        offers.prices[product_id] = price
+                    if quantity is not None:
+                        offers.stock[product_id] = max(quantity, 0)
+                _drop(elem, stack)
+
+    # Products sold only as characteristics: price of the first one, stock summed
+    for product_id, price in variant_prices.items():
+        offers.prices.setdefault(product_id, price)
+    for product_id, variants in offers.variants.items():
+        offers.stock[product_id] = sum(v["quantity"] for v in variants)
+    return offers
+
+
+def _offer_price(offer: ET.Element, price_type_ids: Optional[set[str]]) -> Optional[float]:
+    prices = _child(offer, "Цены")
+    if prices is None:
+        return None
+    for price in _children(prices, "Цена"):
+        if price_type_ids is None or _text(price, "ИдТипаЦены") in price_type_ids:
+            return _number(_text(price, "ЦенаЗаЕдиницу") or "0")
+    return None
+
+
+def _read_import(paths: list[Path], batch_size: int = _BATCH) -> Iterator[_ImportBatch]:
+    """Yield groups and products from ``import*.xml`` in batches of ``batch_size`` products."""
+    batch = _ImportBatch()
+    for path in paths:
+        for event, elem, names, stack in _iterparse(path):
+            tag = names[-1]
+            if event == "start":
+                if tag in ("Каталог", "Классификатор"):
+                    batch.only_changes = batch.only_changes or _only_changes(elem)
+                continue
+
+            if tag == "Группа" and "Классификатор" in names and names[-2] == "Группы":
+                parent_id = None
+                if len(names) >= 3 and names[-3] == "Группа":
+                    parent_id = _text(stack[-3], "Ид") or None
+                batch.groups.append((_text(elem, "Ид"), _text(elem, "Наименование"), parent_id))
+            elif tag == "Товар" and names[-2] == "Товары":
+                product = _import_product(elem)
+                if product is not None:
+                    batch.products.append(product)
+                _drop(elem, stack)
+                if len(batch.products) >= batch_size:
+                    yield batch
+                    batch = _ImportBatch(only_changes=batch.only_changes)
+    if batch.products or batch.groups:
+        yield batch
+
+
+def _import_product(elem: ET.Element) -> Optional[dict[str, Any]]:
+    product_id = _text(elem, "Ид")
+    if not product_id or "#" in product_id:
+        # Characteristics exported as separate "products": covered by the offers
+        return None
+    groups = _child(elem, "Группы")
+    return {
+        "id": product_id,
+        "name": _text(elem, "Наименование"),
+        "description": _text(elem, "Описание"),
+        "groups": [g.text.strip() for g in _children(groups, "Ид") if g.text] if groups is not None else [],
+        "deleted": _is_true(_text(elem, "ПометкаУдаления") or "false") or elem.get("Статус") == "Удален",
+    }
+
+
+# ----------------------------------------------------------------------
+# Loader
+# ----------------------------------------------------------------------
+
+
+class CommerceMLLoader(BaseProductLoader):
+    """Load products from CommerceML files exported by 1C."""
+
+    SOURCE = "commerceml"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.commerceml_dir
+        self.price_type = settings.commerceml_price_type.strip()
+        self.category_ids: dict[str, int] = {}
+
+    def _files(self, prefix: str) -> list[Path]:
+        if not self.directory:
+            return []
+        return sorted(Path(self.directory).glob(f"{prefix}*.xml"))
+
+    async def _iter_import(self) -> AsyncIterator[_ImportBatch]:
+        batches = _read_import(self._files("import"))
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                return
+            yield batch
+
+    def _item(self, product: dict[str, Any], offers: _Offers) -> dict[str, Any]:
+        if product["deleted"]:
+            return {"external_id": product["id"], "archived": True}
+        item = {
+            "external_id": product["id"],
+            "name": product["name"],
+            "description": product["description"],
+            "category_ids": [
+                self.category_ids[group] for group in product["groups"] if group in self.category_ids
+            ],
+        }
+        # Partial or missing offers: a product without an offer keeps its price and stock
+        if offers.complete or product["id"] in offers.prices:
+            item["price"] = offers.prices.get(product["id"], 0.0)
+        if offers.complete or product["id"] in offers.stock:
+            item["stock_quantity"] = offers.stock.get(product["id"], 0)
+        return item
+
+    async def _resolve_groups(self, db, batch: _ImportBatch, upserter: ProductUpserter) -> None:
+        if batch.groups:
+            self.category_ids.update(await upserter.upsert_categories(batch.groups))
+        unknown = {
+            group for product in batch.products for group in product["groups"]
+        } - self.category_ids.keys()
+        # Partial exports reference groups sent in an earlier exchange
+        unknown_ids = list(unknown)
+        for i in range(0, len(unknown_ids), _BATCH):
+            result = await db.execute(
+                select(Category.external_id, Category.id).where(
+                    Category.external_id.in_(unknown_ids[i:i + _BATCH])
+                )
+            )
+            self.category_ids.update(result.all())
+
+    async def load_products(self) -> list[dict[str, Any]]:
+        """Parse the current files into loader items (categories must already exist)."""
+        offers = await asyncio.to_thread(_read_offers, self._files("offers"), self.price_type)
+        products: list[dict[str, Any]] = []
+        async for batch in self._iter_import():
+            products.extend(self._item(product, offers) for product in batch.products)
+        return products
+
+    async def sync_products(self, progress: SyncProgress | None = None) -> SyncStats:
+        from app.db.session import async_session
+
+        progress = progress or SyncProgress()
+        stats = SyncStats()
+        import_files = self._files("import")
+        if not import_files:
+            logger.warning(f"CommerceML: no import*.xml in {self.directory or '(COMMERCEML_DIR not set)'}")
+            return stats
+
+        progress.set_phase("offers")
+        offers = await asyncio.to_thread(_read_offers, self._files("offers"), self.price_type)
+        logger.info(
+            f"CommerceML: {len(offers.prices)} priced offers, "
+            f"{len(offers.variants)} products with characteristics"
+        )
+
+        seen: set[str] = set()
+        import_only_changes = False
+
+        async def upsert_batch(batch: _ImportBatch) -> None:
+            nonlocal import_only_changes
+            import_only_changes = import_only_changes or batch.only_changes
+            async with async_session() as db:
+                upserter = ProductUpserter(db, stats)
+                await self._resolve_groups(db, batch, upserter)
+                items = [self._item(product, offers) for product in batch.products]
+                await upserter.upsert(items)
+                live = [item["external_id"] for item in items if not item.get("archived")]
+                if offers.complete:
+                    variants = {ext_id: offers.variants.get(ext_id, []) for ext_id in live}
+                else:
+                    variants = {ext_id: offers.variants[ext_id] for ext_id in live if ext_id in offers.variants}
+                await upserter.upsert_variants(variants)
+                await db.commit()
+            seen.update(item["external_id"] for item in items)
+            progress.advance(len(items))
+
+        progress.set_phase("products")
+        await run_pipeline(self._iter_import(), upsert_batch, max_in_flight=settings.sync_max_inflight_pages)
+
+        progress.set_phase("finalize")
+        async with async_session() as db:
+            upserter = ProductUpserter(db, stats)
+            if seen and not import_only_changes:
+                await upserter.delete_missing(seen)
+            # Offers for products that were not part of this import (partial exchange)
+            await _apply_prices(db, {k: v for k, v in offers.prices.items() if k not in seen})
+            await upserter.upsert_variants(
+                {k: v for k, v in offers.variants.items() if k not in seen}
+            )
+            if offers.files:
+                await upserter.apply_stock(offers.stock, partial=offers.only_changes)
+            await db.commit()
+        logger.info(f"CommerceML sync complete: {stats}")
+        return stats
+
+
+async def _apply_prices(db, prices: dict[str, float]) -> None:
+    """Write offer prices of products already in the database (executemany)."""
+    if not prices:
+        return
+    products = Product.__table__
+    await db.execute(
+        update(products)
+        .where(products.c.external_id == bindparam("ext_id"))
+        .values(price=bindparam("new_price")),
+        [{"ext_id": ext_id, "new_price": price} for ext_id, price in prices.items()],
+    )
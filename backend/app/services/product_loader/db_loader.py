@@ -7,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.db.models.product import Product
-from app.services.product_loader.base import BaseProductLoader
+from app.services.product_loader.base import BaseProductLoader, SyncProgress, SyncStats
 
 
 class DatabaseLoader(BaseProductLoader):
@@ -36,9 +36,9 @@ class DatabaseLoader(BaseProductLoader):
             for p in products
         ]
 
-    async def sync_products(self) -> int:
+    async def sync_products(self, progress: SyncProgress | None = None) -> SyncStats:
         # No sync needed for database source
-        return 0
+        return SyncStats()
 
 
 
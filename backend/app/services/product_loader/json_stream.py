@@ -0,0 +1,162 @@
+"""Incremental parser for large JSON list documents.
+
+1C services often return the whole catalog as one document — either a
+bare array or an OData envelope ``{"value": [...], ...}``.  Loading such
+a body with ``response.json()`` needs the full text plus the full object
+tree in memory at once.  :class:`JsonArrayStream` is fed the body chunk
+by chunk and hands back array items as soon as each one is complete, so
+only the unparsed tail of the document is buffered.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Any
+
+_WS = re.compile(r"[ \t\n\r]*")
+# Characters that may continue a number ("1" + ".5", "1." + "5", "1e" + "3")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*")
+
+# Pending text that still does not form a complete item: malformed input
+_MAX_PENDING_CHARS = 8 * 1024 * 1024
+
+
+class JsonArrayStream:
+    """Push parser yielding the items of a top-level array (or of ``key`` in an object).
+
+    Usage::
+
+        parser = JsonArrayStream()
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                ...
+        for item in parser.close():
+            ...
+
+    Raises :class:`ValueError` (``json.JSONDecodeError`` included) on
+    malformed or truncated input.
+    """
+
+    def __init__(self, key: str = "value"):
+        self.key = key
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"  # start | keys | items | done
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, data: bytes) -> list[Any]:
+        self._buf = self._buf[self._pos:] + self._utf8.decode(data)
+        self._pos = 0
+        items = self._parse(final=False)
+        if len(self._buf) - self._pos > _MAX_PENDING_CHARS:
+            raise ValueError("JSON item exceeds the stream buffer limit")
+        return items
+
+    def close(self) -> list[Any]:
+        self._buf = self._buf[self._pos:] + self._utf8.decode(b"", final=True)
+        self._pos = 0
+        items = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Truncated JSON document")
+        return items
+
+    def _skip_ws(self, idx: int) -> int:
+        return _WS.match(self._buf, idx).end()
+
+    def _decode(self, idx: int, final: bool) -> tuple[Any, int] | None:
+        """Decode one value at ``idx``; ``None`` when more input is needed.
+
+        A value ending exactly at the end of the buffer may be a number
+        cut in half, and so may a number followed only by number
+        characters (``1.`` parses as ``1``); both are only accepted once
+        the input is final.
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buf, idx)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        if not final:
+            if end == len(self._buf):
+                return None
+            if (
+                isinstance(value, (int, float))
+                and not isinstance(value, bool)
+                and _NUMBER_TAIL.match(self._buf, end).end() == len(self._buf)
+            ):
+                return None
+        return value, end
+
+    def _parse(self, final: bool) -> list[Any]:
+        items: list[Any] = []
+        buf = self._buf
+        while self._state != "done":
+            idx = self._skip_ws(self._pos)
+            if idx >= len(buf):
+                self._pos = idx
+                break
+            char = buf[idx]
+
+            if self._state == "start":
+                if char == "[":
+                    self._state = "items"
+                elif char == "{":
+                    self._state = "keys"
+                else:
+                    raise ValueError(f"Expected a JSON array or object, got {char!r}")
+                self._pos = idx + 1
+
+            elif self._state == "items":
+                if char == "]":
+                    self._state = "done"
+                    self._pos = idx + 1
+                elif char == ",":
+                    self._pos = idx + 1
+                else:
+                    decoded = self._decode(idx, final)
+                    if decoded is None:
+                        break
+                    items.append(decoded[0])
+                    self._pos = decoded[1]
+
+            else:  # keys — walk the envelope until ``key``
+                if char == "}":
+                    self._state = "done"
+                    self._pos = idx + 1
+                    continue
+                if char == ",":
+                    self._pos = idx + 1
+                    continue
+                decoded = self._decode(idx, final)
+                if decoded is None:
+                    break
+                name, end = decoded
+                colon = self._skip_ws(end)
+                if colon >= len(buf):
+                    if final:
+                        raise ValueError("Truncated JSON document")
+                    break
+                if buf[colon] != ":":
+                    raise ValueError(f"Expected ':' after key {name!r}")
+                value_at = self._skip_ws(colon + 1)
+                if value_at >= len(buf):
+                    if final:
+                        raise ValueError("Truncated JSON document")
+                    break
+                if name == self.key and buf[value_at] == "[":
+                    self._state = "items"
+                    self._pos = value_at + 1
+                    continue
+                decoded = self._decode(value_at, final)
+                if decoded is None:
+                    break
+                self._pos = decoded[1]
+        return items
@@ -1,16 +1,28 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
 
 import httpx
 
 from app.config import settings
-from app.services.product_loader.base import BaseProductLoader
+from app.services.product_cards import product_cards
+from app.services.product_loader.base import BaseProductLoader, SyncProgress, SyncStats
+from app.services.product_loader.pipeline import run_pipeline
+from app.services.product_loader.state import get_sync_state
+from app.services.product_loader.upsert import ProductUpserter, variant_item
+from app.services.search import product_search
+from app.services.stock_levels import StoreStock, apply_stock_levels, store_availability
 
 logger = logging.getLogger(__name__)
 
 
+class MoySkladError(Exception):
+    """MoySklad API returned an error; the sync run is aborted without changes."""
+
+
 class MoySkladLoader(BaseProductLoader):
     """Load products from Мой Склад API.
 
@@ -20,10 +32,29 @@ class MoySkladLoader(BaseProductLoader):
     """
 
     BASE_URL = "https://api.moysklad.ru/api/remap/1.2"
+    SOURCE = "moysklad"
+    PAGE_SIZE = 1000
+    # Max rows per request with ``expand``
+    EXPAND_BATCH = 100
+    IMAGE_CONCURRENCY = 8
 
-    def __init__(self):
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
         self.token = settings.moysklad_token
+        # Injected by benchmarks / tests to talk to a stub instead of the API
+        self.transport = transport
         self.headers = {"Authorization": f"Bearer {self.token}"}
+        self.max_updated: str | None = None
+        self.stock_map: dict[str, float] = {}
+        self.variant_stock: dict[str, float] = {}
+        # product id -> variant items, from /entity/variant
+        self.variants: dict[str, list[dict[str, Any]]] = {}
+        # /report/stock/bystore, when settings.stock_by_store is on
+        self.store_levels: list[StoreStock] | None = None
+        self.stores: dict[str, str] = {}
+        self.progress = SyncProgress()
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=60.0, transport=self.transport)
 
     # ------------------------------------------------------------------
     # Image helpers
@@ -38,7 +69,8 @@ class MoySkladLoader(BaseProductLoader):
         ``miniature-prod.moysklad.ru`` — we follow the redirect and
         store the final URL so the browser can load images directly.
         """
-        images_meta = product_meta.get("images", {}).get("meta", {})
+        images = product_meta.get("images", {})
+        images_meta = images.get("meta", {})
         if images_meta.get("size", 0) == 0:
             return []
 
@@ -48,11 +80,14 @@ class MoySkladLoader(BaseProductLoader):
 
         urls: list[str] = []
         try:
-            resp = await client.get(images_href, headers=self.headers)
-            if resp.status_code != 200:
-                return []
+            # Rows are inline when the product was fetched with expand=images
+            rows = images.get("rows")
+            if rows is None:
+                resp = await client.get(images_href, headers=self.headers)
+                if resp.status_code != 200:
+                    return []
+                rows = resp.json().get("rows", [])
 
-            rows = resp.json().get("rows", [])
             for row in rows:
                 # Prefer miniature downloadHref → resolve to CDN URL
                 download_href = (
@@ -99,251 +134,573 @@ class MoySkladLoader(BaseProductLoader):
     # ------------------------------------------------------------------
 
     async def _get_stock(self, client: httpx.AsyncClient) -> dict[str, float]:
-        """Fetch current stock quantities (with pagination)."""
+        """Fetch current stock quantities (with pagination).
+
+        Returns product stock; stock of modifications is kept in
+        :attr:`variant_stock`.  Raises :class:`MoySkladError` on API
+        errors: a partial map would zero out stock for every product
+        missing from it.
+        """
         stock_map: dict[str, float] = {}
+        self.variant_stock = {}
         offset = 0
         page_size = 1000
-        try:
-            while True:
-                resp = await client.get(
-                    f"{self.BASE_URL}/report/stock/all",
-                    headers=self.headers,
-                    params={"limit": page_size, "offset": offset},
-                )
-                if resp.status_code != 200:
-                    logger.warning(f"Stock API error {resp.status_code}")
-                    break
-
-                data = resp.json()
-                rows = data.get("rows", [])
-                for row in rows:
-                    assortment_href = row.get("meta", {}).get("href", "")
-                    if "/entity/product/" in assortment_href:
-                        pid = assortment_href.split("/entity/product/")[-1]
-                        # Strip query parameters (e.g. ?expand=supplier)
-                        if "?" in pid:
-                            pid = pid.split("?")[0]
-                        stock_map[pid] = row.get("quantity", 0)
-
-                total = data.get("meta", {}).get("size", 0)
-                offset += page_size
-                if offset >= total or len(rows) == 0:
-                    break
-
-            logger.info(f"MoySklad: fetched stock for {len(stock_map)} products")
-        except Exception as e:
-            logger.warning(f"Failed to fetch stock: {e}")
+        while True:
+            resp = await client.get(
+                f"{self.BASE_URL}/report/stock/all",
+                headers=self.headers,
+                params={"limit": page_size, "offset": offset},
+            )
+            if resp.status_code != 200:
+                logger.warning(f"Stock API error {resp.status_code}")
+                raise MoySkladError(f"Stock API error {resp.status_code}")
+
+            data = resp.json()
+            rows = data.get("rows", [])
+            for row in rows:
+                assortment_href = row.get("meta", {}).get("href", "")
+                if "/entity/product/" in assortment_href:
+                    stock_map[_href_id(assortment_href, "product")] = row.get("quantity", 0)
+                elif "/entity/variant/" in assortment_href:
+                    self.variant_stock[_href_id(assortment_href, "variant")] = row.get("quantity", 0)
+
+            total = data.get("meta", {}).get("size", 0)
+            offset += page_size
+            if offset >= total or len(rows) == 0:
+                break
+
+        logger.info(
+            f"MoySklad: fetched stock for {len(stock_map)} products, "
+            f"{len(self.variant_stock)} modifications"
+        )
         return stock_map
 
+    async def _subtract_pending_orders(self, fetched_at: datetime) -> None:
+        """Keep local decrements of orders MoySklad has not reserved yet.
+
+        Without this the listing would hand items sold in the Mini App
+        back to the catalog until the exported order lands upstream.
+        """
+        from app.db.session import async_session
+        from app.services.order_export import order_exporter, pending_reservations, subtract_reservations
+
+        if not order_exporter.enabled:
+            return
+        async with async_session() as db:
+            products, variants = await pending_reservations(db, fetched_at)
+        subtract_reservations(self.stock_map, products)
+        subtract_reservations(self.variant_stock, variants)
+
+    async def _get_stock_by_store(self, client: httpx.AsyncClient) -> None:
+        """Fetch ``/report/stock/bystore`` into :attr:`store_levels` and :attr:`stores`."""
+        levels: list[StoreStock] = []
+        stores: dict[str, str] = {}
+        offset = 0
+        page_size = 1000
+        while True:
+            resp = await client.get(
+                f"{self.BASE_URL}/report/stock/bystore",
+                headers=self.headers,
+                params={"limit": page_size, "offset": offset},
+            )
+            if resp.status_code != 200:
+                logger.warning(f"Stock by store API error {resp.status_code}")
+                raise MoySkladError(f"Stock by store API error {resp.status_code}")
+
+            data = resp.json()
+            rows = data.get("rows", [])
+            for row in rows:
+                href = row.get("meta", {}).get("href", "")
+                if "/entity/product/" in href:
+                    product_id, variant_id = _href_id(href, "product"), None
+                elif "/entity/variant/" in href:
+                    product_id, variant_id = None, _href_id(href, "variant")
+                else:
+                    continue
+                for entry in row.get("stockByStore", []):
+                    store_id = _href_id(entry.get("meta", {}).get("href", ""), "store")
+                    if not store_id:
+                        continue
+                    stores.setdefault(store_id, entry.get("name", ""))
+                    levels.append(
+                        StoreStock(product_id, variant_id, store_id, int(entry.get("stock") or 0))
+                    )
+
+            total = data.get("meta", {}).get("size", 0)
+            offset += page_size
+            if offset >= total or len(rows) == 0:
+                break
+
+        logger.info(f"MoySklad: fetched {len(levels)} stock levels in {len(stores)} stores")
+        self.store_levels, self.stores = levels, stores
+
+    # ------------------------------------------------------------------
+    # Modifications
+    # ------------------------------------------------------------------
+
+    async def _get_variants(self, client: httpx.AsyncClient) -> dict[str, list[dict[str, Any]]]:
+        """Fetch all ``/entity/variant`` rows grouped by product id.
+
+        Always the full listing, also on delta runs: a product's variant
+        set is replaced as a whole, and modifications change without
+        touching their product's ``updated``.  Expects
+        :attr:`variant_stock` to be loaded.
+        """
+        variants: dict[str, list[dict[str, Any]]] = {}
+        offset = 0
+        fetched = 0
+        while True:
+            response = await client.get(
+                f"{self.BASE_URL}/entity/variant",
+                headers=self.headers,
+                params={"limit": self.PAGE_SIZE, "offset": offset},
+            )
+            if response.status_code != 200:
+                logger.error(
+                    f"MoySklad variant API error {response.status_code}: "
+                    f"{response.text[:200]}"
+                )
+                raise MoySkladError(f"MoySklad variant API error {response.status_code}")
+
+            data = response.json()
+            rows = data.get("rows", [])
+            fetched += len(rows)
+            for row in rows:
+                self._add_variant(variants, row)
+
+            total = data.get("meta", {}).get("size", 0)
+            if fetched >= total or len(rows) == 0:
+                break
+            offset += self.PAGE_SIZE
+
+        logger.info(f"MoySklad: fetched {fetched} modifications of {len(variants)} products")
+        return variants
+
+    def _add_variant(self, variants: dict[str, list[dict[str, Any]]], row: dict) -> None:
+        """Group an ``/entity/variant`` row under its product, as a :func:`variant_item`."""
+        product_href = row.get("product", {}).get("meta", {}).get("href", "")
+        characteristics = [
+            (c.get("name", "").strip(), str(c.get("value", "")).strip())
+            for c in row.get("characteristics", [])
+        ]
+        characteristics = [(name, value) for name, value in characteristics if name and value]
+        if not product_href or not characteristics:
+            return
+        variants.setdefault(_href_id(product_href, "product"), []).append(
+            variant_item(
+                characteristics,
+                max(int(self.variant_stock.get(row.get("id", ""), 0)), 0),
+                row.get("id"),
+            )
+        )
+
+    def _product_stock(self, product_id: str) -> int:
+        """Own stock plus the stock of the product's modifications."""
+        own = int(self.stock_map.get(product_id, 0))
+        return own + sum(v["quantity"] for v in self.variants.get(product_id, []))
+
     # ------------------------------------------------------------------
     # Load & Sync
     # ------------------------------------------------------------------
 
-    async def load_products(self) -> list[dict[str, Any]]:
+    async def _iter_rows(
+        self, client: httpx.AsyncClient, updated_from: str | None
+    ) -> AsyncIterator[list[dict]]:
+        """Yield raw ``/entity/product`` rows one API page at a time."""
+        params: dict[str, Any] = {}
+        if updated_from:
+            params["filter"] = f"updated>={updated_from};archived=true;archived=false"
+
+        offset = 0
+        fetched = 0
+        while True:
+            response = await client.get(
+                f"{self.BASE_URL}/entity/product",
+                headers=self.headers,
+                params={**params, "limit": self.PAGE_SIZE, "offset": offset},
+            )
+            if response.status_code != 200:
+                logger.error(
+                    f"MoySklad API error {response.status_code}: "
+                    f"{response.text[:200]}"
+                )
+                raise MoySkladError(f"MoySklad API error {response.status_code}")
+
+            data = response.json()
+            rows = data.get("rows", [])
+            fetched += len(rows)
+            if self.progress.total is None:
+                self.progress.total = data.get("meta", {}).get("size")
+            logger.info(
+                f"MoySklad: fetched {fetched}/"
+                f"{data.get('meta', {}).get('size', '?')} products"
+            )
+            if rows:
+                yield rows
+
+            total = data.get("meta", {}).get("size", 0)
+            if fetched >= total or len(rows) == 0:
+                break
+            offset += self.PAGE_SIZE
+
+    async def _transform_row(self, client: httpx.AsyncClient, row: dict) -> dict[str, Any]:
+        product_id = row.get("id", "")
+        if row.get("archived"):
+            return {"external_id": product_id, "archived": True}
+
+        price = 0.0
+        sale_prices = row.get("salePrices", [])
+        if sale_prices:
+            price = sale_prices[0].get("value", 0) / 100
+
+        # Resolve image CDN URLs (no download — just URL resolution)
+        image_urls = await self._get_all_image_urls(client, row)
+
+        path_name = row.get("pathName", "").strip()
+        category_name = (
+            path_name.split("/")[-1].strip() if path_name else None
+        )
+
+        return {
+            "external_id": product_id,
+            "name": row.get("name", ""),
+            "description": row.get("description", ""),
+            "price": price,
+            "image_urls": image_urls,
+            "stock_quantity": self._product_stock(product_id),
+            "category_name": category_name,
+        }
+
+    async def iter_products(
+        self, client: httpx.AsyncClient, updated_from: str | None = None
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Yield loader items page by page (fetch page → transform).
+
+        Expects :attr:`stock_map` to be loaded.  Image URLs of a page are
+        resolved concurrently, bounded by ``IMAGE_CONCURRENCY``.
+        """
+        semaphore = asyncio.Semaphore(self.IMAGE_CONCURRENCY)
+
+        async def transform(row: dict) -> dict[str, Any]:
+            async with semaphore:
+                return await self._transform_row(client, row)
+
+        async for rows in self._iter_rows(client, updated_from):
+            for row in rows:
+                updated = _cursor_value(row.get("updated"))
+                if updated and (self.max_updated is None or updated > self.max_updated):
+                    self.max_updated = updated
+            yield list(await asyncio.gather(*(transform(row) for row in rows)))
+
+    async def load_products(self, updated_from: str | None = None) -> list[dict[str, Any]]:
         """Fetch product data + stock from MoySklad.
 
         Image URLs are resolved to public CDN links stored in
         ``_image_urls`` (no local download needed).
+
+        With ``updated_from`` only products changed since that upstream
+        timestamp are requested — archived ones included, flagged with
+        ``archived`` so the sync can hide them.  The newest ``updated``
+        value seen is kept in :attr:`max_updated` for the next delta run.
+
+        Materializes the whole result; :meth:`sync_products` streams
+        through :meth:`iter_products` instead.
         """
+        self.max_updated = None
         if not self.token:
             logger.warning("MoySklad token not configured")
             return []
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # Fetch ALL products with pagination
-            all_rows: list[dict] = []
-            offset = 0
-            page_size = 1000
-
-            while True:
-                response = await client.get(
-                    f"{self.BASE_URL}/entity/product",
-                    headers=self.headers,
-                    params={"limit": page_size, "offset": offset},
-                )
-                if response.status_code != 200:
-                    logger.error(
-                        f"MoySklad API error {response.status_code}: "
-                        f"{response.text[:200]}"
-                    )
-                    break
-
-                data = response.json()
-                rows = data.get("rows", [])
-                all_rows.extend(rows)
-                logger.info(
-                    f"MoySklad: fetched {len(all_rows)}/"
-                    f"{data.get('meta', {}).get('size', '?')} products"
-                )
+        async with self._client() as client:
+            self.stock_map = await self._get_stock(client)
+            self.variants = await self._get_variants(client)
+            products: list[dict[str, Any]] = []
+            async for items in self.iter_products(client, updated_from):
+                products.extend(items)
+            return products
 
-                total = data.get("meta", {}).get("size", 0)
-                if len(all_rows) >= total or len(rows) == 0:
-                    break
-                offset += page_size
+    async def sync_products(self, progress: SyncProgress | None = None) -> SyncStats:
+        """Delta sync by default; full reconciliation when due.
 
-            if not all_rows:
-                return []
+        A delta run requests only products updated since the stored
+        cursor.  A full run (first sync, or every
+        ``sync_full_interval_hours``) pages through the whole catalog and
+        hides local products that no longer exist upstream.  Stock comes
+        from ``/report/stock/all`` in both modes.
 
-            # Fetch stock
-            stock_map = await self._get_stock(client)
+        Pages stream through :func:`run_pipeline`: each page is upserted
+        and committed on its own, so memory stays bounded by
+        ``sync_max_inflight_pages`` and a failure keeps the pages already
+        committed.  The cursor, full-sync timestamp and deletions are only
+        applied after every page went through.
 
-            products = []
-            for row in all_rows:
-                price = 0.0
-                sale_prices = row.get("salePrices", [])
-                if sale_prices:
-                    price = sale_prices[0].get("value", 0) / 100
+        Modifications (``/entity/variant``) are fetched in full on every
+        run and written to ``product_variants`` in the finalize step, in
+        batches of ``PAGE_SIZE`` products.
+        """
+        from app.db.session import async_session
 
-                product_id = row.get("id", "")
+        self.max_updated = None
+        self.progress = progress or SyncProgress()
+        if not self.token:
+            logger.warning("MoySklad token not configured")
+            return SyncStats()
 
-                # Resolve image CDN URLs (no download — just URL resolution)
-                image_urls = await self._get_all_image_urls(client, row)
+        async with async_session() as db:
+            state = await get_sync_state(db, self.SOURCE)
+            await db.commit()
+            cursor = state.cursor
+            last_full = state.last_full_sync_at
+
+        now = datetime.now(timezone.utc)
+        full_interval = timedelta(hours=max(settings.sync_full_interval_hours, 0))
+        if last_full is not None and last_full.tzinfo is None:
+            last_full = last_full.replace(tzinfo=timezone.utc)
+        full = cursor is None or last_full is None or now - last_full >= full_interval
+
+        stats = SyncStats()
+        seen: set[str] = set()
+
+        async def upsert_page(items: list[dict[str, Any]]) -> None:
+            async with async_session() as db:
+                await ProductUpserter(db, stats).upsert(items)
+                await db.commit()
+            seen.update(item["external_id"] for item in items)
+            self.progress.advance(len(items))
+
+        async with self._client() as client:
+            # Stock first (also needed on an empty delta — stock moves independently)
+            self.progress.set_phase("stock")
+            fetched_at = datetime.now(timezone.utc)
+            self.stock_map = await self._get_stock(client)
+            await self._subtract_pending_orders(fetched_at)
+            if settings.stock_by_store:
+                await self._get_stock_by_store(client)
+            self.progress.set_phase("variants")
+            self.variants = await self._get_variants(client)
+            self.progress.set_phase("products")
+            await run_pipeline(
+                self.iter_products(client, updated_from=None if full else cursor),
+                upsert_page,
+                max_in_flight=settings.sync_max_inflight_pages,
+            )
+
+        if full and not seen:
+            logger.warning("MoySklad sync: no products loaded")
+            return stats
 
-                path_name = row.get("pathName", "").strip()
-                category_name = (
-                    path_name.split("/")[-1].strip() if path_name else None
+        self.progress.set_phase("finalize")
+        async with async_session() as db:
+            upserter = ProductUpserter(db, stats)
+            if full:
+                await upserter.delete_missing(seen)
+            product_ids = list(self.variants)
+            for i in range(0, len(product_ids), self.PAGE_SIZE):
+                await upserter.upsert_variants(
+                    {pid: self.variants[pid] for pid in product_ids[i:i + self.PAGE_SIZE]}
                 )
+            await upserter.delete_missing_variants(
+                {v["external_id"] for rows in self.variants.values() for v in rows}
+            )
+            await upserter.apply_stock(
+                {pid: self._product_stock(pid) for pid in self.stock_map.keys() | self.variants.keys()}
+            )
+            if self.store_levels is not None:
+                await apply_stock_levels(db, self.store_levels, self.stores)
+
+            state = await get_sync_state(db, self.SOURCE)
+            if self.max_updated:
+                state.cursor = self.max_updated
+            if full:
+                state.last_full_sync_at = now
+            await db.commit()
+        if self.store_levels is not None:
+            store_availability.invalidate()
+        logger.info(f"MoySklad {'full' if full else 'delta'} sync complete: {stats}")
+        return stats
+
+    async def sync_stock(self) -> int:
+        """Fast lane: refresh stock only, without touching the catalog.
+
+        One paginated ``/report/stock/all`` pass plus bulk UPDATEs of the
+        products and modifications whose quantity changed; a product with
+        modifications gets their summed stock.  Returns the number of
+        updated products.
+        """
+        from app.db.session import async_session
+
+        if not self.token:
+            return 0
+
+        async with self._client() as client:
+            fetched_at = datetime.now(timezone.utc)
+            stock_map = await self._get_stock(client)
+            self.stock_map = stock_map
+            await self._subtract_pending_orders(fetched_at)
+            if settings.stock_by_store:
+                await self._get_stock_by_store(client)
+
+        async with async_session() as db:
+            upserter = ProductUpserter(db)
+            variant_totals = await upserter.apply_variant_stock(self.variant_stock)
+            for pid, total in variant_totals.items():
+                stock_map[pid] = stock_map.get(pid, 0) + total
+            updated = await upserter.apply_stock(stock_map)
+            if self.store_levels is not None:
+                await apply_stock_levels(db, self.store_levels, self.stores)
+            await db.commit()
+        if self.store_levels is not None:
+            store_availability.invalidate()
+        if updated:
+            product_cards.invalidate()
+            logger.info(f"MoySklad stock sync: {updated} products updated")
+        return updated
+
+    # ------------------------------------------------------------------
+    # Webhook updates
+    # ------------------------------------------------------------------
 
-                products.append(
-                    {
-                        "external_id": product_id,
-                        "name": row.get("name", ""),
-                        "description": row.get("description", ""),
-                        "price": price,
-                        "image_urls": image_urls,
-                        "stock_quantity": int(stock_map.get(product_id, 0)),
-                        "category_name": category_name,
-                    }
+    async def _get_by_ids(
+        self,
+        client: httpx.AsyncClient,
+        entity: str,
+        key: str,
+        ids: set[str],
+        expand: str | None = None,
+    ) -> list[dict]:
+        """Fetch ``/entity/<entity>`` rows whose ``key`` is one of ``ids``.
+
+        Repeated filter keys are OR-ed by MoySklad, so one request covers
+        ``EXPAND_BATCH`` ids; ``expand`` is only honored up to that limit.
+        """
+        rows: list[dict] = []
+        ordered = sorted(ids)
+        for i in range(0, len(ordered), self.EXPAND_BATCH):
+            conditions = [f"{key}={value}" for value in ordered[i:i + self.EXPAND_BATCH]]
+            if entity == "product":
+                conditions += ["archived=true", "archived=false"]
+            params: dict[str, Any] = {"filter": ";".join(conditions), "limit": self.EXPAND_BATCH}
+            if expand:
+                params["expand"] = expand
+            response = await client.get(
+                f"{self.BASE_URL}/entity/{entity}", headers=self.headers, params=params
+            )
+            if response.status_code != 200:
+                logger.error(
+                    f"MoySklad {entity} API error {response.status_code}: "
+                    f"{response.text[:200]}"
                 )
-            return products
+                raise MoySkladError(f"MoySklad {entity} API error {response.status_code}")
+            rows.extend(response.json().get("rows", []))
+        return rows
+
+    async def sync_entities(
+        self,
+        product_ids: set[str],
+        variant_ids: set[str] = frozenset(),
+        deleted_product_ids: set[str] = frozenset(),
+    ) -> SyncStats:
+        """Apply webhook notifications: re-read only the referenced entities.
+
+        Products are fetched by id with ``expand=images`` and go through
+        the usual :class:`ProductUpserter` path; their stock is left as
+        is (it moves with documents, not product edits, and the stock
+        sync owns it).  For every touched product and every parent of a
+        touched modification the variant set is re-read and replaced,
+        keeping local variant quantities; synced variants gone upstream
+        are dropped, admin-created ones on products without upstream
+        modifications are kept.
+        """
+        from sqlalchemy import select
 
-    async def sync_products(self) -> int:
-        from sqlalchemy import select, delete as sql_delete
+        from app.db.models.product import Product
+        from app.db.models.product_variant import ProductVariant
         from app.db.session import async_session
-        from app.db.models.product import Product, product_category
-        from app.db.models.product_media import ProductMedia
-        from app.db.models.category import Category
 
-        products_data = await self.load_products()
-        if not products_data:
-            logger.warning("MoySklad sync: no products loaded")
-            return 0
+        stats = SyncStats()
+        if not self.token:
+            return stats
+        product_ids = set(product_ids) - set(deleted_product_ids)
+
+        # Parents of known modifications (a deleted one can't be fetched)
+        known: dict[str, str] = {}
+        if variant_ids:
+            async with async_session() as db:
+                ordered = sorted(variant_ids)
+                for i in range(0, len(ordered), self.PAGE_SIZE // 2):
+                    result = await db.execute(
+                        select(ProductVariant.external_id, Product.external_id)
+                        .join(Product, Product.id == ProductVariant.product_id)
+                        .where(ProductVariant.external_id.in_(ordered[i:i + self.PAGE_SIZE // 2]))
+                    )
+                    known.update(result.all())
+        parents = {pid for pid in known.values() if pid}
+
+        async with self._client() as client:
+            unknown = set(variant_ids) - known.keys()
+            if unknown:
+                for row in await self._get_by_ids(client, "variant", "id", unknown):
+                    href = row.get("product", {}).get("meta", {}).get("href", "")
+                    if href:
+                        parents.add(_href_id(href, "product"))
+            parents -= set(deleted_product_ids)
+
+            rows = await self._get_by_ids(client, "product", "id", product_ids, expand="images")
+            items = []
+            for row in rows:
+                item = await self._transform_row(client, row)
+                item.pop("stock_quantity", None)
+                items.append(item)
+
+            affected = parents | {item["external_id"] for item in items if not item.get("archived")}
+            variant_rows = (
+                await self._get_by_ids(client, "variant", "productid", affected) if affected else []
+            )
 
         async with async_session() as db:
-            # Build category cache
-            category_cache: dict[str, int] = {}
-            result = await db.execute(select(Category))
-            for cat in result.scalars().all():
-                category_cache[cat.name] = cat.id
-
-            synced = 0
-
-            for item in products_data:
-                # Ensure category exists
-                cat_name = item.get("category_name")
-                cat_id = None
-                if cat_name:
-                    if cat_name not in category_cache:
-                        new_cat = Category(
-                            name=cat_name,
-                            slug=cat_name.lower().replace(" ", "-"),
-                        )
-                        db.add(new_cat)
-                        await db.flush()
-                        category_cache[cat_name] = new_cat.id
-                    cat_id = category_cache[cat_name]
-
-                # Upsert product
+            self.variant_stock = {}
+            ids = [row.get("id") for row in variant_rows]
+            for i in range(0, len(ids), self.PAGE_SIZE // 2):
                 result = await db.execute(
-                    select(Product).where(
-                        Product.external_id == item["external_id"]
+                    select(ProductVariant.external_id, ProductVariant.quantity).where(
+                        ProductVariant.external_id.in_(ids[i:i + self.PAGE_SIZE // 2])
                     )
                 )
-                existing = result.scalar_one_or_none()
-
-                is_available = item["stock_quantity"] > 0
-                image_urls = item.get("image_urls", [])
-
-                if existing:
-                    existing.name = item["name"]
-                    existing.description = item["description"]
-                    existing.price = item["price"]
-                    existing.stock_quantity = item["stock_quantity"]
-                    existing.is_available = is_available
-                    await db.execute(
-                        product_category.delete().where(
-                            product_category.c.product_id == existing.id
-                        )
-                    )
-                    if cat_id:
-                        await db.execute(
-                            product_category.insert().values(
-                                product_id=existing.id, category_id=cat_id
-                            )
-                        )
-
-                    # Check if admin uploaded local media for this product
-                    local_media_q = await db.execute(
-                        select(ProductMedia).where(
-                            ProductMedia.product_id == existing.id,
-                            ~ProductMedia.file_path.like("http%"),
-                        )
-                    )
-                    has_local_media = local_media_q.scalars().first() is not None
-
-                    # Only update remote URLs if admin hasn't added local media
-                    if not has_local_media:
-                        # Remove old remote-URL media
-                        await db.execute(
-                            sql_delete(ProductMedia).where(
-                                ProductMedia.product_id == existing.id,
-                                ProductMedia.file_path.like("http%"),
-                            )
-                        )
-                        # Store resolved CDN URLs directly
-                        for idx, url in enumerate(image_urls):
-                            db.add(
-                                ProductMedia(
-                                    product_id=existing.id,
-                                    media_type="image",
-                                    file_path=url,
-                                    sort_order=idx,
-                                )
-                            )
-                        if image_urls:
-                            existing.image_url = image_urls[0]
-                else:
-                    product = Product(
-                        name=item["name"],
-                        description=item["description"],
-                        price=item["price"],
-                        external_id=item["external_id"],
-                        stock_quantity=item["stock_quantity"],
-                        is_available=is_available,
-                        image_url=image_urls[0] if image_urls else None,
-                    )
-                    db.add(product)
-                    await db.flush()
-                    if cat_id:
-                        await db.execute(
-                            product_category.insert().values(
-                                product_id=product.id, category_id=cat_id
-                            )
-                        )
-
-                    # Store resolved CDN URLs directly
-                    for idx, url in enumerate(image_urls):
-                        db.add(
-                            ProductMedia(
-                                product_id=product.id,
-                                media_type="image",
-                                file_path=url,
-                                sort_order=idx,
-                            )
-                        )
-
-                synced += 1
-
+                self.variant_stock.update(result.all())
+            variants: dict[str, list[dict[str, Any]]] = {}
+            for row in variant_rows:
+                self._add_variant(variants, row)
+
+            upserter = ProductUpserter(db, stats)
+            if deleted_product_ids:
+                await upserter.hide(list(deleted_product_ids))
+            await upserter.upsert(items)
+            # As in the full sync: products without upstream modifications keep their local variants
+            await upserter.upsert_variants(variants)
+            await upserter.delete_missing_variants(
+                {v["external_id"] for rows in variants.values() for v in rows}, affected
+            )
             await db.commit()
-            logger.info(f"MoySklad sync complete: {synced} products synced")
-        return synced
+        product_cards.invalidate()
+        product_search.invalidate()
+        logger.info(
+            f"MoySklad webhook sync: {len(items)} products, {len(affected)} variant sets, "
+            f"{len(deleted_product_ids)} deleted: {stats}"
+        )
+        return stats
+
+
+def _href_id(href: str, entity: str) -> str:
+    """Entity id from a meta href, without query parameters (e.g. ``?expand=supplier``)."""
+    return href.split(f"/entity/{entity}/")[-1].split("?")[0]
+
+
+def _cursor_value(updated: str | None) -> str | None:
+    """Trim MoySklad ``updated`` ("2024-01-15 12:34:56.789") to filter precision.
+
+    Truncating to seconds makes the next ``updated>=`` window overlap the
+    last run slightly; content hashing turns the overlap into no-ops.
+    """
+    if not updated:
+        return None
+    return updated.split(".")[0]
@@ -1,92 +1,237 @@
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator
 
 import httpx
 
 from app.config import settings
-from app.services.product_loader.base import BaseProductLoader
+from app.services.product_loader.base import BaseProductLoader, SyncProgress, SyncStats
+from app.services.product_loader.json_stream import JsonArrayStream
+from app.services.product_loader.pipeline import run_pipeline
+from app.services.product_loader.upsert import ProductUpserter
 
+logger = logging.getLogger(__name__)
 
-class OneCLoader(BaseProductLoader):
-    """Load products from 1C API."""
+# Batch size when the catalog arrives as one document
+_DOCUMENT_BATCH = 1000
+# Paging order: without a stable $orderby pages may overlap or skip rows
+_PAGE_ORDER = "Ref_Key"
+
+
+class OneCError(Exception):
+    """1C returned an error or an unreadable document; the sync run is aborted."""
 
-    def __init__(self):
+
+class OneCLoader(BaseProductLoader):
+    """Load products from 1C API.
+
+    ``/products`` is read with OData ``$top``/``$skip`` paging ordered by
+    ``Ref_Key`` (so no row is skipped and ``delete_missing`` is safe), keeping up
+    to ``one_c_prefetch_pages`` requests in flight ahead of the page being
+    processed.  A service that ignores ``$top`` and sends the whole
+    catalog is detected on the first response; that document — like every
+    response — is parsed incrementally while it downloads.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        self.transport = transport
         self.endpoint = settings.one_c_endpoint
         self.login = settings.one_c_login
         self.password = settings.one_c_password
+        self.page_size = max(settings.one_c_page_size, 0)
+        self.prefetch = max(settings.one_c_prefetch_pages, 1)
+        self.stats = SyncStats()
+
+    def _client(self) -> httpx.AsyncClient:
+        auth = None
+        if self.login and self.password:
+            auth = (self.login, self.password)
+        return httpx.AsyncClient(transport=self.transport, auth=auth, timeout=30)
+
+    @staticmethod
+    def _transform(item: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "external_id": str(item.get("Ref_Key", item.get("id", ""))),
+            "name": item.get("Description", item.get("name", "")),
+            "description": item.get("Описание", item.get("description", "")),
+            "price": float(item.get("Цена", item.get("price", 0))),
+            "image_url": None,
+            "stock_quantity": int(item.get("Остаток", item.get("stock", 0))),
+        }
+
+    # ------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------
+
+    async def _stream_items(
+        self, client: httpx.AsyncClient, params: dict[str, Any]
+    ) -> AsyncIterator[list[dict]]:
+        """GET ``/products`` and yield raw items as the body arrives.
+
+        Time spent awaiting body chunks goes to ``stats.network_seconds``,
+        time spent in the parser to ``stats.parse_seconds``.
+        """
+        parser = JsonArrayStream()
+        mark = time.perf_counter()
+        async with client.stream("GET", f"{self.endpoint}/products", params=params) as response:
+            if response.status_code != 200:
+                body = (await response.aread())[:200].decode("utf-8", "replace")
+                logger.error(f"1C API error {response.status_code}: {body}")
+                raise OneCError(f"1C API error {response.status_code}")
+
+            chunks = response.aiter_bytes()
+            while not parser.done:
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    chunk = None
+                now = time.perf_counter()
+                self.stats.network_seconds += now - mark
+                try:
+                    items = parser.feed(chunk) if chunk is not None else parser.close()
+                except ValueError as e:
+                    raise OneCError(f"Invalid JSON from 1C: {e}") from e
+                self.stats.parse_seconds += time.perf_counter() - now
+                if items:
+                    yield items
+                if chunk is None:
+                    break
+                mark = time.perf_counter()
+
+    async def _fetch_page(self, client: httpx.AsyncClient, skip: int) -> list[dict]:
+        rows: list[dict] = []
+        async for items in self._stream_items(client, self._page_params(skip)):
+            rows.extend(items)
+        return rows
+
+    def _page_params(self, skip: int) -> dict[str, Any]:
+        return {"$format": "json", "$orderby": _PAGE_ORDER, "$top": self.page_size, "$skip": skip}
+
+    async def _rebatch(
+        self, rows: list[dict], stream: AsyncIterator[list[dict]]
+    ) -> AsyncIterator[list[dict]]:
+        """Regroup a streamed document into ``_DOCUMENT_BATCH``-sized pages."""
+        async for items in stream:
+            rows.extend(items)
+            while len(rows) >= _DOCUMENT_BATCH:
+                yield rows[:_DOCUMENT_BATCH]
+                rows = rows[_DOCUMENT_BATCH:]
+        if rows:
+            yield rows
+
+    async def _iter_rows(self, client: httpx.AsyncClient) -> AsyncIterator[list[dict]]:
+        """Yield raw 1C rows page by page, in catalog order."""
+        if not self.page_size:
+            async for rows in self._rebatch([], self._stream_items(client, {"$format": "json"})):
+                yield rows
+            return
+
+        # The first page doubles as a probe: a service that ignores $top
+        # keeps streaming past page_size, and is then read as one document.
+        first: list[dict] = []
+        stream = self._stream_items(client, self._page_params(0))
+        try:
+            async for items in stream:
+                first.extend(items)
+                if len(first) > self.page_size:
+                    logger.info("1C: $top is not supported, reading /products as one document")
+                    async for rows in self._rebatch(first, stream):
+                        yield rows
+                    return
+        finally:
+            await stream.aclose()
+        if first:
+            yield first
+        if len(first) < self.page_size:
+            return
+
+        skip = self.page_size
+        pending: deque[asyncio.Task] = deque()
+        try:
+            while True:
+                while len(pending) < self.prefetch:
+                    pending.append(asyncio.create_task(self._fetch_page(client, skip)))
+                    skip += self.page_size
+                rows = await pending.popleft()
+                if rows:
+                    yield rows
+                if len(rows) < self.page_size:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def iter_products(self, client: httpx.AsyncClient) -> AsyncIterator[list[dict[str, Any]]]:
+        fetched = 0
+        async for rows in self._iter_rows(client):
+            fetched += len(rows)
+            logger.info(f"1C: fetched {fetched} products")
+            yield [self._transform(row) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Load & Sync
+    # ------------------------------------------------------------------
 
     async def load_products(self) -> list[dict[str, Any]]:
+        """Fetch the whole catalog; raises :class:`OneCError` on API errors."""
         if not self.endpoint:
             return []
 
-        auth = None
-        if self.login and self.password:
-            auth = (self.login, self.password)
+        self.stats = SyncStats()
+        products: list[dict[str, Any]] = []
+        async with self._client() as client:
+            async for items in self.iter_products(client):
+                products.extend(items)
+        return products
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.endpoint}/products",
-                    auth=auth,
-                    timeout=30,
-                )
-                if response.status_code != 200:
-                    return []
-
-                data = response.json()
-                products = []
-                for item in data if isinstance(data, list) else data.get("value", []):
-                    products.append({
-                        "external_id": str(item.get("Ref_Key", item.get("id", ""))),
-                        "name": item.get("Description", item.get("name", "")),
-                        "description": item.get("Описание", item.get("description", "")),
-                        "price": float(item.get("Цена", item.get("price", 0))),
-                        "image_url": None,
-                        "stock_quantity": int(item.get("Остаток", item.get("stock", 0))),
-                    })
-                return products
-            except Exception:
-                return []
-
-    async def sync_products(self) -> int:
-        from sqlalchemy import select
-        from app.db.session import async_session
-        from app.db.models.product import Product
+    async def sync_products(self, progress: SyncProgress | None = None) -> SyncStats:
+        """Stream pages into the database, then hide missing products and apply stock.
 
-        products_data = await self.load_products()
-        if not products_data:
-            return 0
+        Like the MoySklad sync, each page is upserted and committed on its
+        own; deletions and stock are applied only after the whole catalog
+        went through.
+        """
+        from app.db.session import async_session
 
+        progress = progress or SyncProgress()
+        self.stats = stats = SyncStats()
+        if not self.endpoint:
+            return stats
+
+        seen: set[str] = set()
+        stock_map: dict[str, int] = {}
+
+        async def upsert_page(items: list[dict[str, Any]]) -> None:
+            async with async_session() as db:
+                await ProductUpserter(db, stats).upsert(items)
+                await db.commit()
+            for item in items:
+                seen.add(item["external_id"])
+                stock_map[item["external_id"]] = item["stock_quantity"]
+            progress.advance(len(items))
+
+        progress.set_phase("products")
+        async with self._client() as client:
+            await run_pipeline(
+                self.iter_products(client),
+                upsert_page,
+                max_in_flight=settings.sync_max_inflight_pages,
+            )
+
+        if not seen:
+            logger.warning("1C sync: no products loaded")
+            return stats
+
+        progress.set_phase("finalize")
         async with async_session() as db:
-            synced = 0
-            for item in products_data:
-                result = await db.execute(
-                    select(Product).where(Product.external_id == item["external_id"])
-                )
-                existing = result.scalar_one_or_none()
-
-                if existing:
-                    existing.name = item["name"]
-                    existing.description = item["description"]
-                    existing.price = item["price"]
-                    existing.stock_quantity = item["stock_quantity"]
-                else:
-                    product = Product(
-                        name=item["name"],
-                        description=item["description"],
-                        price=item["price"],
-                        external_id=item["external_id"],
-                        stock_quantity=item["stock_quantity"],
-                        is_available=True,
-                    )
-                    db.add(product)
-                synced += 1
-
+            upserter = ProductUpserter(db, stats)
+            await upserter.delete_missing(seen)
+            await upserter.apply_stock(stock_map)
             await db.commit()
-        return synced
-
-
-
-
-
+        logger.info(f"1C sync complete: {stats}")
+        return stats
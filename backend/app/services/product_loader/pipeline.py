@@ -0,0 +1,53 @@
+"""Bounded producer/consumer pipeline for page-at-a-time syncs.
+
+A loader exposes its upstream data as an async iterator of pages
+(already transformed into loader items); :func:`run_pipeline` feeds them
+to a sink — usually "upsert chunk + commit" — while the next pages are
+being fetched.  The queue between the two is bounded, so a slow database
+throttles the fetcher instead of letting pages pile up in memory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+_END = object()
+
+
+async def run_pipeline(
+    pages: AsyncIterator[Any],
+    sink: Callable[[Any], Awaitable[None]],
+    max_in_flight: int = 2,
+) -> None:
+    """Drain ``pages`` into ``sink`` with at most ``max_in_flight`` queued pages.
+
+    The first error from either side stops both and is re-raised; pages
+    already handed to ``sink`` (and committed by it) are kept.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_in_flight))
+
+    async def produce() -> None:
+        try:
+            async for page in pages:
+                await queue.put(page)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            page = await queue.get()
+            if page is _END:
+                break
+            if isinstance(page, Exception):
+                raise page
+            await sink(page)
+    finally:
+        if not producer.done():
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.sync_state import SyncState
+
+
+async def get_sync_state(db: AsyncSession, source: str) -> SyncState:
+    """Fetch the bookkeeping row for ``source``, creating it on first use."""
+    result = await db.execute(select(SyncState).where(SyncState.source == source))
+    state = result.scalar_one_or_none()
+    if state is None:
+        state = SyncState(source=source)
+        db.add(state)
+        await db.flush()
+    return state
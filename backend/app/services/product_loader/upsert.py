@@ -0,0 +1,539 @@
+"""Hash-aware product upsert shared by the external loaders.
+
+Loaders normalize upstream rows into plain dicts::
+
+    {
+        "external_id": str,
+        "name": str,
+        "description": str,
+        "price": float,               # optional — price untouched if absent (0 for new rows)
+        "stock_quantity": int,        # optional — stock untouched if absent (0 for new rows)
+        "image_urls": list[str],      # optional — media untouched if absent
+        "category_name": str | None,  # optional — categories untouched if absent
+        "category_ids": list[int],    # optional — local ids, instead of category_name
+        "archived": bool,             # optional — archived upstream, hide locally
+    }
+
+and hand them to :class:`ProductUpserter`.  Every product stores the
+sha256 of its normalized catalog payload in ``products.sync_hash`` so rows
+whose upstream data did not change are skipped without a single write.
+Stock is not part of the hash: it changes far more often and is applied
+separately by :meth:`ProductUpserter.apply_stock`.
+
+Loaders that know upstream modifications hand them to
+:meth:`ProductUpserter.upsert_variants`; upstream groups with their own
+ids go through :meth:`ProductUpserter.upsert_categories`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+from sqlalchemy import Integer, bindparam, column, delete as sql_delete, insert, select, text, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.category import Category
+from app.db.models.modification_type import ModificationType
+from app.db.models.modification_value import ModificationValue
+from app.db.models.product import Product, product_category
+from app.db.models.product_media import ProductMedia
+from app.db.models.product_variant import ProductVariant
+from app.services.product_loader.base import SyncStats
+
+logger = logging.getLogger(__name__)
+
+# Max bound parameters per IN (...) clause — stays well below SQLite's limit
+_IN_CHUNK = 500
+# Rows per UPDATE ... FROM (VALUES ...) — two parameters per row
+_VALUES_CHUNK = 450
+
+
+def payload_hash(item: dict[str, Any]) -> str:
+    """Return a stable sha256 of the catalog fields we mirror from upstream."""
+    normalized = {
+        "name": (item.get("name") or "").strip(),
+        "description": (item.get("description") or "").strip(),
+        "image_urls": list(item.get("image_urls") or []),
+        "category_name": item.get("category_name") or None,
+    }
+    if "price" in item:
+        normalized["price"] = round(float(item["price"] or 0), 2)
+    if "category_ids" in item:
+        normalized["category_ids"] = sorted(item["category_ids"] or [])
+    raw = json.dumps(normalized, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _chunks(values: list, size: int = _IN_CHUNK) -> Iterable[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+class ProductUpserter:
+    """Apply normalized loader items to the ``products`` table.
+
+    Existing rows are looked up per batch by ``external_id`` and only
+    rewritten when ``payload_hash`` differs from the stored ``sync_hash``.
+    Counts are accumulated in :attr:`stats`.
+    """
+
+    def __init__(self, db: AsyncSession, stats: SyncStats | None = None):
+        self.db = db
+        self.stats = stats or SyncStats()
+        self._category_cache: dict[str, int] | None = None
+
+    async def _category_id(self, name: str | None) -> int | None:
+        if not name:
+            return None
+        if self._category_cache is None:
+            result = await self.db.execute(select(Category.id, Category.name))
+            self._category_cache = {cat_name: cat_id for cat_id, cat_name in result.all()}
+        if name not in self._category_cache:
+            new_cat = Category(name=name, slug=name.lower().replace(" ", "-"))
+            self.db.add(new_cat)
+            await self.db.flush()
+            self._category_cache[name] = new_cat.id
+        return self._category_cache[name]
+
+    async def upsert(self, items: list[dict[str, Any]]) -> None:
+        """Insert new products and update changed ones (no commit)."""
+        if not items:
+            return
+
+        archived = [item["external_id"] for item in items if item.get("archived")]
+        if archived:
+            await self.hide(archived)
+            items = [item for item in items if not item.get("archived")]
+
+        existing: dict[str, Product] = {}
+        external_ids = [item["external_id"] for item in items]
+        for chunk in _chunks(external_ids):
+            result = await self.db.execute(
+                select(Product).where(Product.external_id.in_(chunk))
+            )
+            for product in result.scalars().all():
+                existing[product.external_id] = product
+
+        for item in items:
+            digest = payload_hash(item)
+            product = existing.get(item["external_id"])
+            if (
+                product is not None
+                and product.sync_hash == digest
+                and product.archived_at is None
+            ):
+                self.stats.unchanged += 1
+                continue
+
+            stock = int(item.get("stock_quantity") or 0)
+            if product is None:
+                image_urls = item.get("image_urls") or []
+                product = Product(
+                    name=item["name"],
+                    description=item["description"],
+                    price=item.get("price", 0),
+                    external_id=item["external_id"],
+                    stock_quantity=stock,
+                    is_available=stock > 0,
+                    image_url=image_urls[0] if image_urls else None,
+                    sync_hash=digest,
+                )
+                self.db.add(product)
+                await self.db.flush()
+                existing[item["external_id"]] = product
+                self.stats.inserted += 1
+            else:
+                product.name = item["name"]
+                product.description = item["description"]
+                if "price" in item:
+                    product.price = item["price"]
+                if "stock_quantity" in item:
+                    product.stock_quantity = stock
+                    product.is_available = stock > 0
+                product.sync_hash = digest
+                product.archived_at = None
+                self.stats.updated += 1
+
+            if "category_ids" in item:
+                await self._replace_categories(product.id, item["category_ids"] or [])
+            elif "category_name" in item:
+                category_id = await self._category_id(item["category_name"])
+                await self._replace_categories(product.id, [category_id] if category_id else [])
+            if "image_urls" in item:
+                await self._replace_remote_media(product, item["image_urls"] or [])
+
+    async def _replace_categories(self, product_id: int, category_ids: list[int]) -> None:
+        await self.db.execute(
+            product_category.delete().where(product_category.c.product_id == product_id)
+        )
+        if category_ids:
+            await self.db.execute(
+                product_category.insert(),
+                [{"product_id": product_id, "category_id": cat_id} for cat_id in dict.fromkeys(category_ids)],
+            )
+
+    async def _replace_remote_media(self, product: Product, image_urls: list[str]) -> None:
+        """Swap remote (CDN) media; products with admin-uploaded local media are left alone."""
+        local_media = await self.db.execute(
+            select(ProductMedia.id).where(
+                ProductMedia.product_id == product.id,
+                ~ProductMedia.file_path.like("http%"),
+            ).limit(1)
+        )
+        if local_media.first() is not None:
+            return
+
+        await self.db.execute(
+            sql_delete(ProductMedia).where(
+                ProductMedia.product_id == product.id,
+                ProductMedia.file_path.like("http%"),
+            )
+        )
+        for idx, url in enumerate(image_urls):
+            self.db.add(
+                ProductMedia(
+                    product_id=product.id,
+                    media_type="image",
+                    file_path=url,
+                    sort_order=idx,
+                )
+            )
+        if image_urls:
+            product.image_url = image_urls[0]
+
+    async def hide(self, external_ids: list[str]) -> None:
+        """Hide products archived or removed upstream (no commit).
+
+        Rows are not physically deleted: order items keep referencing them.
+        They stay hidden until they show up in a sync again.
+        """
+        now = datetime.now(timezone.utc)
+        for chunk in _chunks(external_ids):
+            result = await self.db.execute(
+                update(Product)
+                .where(Product.external_id.in_(chunk), Product.archived_at.is_(None))
+                .values(archived_at=now, is_available=False, stock_quantity=0)
+            )
+            self.stats.deleted += result.rowcount or 0
+
+    async def delete_missing(self, seen_external_ids: set[str]) -> None:
+        """Hide synced products absent from a full upstream listing (no commit)."""
+        result = await self.db.execute(
+            select(Product.external_id).where(
+                Product.external_id.isnot(None),
+                Product.archived_at.is_(None),
+            )
+        )
+        missing = [ext_id for ext_id, in result.all() if ext_id not in seen_external_ids]
+        await self.hide(missing)
+
+    async def apply_stock(self, stock_map: dict[str, int], partial: bool = False) -> int:
+        """Set stock for all live synced products; absent from ``stock_map`` means 0.
+
+        With ``partial`` (upstream sent only changed offers) products absent
+        from ``stock_map`` keep their stock.  Current quantities are read in
+        one query and only the rows that actually changed are written, as
+        ``UPDATE ... FROM (VALUES ...)`` batches.  Returns the number of
+        updated rows (no commit).
+        """
+        result = await self.db.execute(
+            select(Product.id, Product.external_id, Product.stock_quantity).where(
+                Product.external_id.isnot(None),
+                Product.archived_at.is_(None),
+            )
+        )
+        changes: list[tuple[int, int]] = []
+        for pid, ext_id, current in result.all():
+            if partial and ext_id not in stock_map:
+                continue
+            quantity = int(stock_map.get(ext_id, 0))
+            if quantity != current:
+                changes.append((pid, quantity))
+        for chunk in _chunks(changes, _VALUES_CHUNK):
+            await _bulk_set_stock(self.db, chunk)
+        return len(changes)
+
+    async def upsert_categories(self, groups: list[tuple[str, str, str | None]]) -> dict[str, int]:
+        """Mirror upstream groups ``(external_id, name, parent_external_id)`` into ``categories``.
+
+        Categories are matched by ``external_id``; new ones are inserted,
+        renamed or moved ones updated.  Categories gone upstream are kept
+        (admins may have attached local products).  Returns
+        ``external_id -> category id`` (no commit).
+        """
+        if not groups:
+            return {}
+        existing: dict[str, Category] = {}
+        for chunk in _chunks([ext_id for ext_id, _, _ in groups]):
+            result = await self.db.execute(select(Category).where(Category.external_id.in_(chunk)))
+            for category in result.scalars().all():
+                existing[category.external_id] = category
+
+        taken = {slug for slug, in (await self.db.execute(select(Category.slug))).all()}
+        for ext_id, name, _ in groups:
+            category = existing.get(ext_id)
+            if category is None:
+                slug = _slugify(name) or "group"
+                if slug in taken:
+                    slug = f"{slug}-{ext_id[:8]}"
+                taken.add(slug)
+                category = Category(name=name, slug=slug, external_id=ext_id)
+                self.db.add(category)
+                existing[ext_id] = category
+            elif category.name != name:
+                category.name = name
+        await self.db.flush()
+
+        for ext_id, _, parent_ext_id in groups:
+            parent = existing.get(parent_ext_id) if parent_ext_id else None
+            parent_id = parent.id if parent is not None else None
+            if existing[ext_id].parent_id != parent_id:
+                existing[ext_id].parent_id = parent_id
+        await self.db.flush()
+        self._category_cache = None
+        return {ext_id: category.id for ext_id, category in existing.items()}
+
+    async def upsert_variants(self, variants: dict[str, list[dict[str, Any]]]) -> int:
+        """Replace the variants of synced products (no commit).
+
+        ``variants`` maps a product ``external_id`` to its full list of
+        ``{"type": str, "value": str, "quantity": int}`` (plus an optional
+        upstream ``external_id``, see :func:`variant_item`) — one
+        modification type per product, as the Mini App selector expects.
+        Products not in the mapping are left alone; an empty list removes
+        their variants.  Modification types and values are created by
+        name when missing.  Rows are diffed against the database and
+        written with executemany batches.  Returns the number of changed rows.
+        """
+        if not variants:
+            return 0
+
+        product_ids: dict[str, int] = {}
+        for chunk in _chunks(list(variants)):
+            result = await self.db.execute(
+                select(Product.external_id, Product.id).where(Product.external_id.in_(chunk))
+            )
+            product_ids.update(result.all())
+
+        type_ids = await self._modification_type_ids(
+            {v["type"] for rows in variants.values() for v in rows}
+        )
+        await self._ensure_modification_values(
+            {(type_ids[v["type"]], v["value"]) for rows in variants.values() for v in rows}
+        )
+
+        existing: dict[tuple[int, int, str], tuple[int, int, str | None]] = {}
+        for chunk in _chunks(list(product_ids.values())):
+            result = await self.db.execute(
+                select(
+                    ProductVariant.id,
+                    ProductVariant.product_id,
+                    ProductVariant.modification_type_id,
+                    ProductVariant.value,
+                    ProductVariant.quantity,
+                    ProductVariant.external_id,
+                ).where(ProductVariant.product_id.in_(chunk))
+            )
+            for vid, pid, type_id, value, quantity, ext_id in result.all():
+                existing[(pid, type_id, value)] = (vid, quantity, ext_id)
+
+        wanted: dict[tuple[int, int, str], tuple[int, str | None]] = {}
+        for ext_id, rows in variants.items():
+            pid = product_ids.get(ext_id)
+            if pid is None:
+                continue
+            for v in rows:
+                key = (pid, type_ids[v["type"]], v["value"])
+                quantity, variant_ext_id = wanted.get(key, (0, None))
+                wanted[key] = (
+                    quantity + int(v.get("quantity") or 0),
+                    variant_ext_id or v.get("external_id"),
+                )
+
+        to_insert = [
+            {
+                "product_id": pid,
+                "modification_type_id": type_id,
+                "value": value,
+                "quantity": qty,
+                "external_id": variant_ext_id,
+            }
+            for (pid, type_id, value), (qty, variant_ext_id) in wanted.items()
+            if (pid, type_id, value) not in existing
+        ]
+        to_update = [
+            {"vid": existing[key][0], "qty": qty, "ext_id": variant_ext_id}
+            for key, (qty, variant_ext_id) in wanted.items()
+            if key in existing and existing[key][1:] != (qty, variant_ext_id)
+        ]
+        to_delete = [vid for key, (vid, _, _) in existing.items() if key not in wanted]
+
+        for chunk in _chunks(to_delete):
+            await self.db.execute(sql_delete(ProductVariant).where(ProductVariant.id.in_(chunk)))
+        if to_update:
+            await self.db.execute(
+                update(ProductVariant.__table__)
+                .where(ProductVariant.__table__.c.id == bindparam("vid"))
+                .values(quantity=bindparam("qty"), external_id=bindparam("ext_id")),
+                to_update,
+            )
+        if to_insert:
+            await self.db.execute(insert(ProductVariant), to_insert)
+        return len(to_insert) + len(to_update) + len(to_delete)
+
+    async def delete_missing_variants(
+        self, seen_external_ids: set[str], product_external_ids: set[str] | None = None
+    ) -> int:
+        """Drop synced variants absent from an upstream listing (no commit).
+
+        With ``product_external_ids`` the listing covers only those
+        products, and only their variants are considered.  Local
+        (admin-created) variants are never touched.
+        """
+        query = select(ProductVariant.id, ProductVariant.external_id).where(
+            ProductVariant.external_id.isnot(None)
+        )
+        if product_external_ids is None:
+            rows = (await self.db.execute(query)).all()
+        else:
+            rows = []
+            for chunk in _chunks(list(product_external_ids)):
+                result = await self.db.execute(
+                    query.join(Product, Product.id == ProductVariant.product_id).where(
+                        Product.external_id.in_(chunk)
+                    )
+                )
+                rows.extend(result.all())
+        missing = [vid for vid, ext_id in rows if ext_id not in seen_external_ids]
+        for chunk in _chunks(missing):
+            await self.db.execute(sql_delete(ProductVariant).where(ProductVariant.id.in_(chunk)))
+        return len(missing)
+
+    async def apply_variant_stock(self, variant_stock: dict[str, int]) -> dict[str, int]:
+        """Set quantities of synced variants; absent from ``variant_stock`` means 0.
+
+        Only changed rows are written (executemany).  Returns the summed
+        variant stock per product ``external_id``, for products that
+        have synced variants — their product-level stock (no commit).
+        """
+        result = await self.db.execute(
+            select(
+                ProductVariant.id,
+                ProductVariant.external_id,
+                ProductVariant.quantity,
+                Product.external_id,
+            )
+            .join(Product, Product.id == ProductVariant.product_id)
+            .where(ProductVariant.external_id.isnot(None))
+        )
+        totals: dict[str, int] = {}
+        changes: list[dict[str, int]] = []
+        for vid, ext_id, current, product_ext_id in result.all():
+            quantity = max(int(variant_stock.get(ext_id, 0)), 0)
+            totals[product_ext_id] = totals.get(product_ext_id, 0) + quantity
+            if quantity != current:
+                changes.append({"vid": vid, "qty": quantity})
+        if changes:
+            await self.db.execute(
+                update(ProductVariant.__table__)
+                .where(ProductVariant.__table__.c.id == bindparam("vid"))
+                .values(quantity=bindparam("qty")),
+                changes,
+            )
+        return totals
+
+    async def _modification_type_ids(self, names: set[str]) -> dict[str, int]:
+        result = await self.db.execute(
+            select(ModificationType.name, ModificationType.id).where(ModificationType.name.in_(names))
+        )
+        type_ids = dict(result.all())
+        for name in sorted(names - type_ids.keys()):
+            mod_type = ModificationType(name=name)
+            self.db.add(mod_type)
+            await self.db.flush()
+            type_ids[name] = mod_type.id
+        return type_ids
+
+    async def _ensure_modification_values(self, pairs: set[tuple[int, str]]) -> None:
+        """Register variant values as predefined values of their type (admin pickers)."""
+        if not pairs:
+            return
+        result = await self.db.execute(
+            select(ModificationValue.modification_type_id, ModificationValue.value).where(
+                ModificationValue.modification_type_id.in_({type_id for type_id, _ in pairs})
+            )
+        )
+        missing = pairs - set(result.all())
+        if missing:
+            await self.db.execute(
+                insert(ModificationValue),
+                [
+                    {"modification_type_id": type_id, "value": value, "sort_order": 0}
+                    for type_id, value in sorted(missing)
+                ],
+            )
+
+
+def variant_item(
+    characteristics: list[tuple[str, str]], quantity: int, external_id: str | None = None
+) -> dict[str, Any]:
+    """Fold upstream characteristics into the single modification type the Mini App supports.
+
+    ``Размер: M`` stays as is; ``Размер: M`` + ``Цвет: Красный`` becomes
+    type ``Размер / Цвет`` with value ``M / Красный``.
+    """
+    return {
+        "type": " / ".join(name for name, _ in characteristics),
+        "value": " / ".join(value for _, value in characteristics),
+        "quantity": quantity,
+        "external_id": external_id,
+    }
+
+
+def _slugify(name: str) -> str:
+    return "-".join(name.lower().split())
+
+
+async def _bulk_set_stock(db: AsyncSession, rows: list[tuple[int, int]]) -> None:
+    """Write ``(product_id, quantity)`` rows with one bulk UPDATE.
+
+    PostgreSQL and SQLite >= 3.33 get ``UPDATE ... FROM (VALUES ...)``.
+    SQLite cannot name VALUES columns, so its variant uses the implicit
+    ``column1``/``column2``; older SQLite falls back to executemany.
+    """
+    products = Product.__table__
+    if db.bind.dialect.name != "sqlite":
+        v = values(column("id", Integer), column("qty", Integer), name="v").data(rows)
+        await db.execute(
+            products.update()
+            .where(products.c.id == v.c.id)
+            .values(stock_quantity=v.c.qty, is_available=v.c.qty > 0)
+        )
+        return
+
+    if sqlite3.sqlite_version_info < (3, 33, 0):
+        await db.execute(
+            products.update()
+            .where(products.c.id == bindparam("pid"))
+            .values(stock_quantity=bindparam("qty"), is_available=bindparam("qty") > 0),
+            [{"pid": pid, "qty": qty} for pid, qty in rows],
+        )
+        return
+
+    placeholders = ", ".join(f"(:id{i}, :qty{i})" for i in range(len(rows)))
+    params: dict[str, int] = {}
+    for i, (pid, qty) in enumerate(rows):
+        params[f"id{i}"] = pid
+        params[f"qty{i}"] = qty
+    await db.execute(
+        text(
+            "UPDATE products SET stock_quantity = v.column2, is_available = v.column2 > 0 "
+            f"FROM (VALUES {placeholders}) AS v WHERE products.id = v.column1"
+        ),
+        params,
+    )
@@ -0,0 +1,180 @@
+"""Catalog search helpers and the in-memory prefix index for inline mode.
+
+:func:`normalize_search` is shared by the catalog API (SQL ``LIKE``
+search) and :data:`product_search`, which answers ``@bot query`` inline
+searches from memory: every prefix of every word of a product name maps
+to the products containing it, so a query is a few set intersections
+instead of a table scan and fits Telegram's inline deadline.
+
+The index is built in the background at startup, rebuilt after catalog
+syncs and admin edits in this worker, and at least every
+``SEARCH_INDEX_SECONDS`` otherwise.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.db.models.product import Product
+from app.db.models.product_media import ProductMedia
+
+logger = logging.getLogger(__name__)
+
+# Longer query words are looked up by their first _MAX_PREFIX letters, then checked
+_MAX_PREFIX = 12
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_search(text: str) -> str:
+    """Normalize search text: lowercase, ё→е, strip extra spaces."""
+    text = text.lower().strip()
+    text = text.replace("ё", "е")
+    # Collapse multiple spaces
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall(normalize_search(text))
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    id: int
+    name: str
+    price: float
+    old_price: Optional[float]
+    description: Optional[str]
+    image_url: Optional[str]
+
+
+def _build(rows: list, images: dict[int, str]):
+    hits: list[SearchHit] = []
+    words: list[frozenset[str]] = []
+    prefixes: dict[str, list[int]] = {}
+    for product_id, name, price, old_price, description, image_url in rows:
+        position = len(hits)
+        hits.append(SearchHit(
+            id=product_id,
+            name=name,
+            price=float(price or 0),
+            old_price=float(old_price) if old_price else None,
+            description=description,
+            image_url=images.get(product_id) or image_url,
+        ))
+        name_words = frozenset(_words(name))
+        words.append(name_words)
+        keys = {word[:length] for word in name_words for length in range(1, min(len(word), _MAX_PREFIX) + 1)}
+        for key in keys:
+            prefixes.setdefault(key, []).append(position)
+    return hits, words, prefixes
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        # Newest first, the order results are returned in
+        self._hits: list[SearchHit] = []
+        self._words: list[frozenset[str]] = []
+        self._prefixes: dict[str, list[int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        ttl = max(settings.search_index_seconds, 10)
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl
+
+    async def refresh(self) -> None:
+        """Rebuild the index if it is stale; the old one serves meanwhile."""
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            from app.db.session import fresh_read_session
+
+            started = time.monotonic()
+            async with fresh_read_session() as db:
+                result = await db.execute(
+                    select(
+                        Product.id,
+                        Product.name,
+                        Product.price,
+                        Product.old_price,
+                        Product.description,
+                        Product.image_url,
+                    )
+                    .where(Product.is_available == True)
+                    .order_by(Product.id.desc())
+                )
+                rows = result.all()
+                images: dict[int, str] = {}
+                media = await db.execute(
+                    select(ProductMedia.product_id, ProductMedia.file_path)
+                    .where(ProductMedia.media_type == "image")
+                    .order_by(ProductMedia.product_id, ProductMedia.sort_order)
+                )
+                for product_id, file_path in media.all():
+                    images.setdefault(product_id, file_path)
+
+            # Off the event loop: a large catalog takes a noticeable fraction of a second
+            hits, words, prefixes = await asyncio.to_thread(_build, rows, images)
+            self._hits, self._words, self._prefixes = hits, words, prefixes
+            self._loaded_at = time.monotonic()
+            logger.info(
+                f"Search index: {len(hits)} products, {len(prefixes)} prefixes "
+                f"in {time.monotonic() - started:.2f}s"
+            )
+
+    async def _refresh_quietly(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Search index refresh failed: {e}")
+
+    def _match(self, query: str) -> list[int]:
+        query_words = _words(query)
+        if not query_words:
+            return list(range(len(self._hits)))
+        # Rarest prefix first, then narrow down
+        candidates = sorted(
+            (self._prefixes.get(word[:_MAX_PREFIX], []) for word in query_words), key=len
+        )
+        if not candidates[0]:
+            return []
+        matched = set(candidates[0])
+        for positions in candidates[1:]:
+            matched.intersection_update(positions)
+        long_words = [word for word in query_words if len(word) > _MAX_PREFIX]
+        if long_words:
+            matched = {
+                i for i in matched
+                if all(any(w.startswith(word) for w in self._words[i]) for word in long_words)
+            }
+        return sorted(matched)
+
+    async def search(self, query: str, offset: int = 0, limit: int = 20) -> tuple[list[SearchHit], int]:
+        """Products whose name has a word starting with every query word.
+
+        Returns one page and the total number of matches.
+        """
+        if self._loaded_at is None and not self._hits:
+            await self.refresh()
+        elif not self._is_fresh() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh_quietly())
+        positions = self._match(query)
+        return [self._hits[i] for i in positions[offset:offset + limit]], len(positions)
+
+
+product_search = ProductSearchIndex()
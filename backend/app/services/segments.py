@@ -0,0 +1,181 @@
+"""Compile mailing :class:`~app.schemas.mailing.Segment` filters to SQL.
+
+A segment becomes one ``SELECT users.telegram_id`` with EXISTS
+subqueries for cart / favorites and, only when an order condition is
+used, a LEFT JOIN on per-user order aggregates.  Recipients are read
+through a server-side cursor (:func:`iter_recipients`), so a large
+audience never sits in memory as a whole; :func:`count_recipients`
+runs the same filter as a ``COUNT`` for previews.
+
+Users who blocked the bot, or whose last ``MAILING_MAX_FAILURES``
+deliveries failed within ``MAILING_FAILURES_RESET_DAYS``, are left out
+unless ``include_blocked`` is set.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import Select, and_, exists, false, func, not_, or_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.config import settings
+from app.db.models.cart import CartItem
+from app.db.models.favorite import Favorite
+from app.db.models.order import Order
+from app.db.models.product import product_category
+from app.db.models.user import User
+from app.schemas.mailing import Range, Segment
+
+# The fixed audiences of the mailing form, as segments
+AUDIENCE_SEGMENTS: dict[str, Segment] = {
+    "all": Segment(),
+    "has_orders": Segment(has_orders=True),
+    "has_cart": Segment(has_cart=True),
+    "has_favorites": Segment(has_favorites=True),
+    "no_orders": Segment(has_orders=False),
+}
+
+_CHUNK = 1000
+
+
+def resolve_segment(audience: str, segment: Optional[Segment] = None) -> Segment:
+    """An explicit segment wins over the named audience."""
+    if segment is not None:
+        return segment
+    return AUDIENCE_SEGMENTS.get(audience, AUDIENCE_SEGMENTS["all"])
+
+
+class _SegmentCompiler:
+    def __init__(self):
+        self.now = datetime.now(timezone.utc)
+        self._order_stats = None
+
+    @property
+    def order_stats(self):
+        """Per-user order aggregates, joined only when a condition needs them."""
+        if self._order_stats is None:
+            self._order_stats = (
+                select(
+                    Order.user_id.label("user_id"),
+                    func.count(Order.id).label("orders_count"),
+                    func.coalesce(func.sum(Order.total), 0).label("orders_total"),
+                    func.max(Order.created_at).label("last_order_at"),
+                )
+                .where(Order.status != "cancelled")
+                .group_by(Order.user_id)
+                .subquery("order_stats")
+            )
+        return self._order_stats
+
+    @staticmethod
+    def _range(expr, bounds: Range) -> list[ColumnElement]:
+        conditions = []
+        if bounds.min is not None:
+            conditions.append(expr >= bounds.min)
+        if bounds.max is not None:
+            conditions.append(expr <= bounds.max)
+        return conditions
+
+    def compile(self, segment: Segment) -> ColumnElement:
+        conditions: list[ColumnElement] = []
+
+        if segment.all:
+            conditions.extend(self.compile(child) for child in segment.all)
+        if segment.any:
+            conditions.append(or_(*(self.compile(child) for child in segment.any)))
+        elif segment.any is not None:
+            conditions.append(false())
+        if segment.not_ is not None:
+            conditions.append(not_(self.compile(segment.not_)))
+
+        if segment.has_orders is not None:
+            user_id = self.order_stats.c.user_id
+            conditions.append(user_id.isnot(None) if segment.has_orders else user_id.is_(None))
+        if segment.orders_count is not None:
+            conditions += self._range(func.coalesce(self.order_stats.c.orders_count, 0), segment.orders_count)
+        if segment.orders_total is not None:
+            conditions += self._range(func.coalesce(self.order_stats.c.orders_total, 0), segment.orders_total)
+        if segment.last_order_days is not None:
+            # Older than ``min`` days, newer than ``max`` days; users without orders never match
+            last = self.order_stats.c.last_order_at
+            days = segment.last_order_days
+            if days.min is not None:
+                conditions.append(last <= self.now - timedelta(days=days.min))
+            if days.max is not None:
+                conditions.append(last >= self.now - timedelta(days=days.max))
+            conditions.append(last.isnot(None))
+
+        if segment.has_cart is not None:
+            in_cart = exists().where(CartItem.user_id == User.id)
+            conditions.append(in_cart if segment.has_cart else ~in_cart)
+        if segment.has_favorites is not None:
+            has_favorites = exists().where(Favorite.user_id == User.id)
+            conditions.append(has_favorites if segment.has_favorites else ~has_favorites)
+        if segment.favorite_category_id is not None:
+            conditions.append(
+                exists()
+                .where(
+                    Favorite.user_id == User.id,
+                    product_category.c.product_id == Favorite.product_id,
+                    product_category.c.category_id == segment.favorite_category_id,
+                )
+            )
+        if segment.bonus_balance is not None:
+            conditions += self._range(User.bonus_balance, segment.bonus_balance)
+
+        if not conditions:
+            return true()
+        return and_(*conditions)
+
+
+def failures_cutoff() -> Optional[datetime]:
+    """Delivery failures before this moment have expired (``None`` — they never do)."""
+    if settings.mailing_failures_reset_days <= 0:
+        return None
+    return datetime.now(timezone.utc) - timedelta(days=settings.mailing_failures_reset_days)
+
+
+def _reachable() -> ColumnElement:
+    conditions = [User.bot_blocked_at.is_(None)]
+    if settings.mailing_max_failures > 0:
+        below_limit = User.delivery_failures < settings.mailing_max_failures
+        cutoff = failures_cutoff()
+        if cutoff is not None:
+            below_limit = or_(
+                below_limit, User.delivery_failed_at.is_(None), User.delivery_failed_at < cutoff
+            )
+        conditions.append(below_limit)
+    return and_(*conditions)
+
+
+def _query(segment: Segment, *columns, include_blocked: bool = False) -> Select:
+    compiler = _SegmentCompiler()
+    where = compiler.compile(segment)
+    query = select(*columns).select_from(User)
+    if compiler._order_stats is not None:
+        query = query.outerjoin(compiler.order_stats, compiler.order_stats.c.user_id == User.id)
+    if not include_blocked:
+        query = query.where(_reachable())
+    return query.where(where)
+
+
+def recipients_query(segment: Segment, include_blocked: bool = False) -> Select:
+    return _query(segment, User.telegram_id, include_blocked=include_blocked).order_by(User.id)
+
+
+async def iter_recipients(
+    db: AsyncSession, segment: Segment, chunk_size: int = _CHUNK, include_blocked: bool = False
+) -> AsyncIterator[list[int]]:
+    """Yield ``telegram_id`` chunks from a server-side cursor."""
+    query = recipients_query(segment, include_blocked).execution_options(yield_per=chunk_size)
+    result = await db.stream(query)
+    async for partition in result.partitions(chunk_size):
+        yield [row[0] for row in partition]
+
+
+async def count_recipients(db: AsyncSession, segment: Segment, include_blocked: bool = False) -> int:
+    result = await db.execute(_query(segment, func.count(User.id), include_blocked=include_blocked))
+    return result.scalar() or 0
@@ -0,0 +1,200 @@
+"""Per-store stock: ``stock_levels`` sync and the in-memory availability map.
+
+Loaders that know quantities per warehouse (MoySklad ``/report/stock/bystore``)
+hand the full listing to :func:`apply_stock_levels`, which diffs it
+against ``stock_levels`` and writes only the changes in bulk.
+
+:data:`store_availability` keeps ``store id -> product ids in stock
+there`` in memory so the catalog can filter "available at store X"
+without aggregating ``stock_levels`` on every request.  The syncing
+worker invalidates it; other workers rebuild it once it is older than
+``stock_sync_interval_seconds``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.models.product import Product
+from app.db.models.product_variant import ProductVariant
+from app.db.models.stock_level import StockLevel
+from app.db.models.store import Store
+
+logger = logging.getLogger(__name__)
+
+_IN_CHUNK = 500
+
+
+@dataclass
+class StoreStock:
+    """One upstream ``bystore`` entry, by external ids."""
+
+    product_external_id: Optional[str]  # None for variant rows
+    variant_external_id: Optional[str]
+    store_external_id: str
+    quantity: int
+
+
+def _chunks(values: list, size: int = _IN_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+async def upsert_stores(db: AsyncSession, stores: dict[str, str]) -> dict[str, int]:
+    """Create / rename stores by ``external_id``; returns ``external_id -> id`` (no commit)."""
+    result = await db.execute(select(Store).where(Store.external_id.isnot(None)))
+    existing = {store.external_id: store for store in result.scalars().all()}
+    for ext_id, name in stores.items():
+        store = existing.get(ext_id)
+        if store is None:
+            store = Store(external_id=ext_id, name=name or ext_id)
+            db.add(store)
+            existing[ext_id] = store
+        elif name and store.name != name:
+            store.name = name
+    await db.flush()
+    return {ext_id: store.id for ext_id, store in existing.items()}
+
+
+async def apply_stock_levels(
+    db: AsyncSession, levels: list[StoreStock], stores: dict[str, str]
+) -> int:
+    """Replace ``stock_levels`` with a full upstream listing (no commit).
+
+    ``stores`` maps store external ids to names.  Rows for products or
+    variants unknown locally are skipped; rows missing from ``levels``
+    are deleted.  Returns the number of inserted, updated and deleted rows.
+    """
+    store_ids = await upsert_stores(db, stores)
+
+    product_ext = list({level.product_external_id for level in levels if level.product_external_id})
+    product_ids: dict[str, int] = {}
+    for chunk in _chunks(product_ext):
+        result = await db.execute(
+            select(Product.external_id, Product.id).where(Product.external_id.in_(chunk))
+        )
+        product_ids.update(result.all())
+
+    variant_ext = list({level.variant_external_id for level in levels if level.variant_external_id})
+    variant_ids: dict[str, tuple[int, int]] = {}
+    for chunk in _chunks(variant_ext):
+        result = await db.execute(
+            select(ProductVariant.external_id, ProductVariant.id, ProductVariant.product_id)
+            .where(ProductVariant.external_id.in_(chunk))
+        )
+        variant_ids.update({ext_id: (vid, pid) for ext_id, vid, pid in result.all()})
+
+    wanted: dict[tuple[int, Optional[int], int], int] = {}
+    for level in levels:
+        store_id = store_ids.get(level.store_external_id)
+        if store_id is None:
+            continue
+        if level.variant_external_id:
+            if level.variant_external_id not in variant_ids:
+                continue
+            variant_id, product_id = variant_ids[level.variant_external_id]
+        else:
+            product_id = product_ids.get(level.product_external_id)
+            variant_id = None
+            if product_id is None:
+                continue
+        key = (product_id, variant_id, store_id)
+        wanted[key] = wanted.get(key, 0) + max(int(level.quantity), 0)
+
+    result = await db.execute(
+        select(
+            StockLevel.id,
+            StockLevel.product_id,
+            StockLevel.variant_id,
+            StockLevel.store_id,
+            StockLevel.quantity,
+        )
+    )
+    existing = {(pid, vid, sid): (row_id, qty) for row_id, pid, vid, sid, qty in result.all()}
+
+    to_insert = [
+        {"product_id": pid, "variant_id": vid, "store_id": sid, "quantity": qty}
+        for (pid, vid, sid), qty in wanted.items()
+        if (pid, vid, sid) not in existing
+    ]
+    to_update = [
+        {"row_id": existing[key][0], "qty": qty}
+        for key, qty in wanted.items()
+        if key in existing and existing[key][1] != qty
+    ]
+    to_delete = [row_id for key, (row_id, _) in existing.items() if key not in wanted]
+
+    for chunk in _chunks(to_delete):
+        await db.execute(delete(StockLevel).where(StockLevel.id.in_(chunk)))
+    if to_update:
+        table = StockLevel.__table__
+        await db.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(quantity=bindparam("qty")),
+            to_update,
+        )
+    if to_insert:
+        await db.execute(insert(StockLevel), to_insert)
+
+    changed = len(to_insert) + len(to_update) + len(to_delete)
+    if changed:
+        logger.info(
+            f"Stock levels: {len(to_insert)} inserted, {len(to_update)} updated, "
+            f"{len(to_delete)} deleted across {len(store_ids)} stores"
+        )
+    return changed
+
+
+class StoreAvailability:
+    """``store id -> product ids`` with any stock (product or variant) at that store."""
+
+    def __init__(self):
+        self._by_store: dict[int, frozenset[int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        ttl = max(settings.stock_sync_interval_seconds, 10)
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < ttl
+
+    async def _ensure_loaded(self) -> None:
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            from app.db.session import async_session
+
+            by_store: dict[int, set[int]] = {}
+            async with async_session() as db:
+                result = await db.execute(
+                    select(StockLevel.store_id, StockLevel.product_id)
+                    .where(StockLevel.quantity > 0)
+                    .distinct()
+                )
+                for store_id, product_id in result.all():
+                    by_store.setdefault(store_id, set()).add(product_id)
+            self._by_store = {store_id: frozenset(ids) for store_id, ids in by_store.items()}
+            self._loaded_at = time.monotonic()
+
+    async def product_ids(self, store_id: int) -> frozenset[int]:
+        await self._ensure_loaded()
+        return self._by_store.get(store_id, frozenset())
+
+    async def counts(self) -> dict[int, int]:
+        """Number of products in stock per store."""
+        await self._ensure_loaded()
+        return {store_id: len(ids) for store_id, ids in self._by_store.items()}
+
+
+store_availability = StoreAvailability()
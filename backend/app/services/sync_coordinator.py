@@ -0,0 +1,302 @@
+"""Single-flight product sync.
+
+Every sync trigger (startup, the ``product_sync`` scheduler job,
+``POST /admin/sync``) goes through :data:`sync_coordinator`, which runs at
+most one sync at a time:
+
+* inside a process — a second trigger while a sync is running gets the
+  running job back instead of starting another one;
+* across workers — the run must hold a lease on the source's
+  ``sync_state`` row.  The lease expires on its own if a worker dies and
+  is renewed by a heartbeat while the sync runs.  A run that finds the
+  lease held by another worker's sync is skipped; one held by a short
+  job without a sync (the stock lane, a webhook flush) is waited for, up
+  to ``_LEASE_WAIT_SECONDS``.
+
+The lease holder also writes its job (status and progress) to
+``sync_state`` on every heartbeat, so any worker can answer
+``GET /admin/sync/{job_id}``; jobs in this worker's memory are served
+from there first.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.db.models.sync_state import SyncState
+from app.db.session import async_session
+from app.services.product_cards import product_cards
+from app.services.product_loader.base import SyncProgress
+from app.services.product_loader.state import get_sync_state
+from app.services.search import product_search
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for the progress endpoint
+_MAX_FINISHED_JOBS = 20
+# How often the running job's progress is written to sync_state
+_PROGRESS_SECONDS = 2.0
+# Waiting for a lease held by another worker's stock sync / webhook flush
+_LEASE_RETRY_SECONDS = 2.0
+_LEASE_WAIT_SECONDS = 120.0
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SyncJob:
+    """One sync run as seen by the admin progress endpoint."""
+
+    def __init__(self, trigger: str):
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.status = "pending"  # pending | running | done | failed | skipped
+        self.progress = SyncProgress()
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("pending", "running")
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "trigger": self.trigger,
+            "status": self.status,
+            "source": settings.product_source.value,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error,
+            **self.progress.snapshot(),
+        }
+
+
+class SyncCoordinator:
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: OrderedDict[str, SyncJob] = OrderedDict()
+        self._current: Optional[SyncJob] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._current is not None and self._current.is_active
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        return self._jobs.get(job_id)
+
+    async def load(self, job_id: str) -> Optional[dict[str, Any]]:
+        """Job as written to ``sync_state`` by whichever worker runs it."""
+        if job_id in self._jobs:
+            return self._jobs[job_id].as_dict()
+        async with async_session() as db:
+            state = (
+                await db.execute(select(SyncState).where(SyncState.job_id == job_id))
+            ).scalar_one_or_none()
+        return _job_snapshot(state) if state is not None else None
+
+    async def running_elsewhere(self) -> Optional[dict[str, Any]]:
+        """Active job of another worker for the current source, if any."""
+        async with async_session() as db:
+            state = (
+                await db.execute(
+                    select(SyncState).where(SyncState.source == settings.product_source.value)
+                )
+            ).scalar_one_or_none()
+        if state is None or state.lease_owner in (None, self.owner):
+            return None
+        job = _job_snapshot(state)
+        return job if job and job["status"] in ("pending", "running") else None
+
+    def start(self, trigger: str) -> SyncJob:
+        """Start a background sync, or return the one already running."""
+        if self.is_running:
+            return self._current
+        job = SyncJob(trigger)
+        self._current = job
+        self._jobs[job.id] = job
+        while len(self._jobs) > _MAX_FINISHED_JOBS:
+            self._jobs.popitem(last=False)
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def run(self, trigger: str) -> SyncJob:
+        """Start (or join) a sync and wait for it to finish."""
+        job = self.start(trigger)
+        await asyncio.shield(job.task)
+        return job
+
+    async def _run(self, job: SyncJob) -> None:
+        from app.services.product_loader import get_product_loader
+
+        source = settings.product_source.value
+        deadline = time.monotonic() + _LEASE_WAIT_SECONDS
+        while True:
+            try:
+                if await self.acquire_lease(source):
+                    break
+                # No sync job behind the lease: a stock sync or webhook flush, done soon
+                busy = await self.running_elsewhere() is not None or time.monotonic() >= deadline
+            except Exception as e:
+                job.status = "failed"
+                job.error = f"Failed to acquire sync lease: {e}"
+                job.finished_at = datetime.now(timezone.utc)
+                logger.error(job.error, exc_info=True)
+                return
+            if busy:
+                job.status = "skipped"
+                job.error = "Sync is already running in another worker"
+                job.finished_at = datetime.now(timezone.utc)
+                logger.info(f"Sync ({job.trigger}) skipped: lease held by another worker")
+                return
+            await asyncio.sleep(_LEASE_RETRY_SECONDS)
+
+        job.status = "running"
+        job.progress.started_at = time.monotonic()
+        await self._save_job(source, job)
+        heartbeat = asyncio.create_task(self._heartbeat(source, job))
+        try:
+            stats = await get_product_loader().sync_products(progress=job.progress)
+            job.result = stats.as_dict()
+            job.status = "done"
+            job.progress.set_phase("done")
+            logger.info(f"Sync ({job.trigger}) complete from {source}: {stats}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Sync ({job.trigger}) from {source} failed: {e}", exc_info=True)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            job.progress.finish()
+            job.finished_at = datetime.now(timezone.utc)
+            await self._save_job(source, job)
+            await self.release_lease(source)
+            product_cards.invalidate()
+            product_search.invalidate()
+
+    # ------------------------------------------------------------------
+    # Lease
+    # ------------------------------------------------------------------
+
+    def _lease_ttl(self) -> timedelta:
+        return timedelta(seconds=max(settings.sync_lease_seconds, 30))
+
+    async def acquire_lease(self, source: str) -> bool:
+        """Compare-and-set the lease on ``sync_state`` (works on SQLite and PostgreSQL)."""
+        async with async_session() as db:
+            try:
+                state = await get_sync_state(db, source)
+                await db.commit()
+            except IntegrityError:
+                # Another worker created the row at the same moment
+                await db.rollback()
+                state = await get_sync_state(db, source)
+
+            now = datetime.now(timezone.utc)
+            held_by, expires_at = state.lease_owner, state.lease_expires_at
+            if (
+                held_by
+                and held_by != self.owner
+                and expires_at is not None
+                and _as_utc(expires_at) > now
+            ):
+                return False
+
+            condition = [SyncState.id == state.id]
+            condition.append(
+                SyncState.lease_owner == held_by if held_by else SyncState.lease_owner.is_(None)
+            )
+            if expires_at is not None:
+                condition.append(SyncState.lease_expires_at == expires_at)
+            result = await db.execute(
+                update(SyncState)
+                .where(*condition)
+                .values(lease_owner=self.owner, lease_expires_at=now + self._lease_ttl())
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _heartbeat(self, source: str, job: SyncJob) -> None:
+        """Renew the lease and publish ``job`` progress until cancelled."""
+        interval = min(self._lease_ttl().total_seconds() / 3, _PROGRESS_SECONDS)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with async_session() as db:
+                    await db.execute(
+                        update(SyncState)
+                        .where(SyncState.source == source, SyncState.lease_owner == self.owner)
+                        .values(
+                            lease_expires_at=datetime.now(timezone.utc) + self._lease_ttl(),
+                            job_id=job.id,
+                            job=job.as_dict(),
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Sync lease heartbeat failed: {e}")
+
+    async def _save_job(self, source: str, job: SyncJob) -> None:
+        try:
+            async with async_session() as db:
+                await db.execute(
+                    update(SyncState)
+                    .where(SyncState.source == source, SyncState.lease_owner == self.owner)
+                    .values(job_id=job.id, job=job.as_dict())
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to save sync job status: {e}")
+
+    async def release_lease(self, source: str) -> None:
+        try:
+            async with async_session() as db:
+                await db.execute(
+                    update(SyncState)
+                    .where(SyncState.source == source, SyncState.lease_owner == self.owner)
+                    .values(lease_owner=None, lease_expires_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to release sync lease: {e}")
+
+
+def _job_snapshot(state: SyncState) -> Optional[dict[str, Any]]:
+    """Stored job of ``state``; an active one whose lease is gone is reported as failed."""
+    if not state.job:
+        return None
+    job = dict(state.job)
+    expires_at = _as_utc(state.lease_expires_at)
+    if job.get("status") in ("pending", "running") and (
+        state.lease_owner is None or expires_at is None or expires_at <= datetime.now(timezone.utc)
+    ):
+        job["status"] = "failed"
+        job["error"] = "The worker running this sync stopped"
+    return job
+
+
+sync_coordinator = SyncCoordinator()
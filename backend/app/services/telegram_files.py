@@ -0,0 +1,172 @@
+"""Upload an image to Telegram once, then reuse its ``file_id``.
+
+Sending a photo by URL makes Telegram download it again for every
+message; a ``file_id`` returned by an earlier send costs nothing.
+:data:`telegram_files` keeps ``image -> file_id`` in ``telegram_files``
+(with a small in-memory layer) for broadcasts and bot product cards.
+
+Files from ``uploads/`` are keyed by the sha256 of their content — the
+same picture uploaded twice shares one ``file_id``, and a replaced file
+gets a new one — and are uploaded directly instead of by URL.  Remote
+images are keyed by their URL.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Union
+from urllib.parse import urlparse
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.db.models.telegram_file import TelegramFile
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = Path(__file__).resolve().parent.parent.parent / "uploads"
+
+_MEMORY_SIZE = 2048
+
+
+def absolute_url(image_url: str) -> str:
+    """Build absolute URL for Telegram (send_photo needs http(s) URL)."""
+    if not image_url:
+        return ""
+    if image_url.startswith("http://") or image_url.startswith("https://"):
+        return image_url
+    base = settings.public_base_url.strip()
+    if not base:
+        parsed = urlparse(settings.webapp_url)
+        base = f"{parsed.scheme}://{parsed.netloc}"
+    return base.rstrip("/") + ("/" + image_url.lstrip("/"))
+
+
+def _local_path(source: str) -> Optional[Path]:
+    """Path in ``uploads/`` for ``/uploads/...`` (or our own absolute URL)."""
+    path = urlparse(source).path if source.startswith(("http://", "https://")) else source
+    if source.startswith(("http://", "https://")) and absolute_url(path) != source:
+        return None
+    if not path.startswith("/uploads/"):
+        return None
+    candidate = (UPLOADS_DIR.parent / path.lstrip("/")).resolve()
+    if UPLOADS_DIR.resolve() not in candidate.parents or not candidate.is_file():
+        return None
+    return candidate
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_stale_file_error(error: Exception) -> bool:
+    text = str(error).lower()
+    return "file identifier" in text or "file_id" in text or "wrong remote file" in text
+
+
+class TelegramFileCache:
+    def __init__(self):
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        # path -> (mtime, size, content hash): avoid re-hashing unchanged uploads
+        self._digests: dict[Path, tuple[float, int, str]] = {}
+
+    async def key(self, source: str) -> str:
+        path = _local_path(source)
+        if path is None:
+            return "url:" + hashlib.sha256(source.encode("utf-8")).hexdigest()
+        stat = path.stat()
+        cached = self._digests.get(path)
+        if cached is None or cached[:2] != (stat.st_mtime, stat.st_size):
+            digest = await asyncio.to_thread(_file_digest, path)
+            cached = (stat.st_mtime, stat.st_size, digest)
+            self._digests[path] = cached
+        return "sha256:" + cached[2]
+
+    def input_file(self, source: str) -> Union[str, Any]:
+        """What to pass as ``photo`` for a first upload."""
+        from aiogram.types import FSInputFile
+
+        path = _local_path(source)
+        return FSInputFile(path) if path is not None else absolute_url(source)
+
+    def _remember(self, key: str, file_id: str) -> None:
+        self._memory[key] = file_id
+        self._memory.move_to_end(key)
+        while len(self._memory) > _MEMORY_SIZE:
+            self._memory.popitem(last=False)
+
+    async def get(self, source: str) -> Optional[str]:
+        from app.db.session import async_session
+
+        key = await self.key(source)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        async with async_session() as db:
+            file_id = (
+                await db.execute(select(TelegramFile.file_id).where(TelegramFile.key == key))
+            ).scalar_one_or_none()
+        if file_id:
+            self._remember(key, file_id)
+        return file_id
+
+    async def put(self, source: str, file_id: str) -> None:
+        from app.db.session import async_session
+
+        key = await self.key(source)
+        self._remember(key, file_id)
+        try:
+            async with async_session() as db:
+                await db.execute(delete(TelegramFile).where(TelegramFile.key == key))
+                db.add(TelegramFile(key=key, source=source[:2000], file_id=file_id))
+                await db.commit()
+        except IntegrityError:
+            pass  # stored by another worker at the same moment
+        except Exception as e:
+            logger.warning(f"Failed to store Telegram file_id: {e}")
+
+    async def forget(self, source: str) -> None:
+        from app.db.session import async_session
+
+        key = await self.key(source)
+        self._memory.pop(key, None)
+        async with async_session() as db:
+            await db.execute(delete(TelegramFile).where(TelegramFile.key == key))
+            await db.commit()
+
+    async def send_photo(self, send: Callable[[Any], Awaitable[Any]], source: str) -> Any:
+        """Call ``send(photo)`` with the cached ``file_id`` or upload ``source``.
+
+        ``send`` is e.g. ``lambda photo: message.answer_photo(photo=photo, ...)``.
+        A ``file_id`` Telegram no longer accepts is dropped and the image
+        uploaded again; the new ``file_id`` is stored.
+        """
+        from aiogram.exceptions import TelegramBadRequest
+
+        file_id = await self.get(source)
+        if file_id:
+            try:
+                return await send(file_id)
+            except TelegramBadRequest as e:
+                if not _is_stale_file_error(e):
+                    raise
+                logger.info(f"Cached file_id rejected, uploading again: {source}")
+                await self.forget(source)
+
+        message = await send(self.input_file(source))
+        photos = getattr(message, "photo", None)
+        if photos:
+            await self.put(source, photos[-1].file_id)
+        return message
+
+
+telegram_files = TelegramFileCache()
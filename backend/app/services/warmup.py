@@ -0,0 +1,90 @@
+"""Startup warm-up tasks that run after the app starts serving requests.
+
+``lifespan`` only awaits the critical path (DB tables, handler
+registration); slow work such as the initial product sync or fetching the
+bot profile photo is spawned here and reported by ``GET /ready``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _WarmupTask:
+    def __init__(self, name: str, task: asyncio.Task):
+        self.name = name
+        self.task = task
+        self.state = "running"  # running | done | failed | cancelled
+        self.started_at = time.monotonic()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class Warmup:
+    def __init__(self):
+        self._tasks: dict[str, _WarmupTask] = {}
+        self._startup_began: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+
+    def begin(self) -> None:
+        """Called first thing in ``lifespan``."""
+        self._startup_began = time.monotonic()
+
+    def mark_started(self) -> None:
+        """Record the critical-path duration; called right before ``lifespan`` yields."""
+        began = self._startup_began or time.monotonic()
+        self.startup_seconds = round(time.monotonic() - began, 3)
+        logger.info(f"Startup critical path took {self.startup_seconds:.3f}s")
+
+    def spawn(self, name: str, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        entry = _WarmupTask(name, task)
+        self._tasks[name] = entry
+
+        def _done(t: asyncio.Task) -> None:
+            entry.duration = round(time.monotonic() - entry.started_at, 3)
+            if t.cancelled():
+                entry.state = "cancelled"
+            elif t.exception() is not None:
+                entry.state = "failed"
+                entry.error = str(t.exception())
+                logger.warning(f"Warm-up task {name} failed: {entry.error}")
+            else:
+                entry.state = "done"
+                logger.info(f"Warm-up task {name} finished in {entry.duration:.1f}s")
+
+        task.add_done_callback(_done)
+        return task
+
+    @property
+    def is_warm(self) -> bool:
+        return all(t.state != "running" for t in self._tasks.values())
+
+    def status(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "status": "ready" if self.is_warm else "warming",
+            "startup_seconds": self.startup_seconds,
+            "warmup": {
+                name: {
+                    "state": t.state,
+                    "seconds": t.duration if t.duration is not None else round(now - t.started_at, 3),
+                    "error": t.error,
+                }
+                for name, t in self._tasks.items()
+            },
+        }
+
+    async def cancel_all(self) -> None:
+        pending = [t.task for t in self._tasks.values() if not t.task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+warmup = Warmup()
@@ -0,0 +1,173 @@
+"""Load-test the broadcast sender against a fake Telegram Bot API.
+
+The fake server (aiohttp, on localhost) answers ``sendMessage`` /
+``sendPhoto`` like Telegram does: after ``--server-limit`` messages
+within one second it returns 429 with ``retry_after``, every
+``--blocked-every``-th chat answers 403 "bot was blocked by the user",
+and every response takes ``--latency-ms``.  With ``--photo`` the
+broadcast carries an image: a ``sendPhoto`` by URL or upload costs an
+extra ``--photo-fetch-ms`` (Telegram downloading it), one by ``file_id``
+does not.
+
+Run from ``backend/``::
+
+    python -m benchmarks.mailing_load --recipients 3000
+    python -m benchmarks.mailing_load --recipients 3000 --rate 40   # over the limit: watch the 429s
+    python -m benchmarks.mailing_load --recipients 300 --serial     # the old one-by-one loop
+    python -m benchmarks.mailing_load --recipients 1000 --photo https://cdn.example.com/sale.jpg
+
+Reports achieved messages per second, 429 answers and delivery counts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter, deque
+
+TOKEN = "123456:BENCHMARK"
+
+
+class FakeBotAPI:
+    def __init__(self, limit: int, blocked_every: int, latency_ms: float, photo_fetch_ms: float = 0):
+        self.photo_fetch = photo_fetch_ms / 1000
+        self.limit = limit
+        self.blocked_every = blocked_every
+        self.latency = latency_ms / 1000
+        self.window: deque[float] = deque()
+        self.counts: Counter[str] = Counter()
+        self.message_id = 0
+
+    def _reply(self, status: int, payload: dict):
+        from aiohttp import web
+
+        return web.Response(status=status, text=json.dumps(payload), content_type="application/json")
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        form = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        while self.window and now - self.window[0] >= 1.0:
+            self.window.popleft()
+        if len(self.window) >= self.limit:
+            self.counts["429"] += 1
+            return self._reply(429, {
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+        self.window.append(now)
+
+        chat_id = int(form.get("chat_id", 0))
+        if self.blocked_every and chat_id % self.blocked_every == 0:
+            self.counts["403"] += 1
+            return self._reply(403, {
+                "ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user",
+            })
+        self.counts[method] += 1
+        self.message_id += 1
+        result = {"message_id": self.message_id, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+        if method == "sendPhoto":
+            if str(form.get("photo", "")).startswith("AgAC-"):
+                self.counts["photo_by_file_id"] += 1
+            else:
+                self.counts["photo_upload"] += 1
+                await asyncio.sleep(self.photo_fetch)
+            result["photo"] = [{"file_id": f"AgAC-{self.message_id}", "file_unique_id": "bench", "width": 90, "height": 90}]
+        else:
+            result["text"] = form.get("text", "")
+        return self._reply(200, {"ok": True, "result": result})
+
+
+async def _run(args: argparse.Namespace) -> None:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiohttp import web
+
+    from app.services.mailing_service import BroadcastMessage, BroadcastSender
+
+    if args.photo:
+        from app.db.base import Base
+        from app.db.session import engine
+        import app.db.models  # noqa — telegram_files cache table
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    api = FakeBotAPI(args.server_limit, args.blocked_every, args.latency_ms, args.photo_fetch_ms)
+    web_app = web.Application()
+    web_app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"))
+    bot = Bot(token=TOKEN, session=session)
+    chat_ids = list(range(1, args.recipients + 1))
+    message = BroadcastMessage(text="Скидки до 50% на всё!", photo=args.photo)
+
+    started = time.perf_counter()
+    if args.serial:
+        counts: Counter[str] = Counter()
+        for chat_id in chat_ids:
+            try:
+                if message.photo:
+                    await bot.send_photo(chat_id=chat_id, photo=message.photo, caption=message.text)
+                else:
+                    await bot.send_message(chat_id=chat_id, text=message.text)
+                counts["sent"] += 1
+                await asyncio.sleep(0.05)
+            except Exception:
+                counts["failed"] += 1
+        retries = 0
+    else:
+        sender = BroadcastSender(bot, message, rate=args.rate, concurrency=args.concurrency)
+        counts = await sender.run(chat_ids)
+        retries = sender.retries
+    seconds = time.perf_counter() - started
+
+    await session.close()
+    await runner.cleanup()
+    mode = "serial" if args.serial else f"rate={args.rate or 'default'} concurrency={args.concurrency or 'default'}"
+    print(
+        f"{mode}: {args.recipients} recipients in {seconds:.2f}s — "
+        f"{counts['sent'] / seconds:.1f} msgs/s delivered, {args.recipients / seconds:.1f} recipients/s\n"
+        f"  delivery: " + " ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+        + f"\n  server: 429={api.counts['429']} 403={api.counts['403']}  retries={retries}"
+        + (
+            f"  photo uploads={api.counts['photo_upload']} by file_id={api.counts['photo_by_file_id']}"
+            if args.photo else ""
+        )
+        + f"\n  projected 100k broadcast: {100_000 / (args.recipients / seconds) / 60:.0f} min"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--recipients", type=int, default=3_000)
+    parser.add_argument("--rate", type=float, default=None, help="MAILING_RATE_PER_SECOND override")
+    parser.add_argument("--concurrency", type=int, default=None, help="MAILING_CONCURRENCY override")
+    parser.add_argument("--server-limit", type=int, default=30, help="messages per second before 429")
+    parser.add_argument("--blocked-every", type=int, default=20, help="every N-th chat has blocked the bot")
+    parser.add_argument("--latency-ms", type=float, default=60, help="Bot API response time")
+    parser.add_argument("--serial", action="store_true", help="measure the old one-by-one loop instead")
+    parser.add_argument("--photo", help="image URL or /uploads/... path to attach")
+    parser.add_argument("--photo-fetch-ms", type=float, default=300, help="Telegram fetching a photo by URL")
+    args = parser.parse_args()
+    if args.photo and "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'mailing_bench.db')}"
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Compare SQLite read/write throughput with and without the tuning profile.
+
+Each profile runs in its own process (settings are read at import) on a
+fresh database file seeded with ``--products`` products.  For
+``--seconds``, ``--readers`` tasks run catalog-style queries (a filtered,
+sorted page plus its count) through ``read_session`` while ``--writers``
+tasks commit small write transactions (an order with one item and a stock
+update) through ``async_session``.
+
+Profiles:
+
+* ``default`` — no PRAGMAs, one pool for everything (the old setup)
+* ``tuned`` — WAL, synchronous=NORMAL, busy_timeout, mmap, cache, temp_store,
+  plus the read-only pool
+* ``single-writer`` — ``tuned`` with ``SQLITE_WRITE_CONNECTIONS=1`` and no overflow
+
+Run from ``backend/``::
+
+    python -m benchmarks.sqlite_profile
+    python -m benchmarks.sqlite_profile --readers 16 --writers 8 --seconds 10
+
+Reports reads/s, writes/s, write latency and "database is locked" errors.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROFILES = {
+    "default": {"SQLITE_TUNING": "false", "SQLITE_READ_CONNECTIONS": "0"},
+    "tuned": {},
+    "single-writer": {"SQLITE_WRITE_CONNECTIONS": "1", "DATABASE_MAX_OVERFLOW": "0"},
+}
+
+
+async def _seed(products: int) -> None:
+    from sqlalchemy import insert
+
+    from app.db.base import Base
+    from app.db.models.product import Product
+    from app.db.models.user import User
+    from app.db.session import async_session, engine
+    import app.db.models  # noqa — register all models
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    rng = random.Random(1)
+    async with async_session() as db:
+        await db.execute(insert(User), [{"telegram_id": i, "first_name": f"u{i}"} for i in range(1, 101)])
+        rows = [
+            {
+                "name": f"Товар {i}",
+                "description": "Описание " * 20,
+                "price": rng.randint(100, 10_000),
+                "stock_quantity": rng.randint(0, 50),
+                "is_available": True,
+            }
+            for i in range(products)
+        ]
+        for i in range(0, len(rows), 5000):
+            await db.execute(insert(Product), rows[i:i + 5000])
+        await db.commit()
+
+
+async def _child(args: argparse.Namespace) -> dict:
+    from sqlalchemy import func, select, update
+    from sqlalchemy.exc import OperationalError
+
+    from app.db.models.order import Order, OrderItem
+    from app.db.models.product import Product
+    from app.db.session import async_session, engine, read_engine, read_session
+
+    await _seed(args.products)
+    deadline = time.monotonic() + args.seconds
+    reads = 0
+    write_latencies: list[float] = []
+    locked = 0
+
+    async def reader(seed: int) -> None:
+        nonlocal reads
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            min_price = rng.randint(100, 9_000)
+            query = select(Product).where(Product.is_available == True, Product.price >= min_price)
+            async with read_session() as db:
+                await db.execute(query.order_by(Product.price).offset(rng.randint(0, 200)).limit(20))
+                await db.execute(select(func.count()).select_from(query.subquery()))
+            reads += 1
+
+    async def writer(seed: int) -> None:
+        nonlocal locked
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            product_id = rng.randint(1, args.products)
+            try:
+                async with async_session() as db:
+                    order = Order(user_id=rng.randint(1, 100), total=500, customer_name="Bench")
+                    db.add(order)
+                    await db.flush()
+                    db.add(OrderItem(order_id=order.id, product_id=product_id, quantity=1, price_at_order=500))
+                    await db.execute(
+                        update(Product)
+                        .where(Product.id == product_id)
+                        .values(stock_quantity=Product.stock_quantity - 1)
+                    )
+                    await db.commit()
+                write_latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(reader(i) for i in range(args.readers)),
+        *(writer(1000 + i) for i in range(args.writers)),
+    )
+    seconds = time.perf_counter() - started
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+    latencies = sorted(write_latencies) or [0.0]
+    return {
+        "reads_per_s": reads / seconds,
+        "writes_per_s": len(write_latencies) / seconds,
+        "write_p50_ms": statistics.median(latencies) * 1000,
+        "write_p95_ms": latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0] * 1000,
+        "locked": locked,
+    }
+
+
+def _run_profile(name: str, args: argparse.Namespace) -> dict:
+    env = dict(os.environ)
+    env.update(PROFILES[name])
+    env["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    env["SQLITE_BUSY_TIMEOUT_MS"] = env.get("SQLITE_BUSY_TIMEOUT_MS", "5000")
+    command = [
+        sys.executable, "-m", "benchmarks.sqlite_profile", "--child",
+        "--products", str(args.products), "--seconds", str(args.seconds),
+        "--readers", str(args.readers), "--writers", str(args.writers),
+    ]
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f"{name}: benchmark failed\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--profile", choices=list(PROFILES), nargs="*", default=list(PROFILES))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(args))))
+        return
+
+    print(
+        f"{args.products} products, {args.readers} readers, {args.writers} writers, {args.seconds:g}s\n"
+        f"{'profile':<14} {'reads/s':>9} {'writes/s':>9} {'write p50':>10} {'write p95':>10} {'locked':>7}"
+    )
+    for name in args.profile:
+        r = _run_profile(name, args)
+        print(
+            f"{name:<14} {r['reads_per_s']:>9.1f} {r['writes_per_s']:>9.1f} "
+            f"{r['write_p50_ms']:>8.1f}ms {r['write_p95_ms']:>8.1f}ms {r['locked']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Measure how long the app takes to become ready to serve requests.
+
+Runs the FastAPI lifespan (the same code uvicorn runs before accepting
+connections) against a throwaway SQLite database and reports the
+critical-path time, then waits for background warm-up to finish.
+
+Run from ``backend/``::
+
+    python -m benchmarks.startup_time --runs 5
+    PRODUCT_SOURCE=moysklad MOYSKLAD_TOKEN=... python -m benchmarks.startup_time
+
+Environment variables are passed through to ``app.config.Settings``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+async def _measure(runs: int, wait_warmup: float) -> None:
+    from app.main import app
+    from app.services.warmup import warmup
+
+    timings = []
+    for i in range(runs):
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter() - started
+            timings.append(ready)
+            deadline = time.monotonic() + wait_warmup
+            while not warmup.is_warm and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            print(f"run {i + 1}: ready in {ready * 1000:.1f} ms; warm-up: {warmup.status()['warmup']}")
+
+    print(
+        f"\nstartup critical path over {runs} runs: "
+        f"median {statistics.median(timings) * 1000:.1f} ms, "
+        f"max {max(timings) * 1000:.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--wait-warmup", type=float, default=0, help="seconds to wait for warm-up per run")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        db_path = os.path.join(tempfile.mkdtemp(), "startup_bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    asyncio.run(_measure(args.runs, args.wait_warmup))
+
+
+if __name__ == "__main__":
+    main()
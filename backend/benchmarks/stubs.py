@@ -0,0 +1,362 @@
+"""In-process stand-ins for the MoySklad and 1C HTTP APIs.
+
+Both stubs are ``httpx.MockTransport`` handlers: pass ``stub.transport()``
+to ``MoySkladLoader(transport=...)`` / ``OneCLoader(transport=...)`` and
+every request is answered locally with realistic payloads.  Rows are
+generated on demand from their index, so a 100k catalog costs no memory
+until a page is requested.
+
+Each stub counts the requests it served (``stub.requests``, by path
+kind in ``stub.by_kind``) and can add a fixed per-request latency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import httpx
+
+MOYSKLAD_BASE = "https://api.moysklad.ru/api/remap/1.2"
+MOYSKLAD_CDN = "https://miniature-prod.moysklad.ru"
+ONE_C_ENDPOINT = "http://one-c.stub/odata/standard.odata"
+
+_EPOCH = datetime(2026, 1, 1)
+_CATEGORIES = ["Одежда", "Обувь", "Аксессуары", "Сумки", "Спорт", "Дом", "Детям", "Подарки"]
+_DESCRIPTION = (
+    "Состав: хлопок 95%, эластан 5%. Уход: деликатная стирка при 30°C. "
+    "Страна производства: Россия. "
+)
+
+
+def _product_uuid(index: int) -> str:
+    return str(uuid.UUID(int=index + 1))
+
+
+class _Stub(ABC):
+    def __init__(self, size: int, latency_ms: float = 0):
+        self.size = size
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self.by_kind: Counter[str] = Counter()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle)
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.handle(request)
+
+    @abstractmethod
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        """Answer one request of the stubbed API."""
+
+    def _json(self, kind: str, payload: Any) -> httpx.Response:
+        self.by_kind[kind] += 1
+        return httpx.Response(
+            200,
+            content=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+
+    @staticmethod
+    def _page(request: httpx.Request, default_limit: int, limit_key: str, offset_key: str) -> tuple[int, int]:
+        params = request.url.params
+        limit = int(params.get(limit_key, default_limit))
+        offset = int(params.get(offset_key, 0))
+        return limit, offset
+
+
+class MoySkladStub(_Stub):
+    """``/entity/product``, ``/report/stock/all`` and the image redirect chain.
+
+    ``image_ratio`` of the products have one image: resolving it costs
+    the loader three requests (images list, ``downloadHref`` redirect,
+    CDN).  ``variant_ratio`` of the products come in sizes S/M/L served
+    by ``/entity/variant`` and stocked per size.  ``updated`` timestamps
+    are one second apart, so the ``updated>=`` delta filter returns only
+    the newest products.
+
+    Product and variant listings honor ``id=`` / ``productid=`` filters
+    and ``expand=images``, as used by the webhook path; :meth:`touch`
+    simulates an edit of a product.
+
+    ``/entity/customerorder`` accepts order batches (kept in
+    ``stub.orders`` by ``externalCode``) and answers every
+    ``throttle_every``-th order request with 429.
+    """
+
+    SIZES = ("S", "M", "L")
+
+    def __init__(
+        self,
+        size: int,
+        latency_ms: float = 0,
+        image_ratio: float = 0.2,
+        variant_ratio: float = 0.1,
+        throttle_every: int = 0,
+    ):
+        super().__init__(size, latency_ms)
+        self.throttle_every = throttle_every
+        self.orders: dict[str, dict[str, Any]] = {}
+        self.revisions: Counter[int] = Counter()
+        self.image_every = int(1 / image_ratio) if image_ratio > 0 else 0
+        self.variant_every = int(1 / variant_ratio) if variant_ratio > 0 else 0
+        variant_products = -(-size // self.variant_every) if self.variant_every else 0
+        self.variant_count = variant_products * len(self.SIZES)
+
+    def _variant(self, number: int) -> tuple[int, str]:
+        """Product index and size of the ``number``-th modification."""
+        product = (number // len(self.SIZES)) * self.variant_every
+        return product, self.SIZES[number % len(self.SIZES)]
+
+    @staticmethod
+    def _variant_uuid(number: int) -> str:
+        return str(uuid.UUID(int=(1 << 64) + number))
+
+    def touch(self, index: int) -> str:
+        """Edit product ``index`` (its name changes); returns its id."""
+        self.revisions[index] += 1
+        return _product_uuid(index)
+
+    def updated(self, index: int) -> str:
+        return (_EPOCH + timedelta(seconds=index)).strftime("%Y-%m-%d %H:%M:%S.000")
+
+    def _has_image(self, index: int) -> bool:
+        return bool(self.image_every) and index % self.image_every == 0
+
+    def product_row(self, index: int) -> dict[str, Any]:
+        pid = _product_uuid(index)
+        href = f"{MOYSKLAD_BASE}/entity/product/{pid}"
+        return {
+            "meta": {"href": href, "type": "product", "mediaType": "application/json"},
+            "id": pid,
+            "updated": self.updated(index),
+            "name": f"Товар {index}" + (f" (ред. {self.revisions[index]})" if self.revisions[index] else ""),
+            "code": f"{index:08d}",
+            "article": f"ART-{index}",
+            "description": _DESCRIPTION * (1 + index % 3),
+            "archived": False,
+            "pathName": f"Каталог/{_CATEGORIES[index % len(_CATEGORIES)]}",
+            "salePrices": [
+                {
+                    "value": float(100_00 + (index % 500) * 10_0),
+                    "currency": {"meta": {"href": f"{MOYSKLAD_BASE}/entity/currency/rub"}},
+                    "priceType": {"name": "Цена продажи"},
+                }
+            ],
+            "images": {
+                "meta": {
+                    "href": f"{href}/images",
+                    "type": "image",
+                    "size": 1 if self._has_image(index) else 0,
+                }
+            },
+        }
+
+    def stock(self, index: int) -> int:
+        return (index * 7) % 50
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url.copy_with(query=None))
+        if url.startswith(MOYSKLAD_CDN):
+            self.by_kind["cdn"] += 1
+            return httpx.Response(200, content=b"\xff\xd8\xff\xe0", headers={"Content-Type": "image/jpeg"})
+        if url.startswith(f"{MOYSKLAD_BASE}/download/"):
+            self.by_kind["download"] += 1
+            key = url.rsplit("/", 1)[-1]
+            return httpx.Response(302, headers={"Location": f"{MOYSKLAD_CDN}/miniature/{key}.jpg"})
+        if url == f"{MOYSKLAD_BASE}/entity/product":
+            return self._products(request)
+        if url == f"{MOYSKLAD_BASE}/report/stock/all":
+            return self._stock(request)
+        if url == f"{MOYSKLAD_BASE}/entity/variant":
+            return self._variants(request)
+        if url == f"{MOYSKLAD_BASE}/entity/customerorder":
+            return self._customer_orders(request)
+        if url == f"{MOYSKLAD_BASE}/report/stock/bystore":
+            return self._stock(request, by_store=True)
+        if url.startswith(f"{MOYSKLAD_BASE}/entity/product/") and url.endswith("/images"):
+            pid = url.split("/entity/product/")[1].split("/")[0]
+            return self._json("images", {
+                "meta": {"size": 1},
+                "rows": [{"miniature": {"downloadHref": f"{MOYSKLAD_BASE}/download/{pid}"}}],
+            })
+        self.by_kind["not_found"] += 1
+        return httpx.Response(404, json={"errors": [{"error": f"Unknown path {url}"}]})
+
+    def _indices(self, request: httpx.Request) -> range:
+        updated_from = _parse_updated_filter(request.url.params.get("filter", ""))
+        if updated_from is None:
+            return range(self.size)
+        since = datetime.strptime(updated_from, "%Y-%m-%d %H:%M:%S")
+        first = max(int((since - _EPOCH).total_seconds()), 0)
+        return range(min(first, self.size), self.size)
+
+    def _products(self, request: httpx.Request) -> httpx.Response:
+        limit, offset = self._page(request, 1000, "limit", "offset")
+        ids = _filter_values(request, "id")
+        if ids:
+            indices = [i for i in sorted(_uuid_int(v) - 1 for v in ids) if 0 <= i < self.size]
+        else:
+            indices = self._indices(request)
+        rows = [self.product_row(i) for i in indices[offset:offset + limit]]
+        if "images" in request.url.params.get("expand", ""):
+            for row in rows:
+                if row["images"]["meta"]["size"]:
+                    row["images"]["rows"] = [
+                        {"miniature": {"downloadHref": f"{MOYSKLAD_BASE}/download/{row['id']}"}}
+                    ]
+        return self._json("products", {
+            "meta": {"size": len(indices), "limit": limit, "offset": offset},
+            "rows": rows,
+        })
+
+    def _variants(self, request: httpx.Request) -> httpx.Response:
+        limit, offset = self._page(request, 1000, "limit", "offset")
+        numbers: Any = range(self.variant_count)
+        ids = _filter_values(request, "id")
+        parents = _filter_values(request, "productid")
+        if ids:
+            numbers = sorted(n for n in (_uuid_int(v) - (1 << 64) for v in ids) if 0 <= n < self.variant_count)
+        elif parents:
+            numbers = []
+            for index in sorted(_uuid_int(v) - 1 for v in parents):
+                if self.variant_every and 0 <= index < self.size and index % self.variant_every == 0:
+                    first = index // self.variant_every * len(self.SIZES)
+                    numbers.extend(range(first, first + len(self.SIZES)))
+        rows = []
+        for number in numbers[offset:offset + limit]:
+            product, size = self._variant(number)
+            rows.append({
+                "meta": {"href": f"{MOYSKLAD_BASE}/entity/variant/{self._variant_uuid(number)}", "type": "variant"},
+                "id": self._variant_uuid(number),
+                "name": f"Товар {product} ({size})",
+                "characteristics": [{"id": "size", "name": "Размер", "value": size}],
+                "product": {"meta": {"href": f"{MOYSKLAD_BASE}/entity/product/{_product_uuid(product)}"}},
+            })
+        return self._json("variants", {
+            "meta": {"size": len(numbers), "limit": limit, "offset": offset},
+            "rows": rows,
+        })
+
+    def _customer_orders(self, request: httpx.Request) -> httpx.Response:
+        self.by_kind["customerorder"] += 1
+        if self.throttle_every and self.by_kind["customerorder"] % self.throttle_every == 0:
+            self.by_kind["throttled"] += 1
+            return httpx.Response(429, headers={"X-Lognex-Retry-After": "50"})
+        if request.method == "GET":
+            codes = _filter_values(request, "externalCode")
+            rows = [self.orders[code] for code in codes if code in self.orders]
+            return httpx.Response(200, json={"meta": {"size": len(rows)}, "rows": rows})
+        created = []
+        for payload in json.loads(request.content):
+            code = payload.get("externalCode") or uuid.uuid4().hex
+            if code in self.orders:
+                self.by_kind["duplicate_order"] += 1
+            order = {**payload, "id": str(uuid.uuid4())}
+            self.orders[code] = order
+            created.append(order)
+        return httpx.Response(200, json=created)
+
+    STORES = (("store-main", "Основной склад"), ("store-pickup", "Пункт выдачи"))
+
+    def _by_store(self, quantity: int) -> list[dict[str, Any]]:
+        """Split ``quantity`` between the stores, remainder to the first."""
+        share = quantity // len(self.STORES)
+        return [
+            {
+                "meta": {"href": f"{MOYSKLAD_BASE}/entity/store/{store_id}", "type": "store"},
+                "name": name,
+                "stock": share + (quantity - share * len(self.STORES) if i == 0 else 0),
+                "reserve": 0,
+                "inTransit": 0,
+            }
+            for i, (store_id, name) in enumerate(self.STORES)
+        ]
+
+    def _stock(self, request: httpx.Request, by_store: bool = False) -> httpx.Response:
+        """Products first, then modifications, as one assortment listing."""
+        limit, offset = self._page(request, 1000, "limit", "offset")
+        rows = []
+        for i in range(self.size + self.variant_count)[offset:offset + limit]:
+            if i < self.size:
+                href = f"{MOYSKLAD_BASE}/entity/product/{_product_uuid(i)}?expand=supplier"
+                row = {"meta": {"href": href, "type": "product"}, "quantity": self.stock(i)}
+            else:
+                number = i - self.size
+                href = f"{MOYSKLAD_BASE}/entity/variant/{self._variant_uuid(number)}"
+                row = {"meta": {"href": href, "type": "variant"}, "quantity": number % 5}
+            if by_store:
+                row = {"meta": row["meta"], "stockByStore": self._by_store(row["quantity"])}
+            rows.append(row)
+        return self._json("stock_by_store" if by_store else "stock", {
+            "meta": {"size": self.size + self.variant_count, "limit": limit, "offset": offset},
+            "rows": rows,
+        })
+
+
+def _filter_values(request: httpx.Request, key: str) -> list[str]:
+    """Values of repeated ``key=value`` conditions in a MoySklad ``filter``."""
+    prefix = f"{key}="
+    return [
+        part[len(prefix):]
+        for part in request.url.params.get("filter", "").split(";")
+        if part.startswith(prefix)
+    ]
+
+
+def _uuid_int(value: str) -> int:
+    try:
+        return uuid.UUID(value).int
+    except ValueError:
+        return -1
+
+
+def _parse_updated_filter(value: str) -> Optional[str]:
+    for part in value.split(";"):
+        if part.startswith("updated>="):
+            return part[len("updated>="):]
+    return None
+
+
+class OneCStub(_Stub):
+    """1C OData ``/products``.
+
+    Without ``$top`` the whole catalog is returned as one document, like a
+    plain 1C HTTP service; with ``$top``/``$skip`` it pages like the
+    standard OData interface (``{"value": [...]}``).
+    """
+
+    def product_row(self, index: int) -> dict[str, Any]:
+        return {
+            "Ref_Key": _product_uuid(index),
+            "Code": f"{index:08d}",
+            "Description": f"Товар {index}",
+            "Описание": _DESCRIPTION * (1 + index % 3),
+            "Цена": float(100 + (index % 500) * 10),
+            "Остаток": (index * 7) % 50,
+            "DeletionMark": False,
+        }
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url.copy_with(query=None))
+        if url != f"{ONE_C_ENDPOINT}/products":
+            self.by_kind["not_found"] += 1
+            return httpx.Response(404, json={"odata.error": {"code": "-1", "message": url}})
+        params = request.url.params
+        if "$top" not in params:
+            return self._json("products", [self.product_row(i) for i in range(self.size)])
+        limit, offset = self._page(request, 1000, "$top", "$skip")
+        page = range(self.size)[offset:offset + limit]
+        payload: dict[str, Any] = {"value": [self.product_row(i) for i in page]}
+        if params.get("$inlinecount") == "allpages":
+            payload["odata.count"] = str(self.size)
+        return self._json("products", payload)
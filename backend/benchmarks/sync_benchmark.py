@@ -0,0 +1,149 @@
+"""Benchmark product sync against the local API stubs.
+
+For every catalog size the tables are recreated, a full sync is run
+(and, for MoySklad, a second delta sync that finds nothing new), and
+the harness reports:
+
+* wall time of ``sync_products``;
+* HTTP requests served by the stub, split by endpoint kind;
+* SQL statements executed (``before_cursor_execute`` events);
+* peak Python memory while syncing (``tracemalloc``).
+
+Run from ``backend/``::
+
+    python -m benchmarks.sync_benchmark --source moysklad --sizes 1000 10000 100000
+    python -m benchmarks.sync_benchmark --source one_c --latency-ms 20
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.sync_benchmark
+
+Without ``DATABASE_URL`` a throwaway SQLite file is used.  ``--no-memory``
+skips tracemalloc, which slows Python code down noticeably.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+
+@dataclass
+class RunResult:
+    label: str
+    size: int
+    seconds: float
+    http_requests: int
+    http_by_kind: dict[str, int]
+    sql_statements: int
+    peak_mb: float | None
+    stats: dict[str, float] = field(default_factory=dict)
+
+    def row(self) -> str:
+        peak = f"{self.peak_mb:8.1f}" if self.peak_mb is not None else "       -"
+        kinds = " ".join(f"{k}={v}" for k, v in sorted(self.http_by_kind.items()))
+        if self.stats.get("network_seconds") or self.stats.get("parse_seconds"):
+            kinds += f"  (network {self.stats['network_seconds']}s, parse {self.stats['parse_seconds']}s)"
+        return (
+            f"{self.label:<8} {self.size:>8} {self.seconds:>9.2f} {self.size / self.seconds:>9.0f} "
+            f"{self.http_requests:>8} {self.sql_statements:>8} {peak}  {kinds}"
+        )
+
+
+class _StatementCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        self.count += 1
+
+
+async def _reset_tables() -> None:
+    from app.db.base import Base
+    from app.db.session import engine
+    import app.db.models  # noqa — register all models
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def _timed(label: str, size: int, stub, counter: _StatementCounter, loader, memory: bool) -> RunResult:
+    requests_before, kinds_before = stub.requests, dict(stub.by_kind)
+    statements_before = counter.count
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    stats = await loader.sync_products()
+    seconds = time.perf_counter() - started
+    peak_mb = None
+    if memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return RunResult(
+        label=label,
+        size=size,
+        seconds=seconds,
+        http_requests=stub.requests - requests_before,
+        http_by_kind={k: v - kinds_before.get(k, 0) for k, v in stub.by_kind.items() if v - kinds_before.get(k, 0)},
+        sql_statements=counter.count - statements_before,
+        peak_mb=peak_mb,
+        stats=stats.as_dict(),
+    )
+
+
+async def _run(args: argparse.Namespace) -> None:
+    from app.db.session import engine
+    from app.services.product_loader.moysklad import MoySkladLoader
+    from app.services.product_loader.one_c import OneCLoader
+    from benchmarks.stubs import MoySkladStub, OneCStub
+
+    counter = _StatementCounter(engine)
+    print(
+        f"source={args.source} latency={args.latency_ms}ms db={engine.url.get_backend_name()}\n"
+        f"{'run':<8} {'products':>8} {'seconds':>9} {'rows/s':>9} {'http':>8} {'sql':>8} {'peak MB':>8}  http by kind"
+    )
+    for size in args.sizes:
+        await _reset_tables()
+        if args.source == "moysklad":
+            stub = MoySkladStub(size, latency_ms=args.latency_ms, image_ratio=args.image_ratio)
+            loader_factory = lambda: MoySkladLoader(transport=stub.transport())  # noqa: E731
+        else:
+            stub = OneCStub(size, latency_ms=args.latency_ms)
+            loader_factory = lambda: OneCLoader(transport=stub.transport())  # noqa: E731
+
+        result = await _timed("full", size, stub, counter, loader_factory(), args.memory)
+        print(result.row())
+        if args.source == "moysklad":
+            result = await _timed("delta", size, stub, counter, loader_factory(), args.memory)
+            print(result.row())
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--source", choices=("moysklad", "one_c"), default="moysklad")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every stub response")
+    parser.add_argument("--image-ratio", type=float, default=0.2, help="share of MoySklad products with an image")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip tracemalloc")
+    args = parser.parse_args()
+
+    from benchmarks.stubs import ONE_C_ENDPOINT
+
+    if "DATABASE_URL" not in os.environ:
+        db_path = os.path.join(tempfile.mkdtemp(), "sync_bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["PRODUCT_SOURCE"] = args.source
+    os.environ.setdefault("MOYSKLAD_TOKEN", "benchmark")
+    os.environ.setdefault("ONE_C_ENDPOINT", ONE_C_ENDPOINT)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Stand-in for MoySklad webhooks.
+
+By default everything runs in-process: a catalog is synced from
+:class:`~benchmarks.stubs.MoySkladStub`, then ``--events`` product edits
+(``--variant-ratio`` of them modification edits, ``--delete`` deletions)
+are posted to ``POST /webhook/moysklad`` in bursts of ``--burst``
+requests, like MoySklad does while someone edits the catalog.  The
+harness waits for the coalesced flushes and reports how many webhook
+requests, flushes and upstream API calls it took, and whether the edits
+reached the database.
+
+Run from ``backend/``::
+
+    python -m benchmarks.webhook_sender --size 5000 --events 300
+    python -m benchmarks.webhook_sender --url "http://localhost:8000/webhook/moysklad?token=..." \\
+        --product-id 3f2a...
+
+With ``--url`` the notifications are sent to a running server instead
+(which then talks to the real MoySklad).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import httpx
+
+MOYSKLAD_BASE = "https://api.moysklad.ru/api/remap/1.2"
+TOKEN = "webhook-benchmark"
+
+
+def event(entity: str, entity_id: str, action: str = "UPDATE") -> dict:
+    return {
+        "meta": {"type": entity, "href": f"{MOYSKLAD_BASE}/entity/{entity}/{entity_id}"},
+        "action": action,
+        "accountId": "00000000-0000-0000-0000-000000000000",
+    }
+
+
+def body(events: list[dict]) -> dict:
+    return {"auditContext": {"uid": "admin@shop", "moment": time.strftime("%Y-%m-%d %H:%M:%S")}, "events": events}
+
+
+async def _send_remote(args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(timeout=10) as client:
+        for product_id in args.product_id:
+            response = await client.post(args.url, json=body([event("product", product_id)]))
+            print(f"{product_id}: {response.status_code} {response.text[:200]}")
+
+
+async def _run_local(args: argparse.Namespace) -> None:
+    from sqlalchemy import func, select
+
+    from app.db.models.product import Product
+    from app.db.session import async_session, engine
+    from app.main import app
+    from app.services.moysklad_webhook import moysklad_webhooks
+    from app.services.product_loader.moysklad import MoySkladLoader
+    from benchmarks.stubs import MoySkladStub
+    from benchmarks.sync_benchmark import _reset_tables
+
+    await _reset_tables()
+    stub = MoySkladStub(args.size, latency_ms=args.latency_ms)
+    await MoySkladLoader(transport=stub.transport()).sync_products()
+    moysklad_webhooks.transport = stub.transport()
+
+    rng = random.Random(1)
+    edited = rng.sample(range(args.size), min(args.events, args.size))
+    deleted = set(edited[: args.delete])
+    requests_before, kinds_before = stub.requests, dict(stub.by_kind)
+
+    started = time.perf_counter()
+    sent = 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://shop") as client:
+        for i in range(0, len(edited), args.burst):
+            for index in edited[i:i + args.burst]:
+                if index in deleted:
+                    notification = event("product", str(uuid.UUID(int=index + 1)), "DELETE")
+                elif rng.random() < args.variant_ratio and stub.variant_every and index % stub.variant_every == 0:
+                    number = index // stub.variant_every * len(stub.SIZES)
+                    notification = event("variant", stub._variant_uuid(number))
+                else:
+                    notification = event("product", stub.touch(index))
+                response = await client.post(f"/webhook/moysklad?token={TOKEN}", json=body([notification]))
+                response.raise_for_status()
+                sent += 1
+            await asyncio.sleep(args.pause_ms / 1000)
+
+        while moysklad_webhooks.pending or (moysklad_webhooks._task and not moysklad_webhooks._task.done()):
+            await asyncio.sleep(0.05)
+    seconds = time.perf_counter() - started
+
+    expected = {str(uuid.UUID(int=i + 1)): f"Товар {i} (ред. {stub.revisions[i]})" for i in stub.revisions}
+    async with async_session() as db:
+        result = await db.execute(select(Product.external_id, Product.name).where(Product.external_id.in_(list(expected))))
+        applied = sum(1 for ext_id, name in result.all() if expected[ext_id] == name)
+        hidden = (await db.execute(
+            select(func.count()).select_from(Product).where(Product.archived_at.isnot(None))
+        )).scalar()
+
+    kinds = {k: v - kinds_before.get(k, 0) for k, v in stub.by_kind.items() if v - kinds_before.get(k, 0)}
+    print(
+        f"webhooks sent: {sent} in {seconds:.2f}s, flushes: {moysklad_webhooks.flushes}\n"
+        f"upstream requests: {stub.requests - requests_before} "
+        + " ".join(f"{k}={v}" for k, v in sorted(kinds.items()))
+        + f"\nedits applied: {applied}/{len(expected)}, products hidden: {hidden}/{len(deleted)}"
+    )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", help="send to a running server instead of the in-process app")
+    parser.add_argument("--product-id", nargs="*", default=[], help="with --url: product ids to notify about")
+    parser.add_argument("--size", type=int, default=5_000, help="stub catalog size")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--burst", type=int, default=50, help="notifications per burst")
+    parser.add_argument("--pause-ms", type=float, default=200, help="pause between bursts")
+    parser.add_argument("--variant-ratio", type=float, default=0.2)
+    parser.add_argument("--delete", type=int, default=5, help="number of DELETE notifications")
+    parser.add_argument("--debounce", type=float, default=0.5, help="MOYSKLAD_WEBHOOK_DEBOUNCE_SECONDS")
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every stub response")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(_send_remote(args))
+        return
+
+    if "DATABASE_URL" not in os.environ:
+        db_path = os.path.join(tempfile.mkdtemp(), "webhook_bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["PRODUCT_SOURCE"] = "moysklad"
+    os.environ.setdefault("MOYSKLAD_TOKEN", "benchmark")
+    os.environ["MOYSKLAD_WEBHOOK_TOKEN"] = TOKEN
+    os.environ["MOYSKLAD_WEBHOOK_DEBOUNCE_SECONDS"] = str(args.debounce)
+    asyncio.run(_run_local(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings are read at import: point the app at a throwaway SQLite file first
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """Fresh tables for each test; yields a session on the primary."""
+    import app.db.models  # noqa: F401 — register all models
+    from app.db.base import Base
+    from app.db.session import async_session, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as session:
+        yield session
+    await engine.dispose()
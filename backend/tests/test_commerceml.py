@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import select
+
+from app.db.models.product import Product
+from app.db.models.product_variant import ProductVariant
+from app.services.product_loader.commerceml import CommerceMLLoader
+
+pytestmark = pytest.mark.anyio
+
+IMPORT_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<КоммерческаяИнформация ВерсияСхемы="2.05">
+  <Каталог СодержитТолькоИзменения="false">
+    <Товары>
+      <Товар><Ид>p1</Ид><Наименование>Чайник</Наименование></Товар>
+      <Товар><Ид>p2</Ид><Наименование>Футболка</Наименование></Товар>
+    </Товары>
+  </Каталог>
+</КоммерческаяИнформация>
+"""
+
+OFFERS_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<КоммерческаяИнформация ВерсияСхемы="2.05">
+  <ПакетПредложений СодержитТолькоИзменения="{only_changes}">
+    <Предложения>
+      {offers}
+    </Предложения>
+  </ПакетПредложений>
+</КоммерческаяИнформация>
+"""
+
+P1_OFFER = """<Предложение><Ид>p1</Ид>
+  <Цены><Цена><ЦенаЗаЕдиницу>{price}</ЦенаЗаЕдиницу></Цена></Цены>
+  <Количество>{quantity}</Количество></Предложение>"""
+
+P2_OFFERS = """<Предложение><Ид>p2#m</Ид>
+  <Цены><Цена><ЦенаЗаЕдиницу>900</ЦенаЗаЕдиницу></Цена></Цены>
+  <ХарактеристикиТовара><ХарактеристикаТовара><Наименование>Размер</Наименование><Значение>M</Значение></ХарактеристикаТовара></ХарактеристикиТовара>
+  <Количество>{quantity}</Количество></Предложение>"""
+
+
+def _write(directory, offers: str | None, only_changes: bool = False) -> None:
+    (directory / "import.xml").write_text(IMPORT_XML, encoding="utf-8")
+    path = directory / "offers.xml"
+    if offers is None:
+        path.unlink(missing_ok=True)
+    else:
+        path.write_text(
+            OFFERS_XML.format(only_changes=str(only_changes).lower(), offers=offers), encoding="utf-8"
+        )
+
+
+async def _state(db) -> dict:
+    db.expire_all()
+    products = (await db.execute(select(Product))).scalars().all()
+    variants = (await db.execute(select(ProductVariant))).scalars().all()
+    return {
+        "products": {
+            p.external_id: (float(p.price), p.stock_quantity, p.is_available) for p in products
+        },
+        "variants": sorted((v.value, v.quantity) for v in variants),
+    }
+
+
+async def test_changes_only_offers_keep_price_and_stock_of_products_without_offer(db, tmp_path):
+    _write(tmp_path, P1_OFFER.format(price=500, quantity=5) + P2_OFFERS.format(quantity=3))
+    await CommerceMLLoader(str(tmp_path)).sync_products()
+    assert await _state(db) == {
+        "products": {"p1": (500.0, 5, True), "p2": (900.0, 3, True)},
+        "variants": [("M", 3)],
+    }
+
+    # Only p2 changed
+    _write(tmp_path, P2_OFFERS.format(quantity=7), only_changes=True)
+    await CommerceMLLoader(str(tmp_path)).sync_products()
+    assert await _state(db) == {
+        "products": {"p1": (500.0, 5, True), "p2": (900.0, 7, True)},
+        "variants": [("M", 7)],
+    }
+
+    # Price changed, no quantity in the offer
+    _write(tmp_path, "<Предложение><Ид>p1</Ид><Цены><Цена><ЦенаЗаЕдиницу>450</ЦенаЗаЕдиницу></Цена></Цены></Предложение>", only_changes=True)
+    await CommerceMLLoader(str(tmp_path)).sync_products()
+    assert (await _state(db))["products"]["p1"] == (450.0, 5, True)
+
+
+async def test_missing_offers_keep_price_stock_and_variants(db, tmp_path):
+    _write(tmp_path, P1_OFFER.format(price=500, quantity=5) + P2_OFFERS.format(quantity=3))
+    await CommerceMLLoader(str(tmp_path)).sync_products()
+    before = await _state(db)
+
+    _write(tmp_path, None)
+    await CommerceMLLoader(str(tmp_path)).sync_products()
+    assert await _state(db) == before
+
+
+async def test_full_offers_zero_products_without_offer(db, tmp_path):
+    _write(tmp_path, P1_OFFER.format(price=500, quantity=5) + P2_OFFERS.format(quantity=3))
+    await CommerceMLLoader(str(tmp_path)).sync_products()
+
+    _write(tmp_path, P2_OFFERS.format(quantity=3))
+    await CommerceMLLoader(str(tmp_path)).sync_products()
+    assert (await _state(db))["products"]["p1"] == (0.0, 0, False)
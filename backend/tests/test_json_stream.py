@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from app.services.product_loader.json_stream import JsonArrayStream
+
+DOCUMENTS = [
+    b"[1.5]",
+    b"[1.5, -2e10, 3E-2, 0, -0.25, 12345678901234567890]",
+    b'[{"id": 1, "price": 1.5}, {"id": 2, "price": 10e2}, true, null, "x"]',
+    b'{"odata.metadata": "m", "odata.count": 2.75, "value": [{"a": [1, 2.5]}, 3.25], "next": 1e3}',
+    ("\ufeff" + '[{"name": "Чайник «Люкс»", "price": 1999.99}]').encode("utf-8"),
+    b"  [ ]  ",
+    b'{"value": []}',
+]
+
+
+def _items(document: bytes) -> list:
+    parsed = json.loads(document.decode("utf-8-sig"))
+    return parsed["value"] if isinstance(parsed, dict) else parsed
+
+
+def _parse(document: bytes, chunk_size: int) -> list:
+    parser = JsonArrayStream()
+    items = []
+    for i in range(0, len(document), chunk_size):
+        items.extend(parser.feed(document[i:i + chunk_size]))
+    items.extend(parser.close())
+    return items
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_every_chunk_size_gives_the_same_items(document):
+    expected = _items(document)
+    for chunk_size in range(1, len(document) + 1):
+        assert _parse(document, chunk_size) == expected, chunk_size
+
+
+@pytest.mark.parametrize("document", [b"[1.5", b'{"value": [1', b"[1.]", b"[1, 2"])
+def test_truncated_or_malformed_input_raises(document):
+    for chunk_size in range(1, len(document) + 1):
+        with pytest.raises(ValueError):
+            _parse(document, chunk_size)
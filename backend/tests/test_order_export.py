@@ -0,0 +1,132 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import select, update
+
+from app.config import ProductSource, settings
+from app.db.models.order import Order, OrderItem
+from app.db.models.product import Product
+from app.db.models.user import User
+from app.services.order_export import OrderExporter, requeue_failed
+
+pytestmark = pytest.mark.anyio
+
+
+class MoySklad:
+    """``/entity/customerorder``: orders whose code is in ``reject`` come back with an error."""
+
+    def __init__(self, reject: set[str] = frozenset()):
+        self.reject = set(reject)
+        self.orders: dict[str, str] = {}
+        self.posted: list[list[str]] = []
+        self.lookups: list[str] = []
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            query = request.url.params.get("filter", "")
+            self.lookups.append(query)
+            codes = {part.split("=", 1)[1] for part in query.split(";")}
+            rows = [{"id": ms_id, "externalCode": code} for code, ms_id in self.orders.items() if code in codes]
+            return httpx.Response(200, json={"rows": rows})
+        body = json.loads(request.content)
+        self.posted.append([payload["externalCode"] for payload in body])
+        rows = []
+        for payload in body:
+            code = payload["externalCode"]
+            if code in self.reject:
+                rows.append({"errors": [{"error": f"{code} rejected"}]})
+            else:
+                self.orders[code] = f"ms-{code}"
+                rows.append({"id": f"ms-{code}", "externalCode": code})
+        return httpx.Response(200, json=rows)
+
+
+@pytest.fixture
+async def orders(db, monkeypatch):
+    """Three pending orders (ids 1-3) with one linked position each."""
+    monkeypatch.setattr(settings, "product_source", ProductSource.MOYSKLAD)
+    monkeypatch.setattr(settings, "moysklad_order_export", True)
+    monkeypatch.setattr(settings, "moysklad_token", "token")
+    monkeypatch.setattr(settings, "moysklad_organization_id", "org")
+    monkeypatch.setattr(settings, "moysklad_agent_id", "agent")
+    user = User(telegram_id=1, first_name="u1")
+    product = Product(name="Чайник", description="", price=1000, external_id="p1")
+    db.add_all([user, product])
+    await db.flush()
+    for _ in range(3):
+        order = Order(user_id=user.id, total=1000, export_status="pending")
+        db.add(order)
+        await db.flush()
+        db.add(OrderItem(order_id=order.id, product_id=product.id, quantity=1, price_at_order=1000))
+    await db.commit()
+
+
+async def _state(db) -> dict[int, tuple]:
+    db.expire_all()
+    rows = (await db.execute(select(Order).order_by(Order.id))).scalars().all()
+    return {o.id: (o.export_status, o.export_attempts, o.external_id) for o in rows}
+
+
+async def _make_due(db) -> None:
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await db.execute(update(Order).where(Order.export_next_at.isnot(None)).values(export_next_at=past))
+    await db.commit()
+
+
+async def test_partial_failure_marks_only_rejected_order(db, orders):
+    moysklad = MoySklad(reject={"tg-2"})
+    exporter = OrderExporter(moysklad.transport())
+
+    assert await exporter.export_pending() == 2
+    assert await _state(db) == {
+        1: ("exported", 0, "ms-tg-1"),
+        2: ("pending", 1, None),
+        3: ("exported", 0, "ms-tg-3"),
+    }
+    failed = await db.get(Order, 2)
+    assert failed.export_error == "tg-2 rejected"
+    assert failed.export_next_at is not None
+
+    # Not due yet: nothing is sent again
+    assert await exporter.export_pending() == 0
+    assert moysklad.posted == [["tg-1", "tg-2", "tg-3"]]
+
+    # Due: looked up first, then posted alone
+    moysklad.reject.clear()
+    await _make_due(db)
+    assert await exporter.export_pending() == 1
+    assert moysklad.lookups == ["externalCode=tg-2"]
+    assert moysklad.posted[-1] == ["tg-2"]
+    assert (await _state(db))[2] == ("exported", 1, "ms-tg-2")
+
+
+async def test_retry_finds_order_created_upstream(db, orders):
+    # The first response got lost: MoySklad created tg-1 but the batch failed for us
+    moysklad = MoySklad()
+    exporter = OrderExporter(moysklad.transport())
+    await db.execute(update(Order).where(Order.id == 1).values(export_attempts=1))
+    await db.commit()
+    moysklad.orders["tg-1"] = "ms-existing"
+
+    assert await exporter.export_pending() == 3
+    assert moysklad.lookups == ["externalCode=tg-1"]
+    assert moysklad.posted == [["tg-2", "tg-3"]]
+    assert (await _state(db))[1] == ("exported", 1, "ms-existing")
+
+
+async def test_requeue_failed(db, orders):
+    await db.execute(update(Order).where(Order.id.in_([1, 2])).values(export_status="failed", export_attempts=8))
+    await db.commit()
+
+    assert await requeue_failed(db, [2]) == 1
+    await db.commit()
+    assert await _state(db) == {
+        1: ("failed", 8, None),
+        2: ("pending", 0, None),
+        3: ("pending", 0, None),
+    }
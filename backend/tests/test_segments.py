@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.db.models.cart import CartItem
+from app.db.models.favorite import Favorite
+from app.db.models.order import Order
+from app.db.models.product import Product
+from app.db.models.user import User
+from app.schemas.mailing import Segment
+from app.services.segments import count_recipients, iter_recipients
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def users(db):
+    """Users 1-5 (``telegram_id``):
+
+    1. two orders (6000 in total), the last 3 days ago; cart
+    2. one order 40 days ago (500) and a cancelled one yesterday
+    3. no orders; cart, favorite, 100 bonus points
+    4. no orders, nothing else
+    5. like 4, but blocked the bot
+    """
+    now = datetime.now(timezone.utc)
+    product = Product(name="Чайник", description="", price=1000)
+    db.add(product)
+    db.add_all(
+        [
+            User(telegram_id=1, first_name="u1"),
+            User(telegram_id=2, first_name="u2"),
+            User(telegram_id=3, first_name="u3", bonus_balance=100),
+            User(telegram_id=4, first_name="u4"),
+            User(telegram_id=5, first_name="u5", bot_blocked_at=now),
+        ]
+    )
+    await db.flush()
+    db.add_all(
+        [
+            Order(user_id=1, total=1000, created_at=now - timedelta(days=10)),
+            Order(user_id=1, total=5000, created_at=now - timedelta(days=3)),
+            Order(user_id=2, total=500, created_at=now - timedelta(days=40)),
+            Order(user_id=2, total=9000, status="cancelled", created_at=now - timedelta(days=1)),
+            CartItem(user_id=1, product_id=product.id),
+            CartItem(user_id=3, product_id=product.id),
+            Favorite(user_id=3, product_id=product.id),
+        ]
+    )
+    await db.commit()
+
+
+async def _ids(db, segment: Segment, include_blocked: bool = False) -> list[int]:
+    ids: list[int] = []
+    async for chunk in iter_recipients(db, segment, include_blocked=include_blocked):
+        ids.extend(chunk)
+    return ids
+
+
+@pytest.mark.parametrize(
+    "segment, expected",
+    [
+        ({}, [1, 2, 3, 4]),
+        ({"has_orders": True}, [1, 2]),
+        ({"has_orders": False}, [3, 4]),
+        ({"orders_count": {"min": 2}}, [1]),
+        # Cancelled orders count neither to the total nor to the last order
+        ({"orders_total": {"min": 1000}}, [1]),
+        ({"last_order_days": {"max": 7}}, [1]),
+        # Users without orders never match last_order_days
+        ({"last_order_days": {"min": 30}}, [2]),
+        # LEFT JOIN on order stats: users without orders have count 0
+        ({"orders_count": {"max": 0}}, [3, 4]),
+        ({"all": [{"has_cart": True}, {"has_orders": True}]}, [1]),
+        ({"any": [{"orders_total": {"min": 5000}}, {"has_favorites": True}]}, [1, 3]),
+        ({"any": []}, []),
+        ({"not": {"has_cart": True}}, [2, 4]),
+        ({"has_cart": True, "not": {"bonus_balance": {"min": 1}}}, [1]),
+        (
+            {
+                "any": [{"has_orders": False, "has_cart": True}, {"last_order_days": {"min": 30}}],
+                "not": {"has_favorites": True},
+            },
+            [2],
+        ),
+    ],
+)
+async def test_compile(db, users, segment, expected):
+    segment = Segment.model_validate(segment)
+    assert await _ids(db, segment) == expected
+    assert await count_recipients(db, segment) == len(expected)
+
+
+async def test_blocked_users_only_with_include_blocked(db, users):
+    segment = Segment(has_orders=False)
+    assert await _ids(db, segment) == [3, 4]
+    assert await _ids(db, segment, include_blocked=True) == [3, 4, 5]
@@ -1,10 +1,15 @@
-import React, { useState, useRef } from 'react';
+import React, { useEffect, useState, useRef } from 'react';
 import { Send, Upload, X } from 'lucide-react';
 import {
+  adminControlMailing,
+  adminGetMailing,
+  adminPreviewMailing,
   adminSendMailing,
   adminUploadMailingImage,
   type MailingAudience,
+  type MailingJob,
   type MailingPayload,
+  type MailingStatus,
 } from '../api/endpoints';
 import { Button } from '../components/ui/Button';
 import { Input } from '../components/ui/Input';
@@ -18,6 +23,17 @@ const AUDIENCE_OPTIONS: { value: MailingAudience; label: string }[] = [
   { value: 'no_orders', label: 'Не делали заказов' },
 ];
 
+const STATUS_LABELS: Record<MailingStatus, string> = {
+  pending: 'В очереди',
+  running: 'Отправляется',
+  paused: 'На паузе',
+  cancelled: 'Отменена',
+  done: 'Завершена',
+  failed: 'Ошибка',
+};
+
+const isActive = (status: MailingStatus) => status === 'pending' || status === 'running';
+
 export const AdminMailingPage: React.FC = () => {
   const [name, setName] = useState('');
   const [audience, setAudience] = useState<MailingAudience>('all');
@@ -27,9 +43,48 @@ export const AdminMailingPage: React.FC = () => {
   const [buttonUrl, setButtonUrl] = useState('');
   const [uploading, setUploading] = useState(false);
   const [loading, setLoading] = useState(false);
-  const [result, setResult] = useState<{ sent: number; failed: number; total: number } | null>(null);
+  const [result, setResult] = useState<MailingJob | null>(null);
+  const [recipients, setRecipients] = useState<number | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
+  useEffect(() => {
+    let cancelled = false;
+    setRecipients(null);
+    adminPreviewMailing(audience)
+      .then(({ data }) => {
+        if (!cancelled) setRecipients(data.count);
+      })
+      .catch(() => {});
+    return () => {
+      cancelled = true;
+    };
+  }, [audience]);
+
+  // Poll progress while the broadcast is queued or sending
+  useEffect(() => {
+    if (!result || !isActive(result.status)) return;
+    const timer = setTimeout(async () => {
+      try {
+        const { data } = await adminGetMailing(result.id);
+        setResult(data);
+      } catch {
+        setResult({ ...result });
+      }
+    }, 2000);
+    return () => clearTimeout(timer);
+  }, [result]);
+
+  const handleControl = async (action: 'pause' | 'resume' | 'cancel') => {
+    if (!result) return;
+    if (action === 'cancel' && !confirm('Отменить рассылку? Оставшиеся получатели её не получат.')) return;
+    try {
+      const { data } = await adminControlMailing(result.id, action);
+      setResult(data);
+    } catch (err: any) {
+      alert(err?.response?.data?.detail ?? 'Ошибка');
+    }
+  };
+
   const handleImageSelect = async (e: React.ChangeEvent<HTMLInputElement>) => {
     const file = e.target.files?.[0];
     if (!file || !file.type.startsWith('image/')) return;
@@ -103,6 +158,9 @@ export const AdminMailingPage: React.FC = () => {
               </option>
             ))}
           </select>
+          {recipients !== null && (
+            <p className="text-xs text-tg-hint mt-1">Получателей: {recipients}</p>
+          )}
         </div>
 
         <div>
@@ -180,10 +238,35 @@ export const AdminMailingPage: React.FC = () => {
         </Button>
 
         {result && (
-          <div className="bg-tg-secondary rounded-xl p-4 text-sm">
+          <div className="bg-tg-secondary rounded-xl p-4 text-sm space-y-1">
+            <p className="font-medium text-tg-text">{STATUS_LABELS[result.status]}</p>
             <p className="text-green-600">Успешно: {result.sent}</p>
-            <p className="text-red-500">Ошибки: {result.failed}</p>
-            <p className="text-tg-hint">Всего: {result.total}</p>
+            <p className="text-red-500">
+              Ошибки: {result.failed}
+              {result.blocked > 0 && ` (заблокировали бота: ${result.blocked})`}
+            </p>
+            <p className="text-tg-hint">Осталось: {result.remaining} из {result.total}</p>
+            {result.throughput > 0 && (
+              <p className="text-tg-hint">Скорость: {result.throughput} сообщ./с</p>
+            )}
+            {result.error && <p className="text-red-500">{result.error}</p>}
+            <div className="flex gap-2 pt-2">
+              {isActive(result.status) && (
+                <Button size="sm" variant="secondary" onClick={() => handleControl('pause')}>
+                  Пауза
+                </Button>
+              )}
+              {(result.status === 'paused' || result.status === 'failed') && (
+                <Button size="sm" variant="secondary" onClick={() => handleControl('resume')}>
+                  Продолжить
+                </Button>
+              )}
+              {(isActive(result.status) || result.status === 'paused') && (
+                <Button size="sm" variant="danger" onClick={() => handleControl('cancel')}>
+                  Отменить
+                </Button>
+              )}
+            </div>
           </div>
         )}
       </div>
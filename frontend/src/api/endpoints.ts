@@ -198,17 +198,60 @@ export const adminUploadMailingImage = (file: File) => {
 
 export type MailingAudience = 'all' | 'has_orders' | 'has_cart' | 'has_favorites' | 'no_orders';
 
+export interface MailingRange {
+  min?: number | null;
+  max?: number | null;
+}
+
+/** Audience filter; conditions on one node are AND-ed. */
+export interface MailingSegment {
+  all?: MailingSegment[];
+  any?: MailingSegment[];
+  not?: MailingSegment;
+  has_orders?: boolean;
+  orders_count?: MailingRange;
+  orders_total?: MailingRange;
+  last_order_days?: MailingRange;
+  has_cart?: boolean;
+  has_favorites?: boolean;
+  favorite_category_id?: number;
+  bonus_balance?: MailingRange;
+}
+
 export interface MailingPayload {
   name?: string | null;
   audience: MailingAudience;
+  segment?: MailingSegment | null;
   text: string;
   image_url?: string | null;
   button_text?: string | null;
   button_url?: string | null;
 }
 
+export type MailingStatus = 'pending' | 'running' | 'paused' | 'cancelled' | 'done' | 'failed';
+
+export interface MailingJob {
+  id: number;
+  name: string | null;
+  audience: MailingAudience;
+  segment: MailingSegment | null;
+  status: MailingStatus;
+  sent: number;
+  failed: number;
+  blocked: number;
+  total: number;
+  remaining: number;
+  throughput: number;
+  error: string | null;
+}
+
+export const adminPreviewMailing = (audience: MailingAudience, segment?: MailingSegment | null) =>
+  api.post<{ count: number }>('/admin/mailing/preview', { audience, segment });
 export const adminSendMailing = (data: MailingPayload) =>
-  api.post<{ sent: number; failed: number; total: number }>('/admin/mailing', data);
+  api.post<MailingJob>('/admin/mailing', data);
+export const adminGetMailing = (id: number) => api.get<MailingJob>(`/admin/mailing/${id}`);
+export const adminControlMailing = (id: number, action: 'pause' | 'resume' | 'cancel') =>
+  api.post<MailingJob>(`/admin/mailing/${id}/${action}`);
 export const adminGetSettings = () => api.get('/admin/settings');
 export const adminUpdateSettings = (data: any) =>
   api.patch('/admin/settings', data);